@@ -0,0 +1,178 @@
+# aggregations.py
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from date_ordinals import NAT_ORDINAL
+from perf import timed
+
+# Dimensões contadas para as tabelas e gráficos do dashboard
+DIMENSOES = ['status', 'nivel_escolaridade', 'raca', 'sexo', 'empresa', 'custo', 'funcao', 'quantos']
+
+def _contar_categorica(serie, linhas):
+    """
+    Conta as linhas selecionadas por categoria com np.bincount sobre os códigos da coluna.
+    """
+    categorias = serie.cat.categories
+    codigos = serie.cat.codes.to_numpy()[linhas]
+    # O código -1 (valor nulo) é deslocado para a posição 0 e descartado, como no value_counts
+    contagens = np.bincount(codigos + 1, minlength=len(categorias) + 1)[1:]
+    return pd.Series(contagens, index=pd.CategoricalIndex(categorias, categories=categorias), name='count')
+
+def _contar_inteira(serie, linhas):
+    """
+    Conta as linhas selecionadas por valor de uma coluna inteira (e.g., 'quantos').
+    """
+    valores = serie.to_numpy()[linhas]
+    if len(valores) == 0:
+        return pd.Series([], dtype=np.int64, name='count')
+    minimo = valores.min()
+    contagens = np.bincount(valores - minimo)
+    return pd.Series(contagens, index=np.arange(minimo, minimo + len(contagens)), name='count')
+
+class Agregados:
+    """
+    Contagens e percentagens de todas as dimensões (ver DIMENSOES) para um subconjunto
+    de linhas do DataFrame completo, partilhadas pelas tabelas da página "Métricas e
+    Gráficos" e pelas funções create_* de charts.py. Cada dimensão só é contada quando é
+    pedida pela primeira vez, pelo que uma página que mostra uma única tabela não paga as
+    restantes.
+
+    Quando os filtros podem ser respondidos pelo cubo de headcount (ver olap_cube), as
+    dimensões do cubo são contadas a partir da fatia do cubo e a máscara só é calculada
+    se for pedida uma dimensão que o cubo não tem.
+    """
+
+    def __init__(self, df_rh, mask, fatia=None):
+        """
+        Args:
+            df_rh (pd.DataFrame): O DataFrame pré-processado completo.
+            mask (np.ndarray ou callable): Máscara booleana das linhas filtradas (ver
+                                           FilterIndex.mask), ou uma função sem argumentos
+                                           que a devolve, chamada só quando for precisa.
+            fatia (CubeSlice, optional): A fatia do cubo com os mesmos filtros.
+        """
+        self._df_rh = df_rh
+        self._mascara = mask
+        self._fatia = fatia
+        self._posicoes = None
+        self._admissoes_por_mes = None
+        self._contagens = {}
+        self.total = fatia.total if fatia is not None else len(self._linhas)
+
+    @property
+    def _linhas(self):
+        """
+        Posições das linhas filtradas, calculadas a partir da máscara na primeira utilização.
+        """
+        if self._posicoes is None:
+            mascara = self._mascara() if callable(self._mascara) else self._mascara
+            self._posicoes = np.flatnonzero(mascara)
+        return self._posicoes
+
+    def _contar(self, coluna):
+        """
+        Devolve as contagens de uma dimensão, calculando-as na primeira chamada.
+        """
+        if coluna not in self._contagens:
+            if coluna not in DIMENSOES or coluna not in self._df_rh.columns:
+                raise KeyError(coluna)
+            serie = self._df_rh[coluna]
+            if self._fatia is not None and coluna in self._fatia.dimensoes:
+                contagens = self._fatia.rollup(coluna)
+            elif isinstance(serie.dtype, pd.CategoricalDtype):
+                contagens = _contar_categorica(serie, self._linhas)
+            else:
+                contagens = _contar_inteira(serie, self._linhas)
+            # Mesma ordem do value_counts: da maior para a menor contagem, sem valores a zero
+            contagens = contagens.sort_values(ascending=False)
+            self._contagens[coluna] = contagens[contagens > 0]
+        return self._contagens[coluna]
+
+    @property
+    def empty(self):
+        return self.total == 0
+
+    def serie(self, coluna):
+        """
+        Devolve as contagens de uma dimensão, no formato de Series.value_counts().
+
+        Args:
+            coluna (str): O nome da dimensão.
+
+        Returns:
+            pd.Series: Contagem por valor, da maior para a menor.
+        """
+        return self._contar(coluna)
+
+    def admissoes_por_mes(self):
+        """
+        Devolve o número de admissões por mês (contagem de 'ald' não nulos, como no
+        groupby original), calculado a partir dos ordinais de 'admissao' na primeira chamada.
+
+        Returns:
+            pd.Series: Contagem por mês, indexada por strings 'AAAA-MM' por ordem cronológica.
+        """
+        if self._admissoes_por_mes is None and self._fatia is not None:
+            self._admissoes_por_mes = self._fatia.admissoes_por_mes()
+        if self._admissoes_por_mes is None:
+            ordinais = self._df_rh['admissao_ord'].to_numpy()[self._linhas]
+            validos = ordinais != NAT_ORDINAL
+            meses = ordinais[validos].astype('datetime64[D]').astype('datetime64[M]')
+            com_ald = self._df_rh['ald'].notna().to_numpy()[self._linhas][validos]
+            meses_unicos, posicao = np.unique(meses, return_inverse=True)
+            contagens = np.bincount(posicao, weights=com_ald, minlength=len(meses_unicos)).astype(np.int64)
+            self._admissoes_por_mes = pd.Series(contagens, index=meses_unicos.astype(str), name='count')
+        return self._admissoes_por_mes
+
+    def fingerprint(self, coluna):
+        """
+        Devolve uma impressão digital (hash) das contagens de uma dimensão, usada como chave
+        na cache de figuras: filtros diferentes com as mesmas contagens têm o mesmo hash.
+
+        Args:
+            coluna (str): O nome da dimensão, ou 'admissoes_por_mes'.
+
+        Returns:
+            str: O hash hexadecimal das contagens.
+        """
+        contagens = self.admissoes_por_mes() if coluna == 'admissoes_por_mes' else self._contar(coluna)
+        h = hashlib.sha1()
+        h.update(repr(list(contagens.index)).encode('utf-8'))
+        h.update(contagens.to_numpy().tobytes())
+        return h.hexdigest()
+
+    def tabela(self, coluna, rotulo):
+        """
+        Devolve as contagens de uma dimensão como tabela com a respetiva percentagem.
+
+        Args:
+            coluna (str): O nome da dimensão.
+            rotulo (str): O nome a dar à coluna dos valores (e.g., 'Status').
+
+        Returns:
+            pd.DataFrame: Tabela com as colunas [rotulo, 'Count', 'Percentual'].
+        """
+        contagens = self._contar(coluna)
+        tabela = contagens.reset_index()
+        tabela.columns = [rotulo, 'Count']
+        soma = contagens.sum()
+        tabela['Percentual'] = tabela['Count'] / soma * 100 if soma else 0.0
+        return tabela
+
+@timed()
+def compute_aggregates(df_rh, mask, fatia=None):
+    """
+    Prepara as contagens das dimensões para as linhas selecionadas pela máscara (cada
+    dimensão é contada quando é usada pela primeira vez).
+
+    Args:
+        df_rh (pd.DataFrame): O DataFrame pré-processado completo.
+        mask (np.ndarray ou callable): Máscara booleana das linhas filtradas, ou função que a devolve.
+        fatia (CubeSlice, optional): A fatia do cubo de headcount com os mesmos filtros.
+
+    Returns:
+        Agregados: O objeto com as contagens, partilhado por tabelas e gráficos.
+    """
+    return Agregados(df_rh, mask, fatia)
@@ -0,0 +1,283 @@
+# batch_report.py
+#
+# Gera relatórios estáticos (HTML e/ou JSON) por empresa, por setor ou para uma lista de
+# combinações de filtros, sem abrir o dashboard. O ficheiro Excel é carregado uma única
+# vez e os relatórios são gerados em paralelo num conjunto de processos.
+#
+# Exemplos:
+#   python batch_report.py dados.xlsx --por empresa setor --saida relatorios/
+#   python batch_report.py dados.xlsx --filtros combinacoes.json --formato json --processos 4
+#
+# O ficheiro de --filtros é uma lista de {"nome": ..., "filtros": {...}} com as mesmas
+# chaves de filtros da barra lateral (e.g., {"status": ["ATIVO"], "empresa": ["NATURAYO"]}).
+import argparse
+import datetime
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from aggregations import compute_aggregates
+from charts import create_employees_by_company_chart, create_employees_by_function_chart, \
+    create_employees_by_children_chart, create_gender_distribution_chart, \
+    create_education_level_distribution_chart, create_monthly_admissions_chart, \
+    create_cost_type_distribution_chart, create_hires_vs_terminations_chart
+from data_loader import load_with_disk_cache
+from events import monthly_flows
+from filter_engine import MULTISELECT_COLUMNS, build_filter_index
+from kpis import compute_kpis
+from utils import FreqUnica, ordem_escolaridade
+
+# Tabelas de contagem incluídas em cada relatório: coluna -> rótulo
+TABELAS = {
+    'status': 'Status', 'nivel_escolaridade': 'Nível Escolaridade', 'raca': 'Raça',
+    'sexo': 'Sexo', 'empresa': 'Empresa', 'custo': 'Tipo de Custo',
+}
+
+# Estado de cada processo do pool, preenchido uma vez por _iniciar_processo
+_df_rh = None
+_filter_index = None
+
+def _iniciar_processo(df_rh):
+    """
+    Inicializador dos processos do pool: recebe o DataFrame uma única vez por processo
+    (e não uma vez por relatório) e constrói o índice de filtros.
+    """
+    global _df_rh, _filter_index
+    _df_rh = df_rh
+    _filter_index = build_filter_index(df_rh)
+
+def _nome_ficheiro(nome):
+    """
+    Converte o nome de um relatório num nome de ficheiro seguro.
+    """
+    return re.sub(r'[^\w.-]+', '_', nome, flags=re.UNICODE).strip('_') or 'relatorio'
+
+def _nomes_ficheiros(nomes):
+    """
+    Nomes de ficheiro seguros e distintos para uma lista de relatórios: nomes que dão o
+    mesmo ficheiro (e.g., "ativos 2020" e "ativos/2020") recebem um sufixo (_2, _3, ...),
+    para que um relatório não substitua outro.
+    """
+    usados, resultado = set(), []
+    for nome in nomes:
+        base = _nome_ficheiro(nome)
+        candidato, n = base, 1
+        while candidato.casefold() in usados:
+            n += 1
+            candidato = f"{base}_{n}"
+        usados.add(candidato.casefold())
+        resultado.append(candidato)
+    return resultado
+
+# Filtros de data aceites no ficheiro de --filtros, como strings AAAA-MM-DD
+_FILTROS_DATA = ('data_inicial_admissao', 'data_final_admissao')
+
+def read_filter_file(caminho):
+    """
+    Lê o ficheiro JSON de --filtros, convertendo os filtros de data (AAAA-MM-DD) em
+    datetime.date.
+
+    Args:
+        caminho (str): O ficheiro com uma lista de {"nome": ..., "filtros": {...}}.
+
+    Returns:
+        list: Pares (nome, filtros).
+
+    Raises:
+        ValueError: Se o ficheiro não tiver o formato esperado ou uma data for inválida.
+    """
+    with open(caminho, encoding='utf-8') as f:
+        conteudo = json.load(f)
+    combinacoes = []
+    for combinacao in conteudo:
+        try:
+            nome, filtros = str(combinacao['nome']), dict(combinacao['filtros'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Cada combinação deve ter 'nome' e 'filtros': {combinacao!r}")
+        for chave in _FILTROS_DATA:
+            if chave in filtros:
+                try:
+                    filtros[chave] = datetime.date.fromisoformat(filtros[chave])
+                except (TypeError, ValueError):
+                    raise ValueError(f"'{nome}': {chave} deve ser uma data AAAA-MM-DD, não {filtros[chave]!r}")
+        combinacoes.append((nome, filtros))
+    return combinacoes
+
+def report_combinations(df_rh, dimensoes):
+    """
+    Gera uma combinação de filtros por valor de cada dimensão (e.g., uma por empresa).
+
+    Args:
+        df_rh (pd.DataFrame): O DataFrame pré-processado.
+        dimensoes (list): As colunas a percorrer (e.g., ['empresa', 'setor']).
+
+    Returns:
+        list: Lista de (nome do relatório, filtros).
+    """
+    combinacoes = []
+    for coluna in dimensoes:
+        valores = df_rh[coluna].value_counts()
+        for valor in valores[valores > 0].index:
+            combinacoes.append((f"{coluna}_{valor}", {coluna: [valor]}))
+    return combinacoes
+
+def build_report(df_rh, filter_index, filtros, data_inicial, data_final):
+    """
+    Calcula o conteúdo de um relatório: KPIs, tabelas de contagem, fluxos mensais e figuras,
+    com a mesma lógica do dashboard (ver kpis.compute_kpis e charts.py).
+
+    Args:
+        df_rh (pd.DataFrame): O DataFrame pré-processado.
+        filter_index (FilterIndex): O índice de filtros do DataFrame.
+        filtros (dict): Os filtros do relatório (chaves da barra lateral).
+        data_inicial (datetime.date): Início do período dos KPIs.
+        data_final (datetime.date): Fim do período dos KPIs.
+
+    Returns:
+        dict: 'kpis', 'tabelas' (DataFrames), 'fluxos' (DataFrame) e 'figuras' (go.Figure).
+    """
+    mascara = filter_index.mask(filtros)
+    df_filtrado = df_rh[mascara]
+    agregados = compute_aggregates(df_rh, mascara)
+    # Os fluxos ignoram o filtro de data de admissão, como na página "Visão Geral"
+    filtros_sem_datas = {k: v for k, v in filtros.items()
+                         if k not in ('data_inicial_admissao', 'data_final_admissao')}
+    fluxos = monthly_flows(df_rh, filter_index.mask(filtros_sem_datas), data_inicial, data_final)
+
+    figuras = {}
+    if not agregados.empty:
+        figuras = {
+            'empresa': create_employees_by_company_chart(FreqUnica(df_filtrado, 'empresa', 'nome')),
+            'funcao': create_employees_by_function_chart(agregados),
+            'filhos': create_employees_by_children_chart(agregados),
+            'sexo': create_gender_distribution_chart(agregados),
+            'escolaridade': create_education_level_distribution_chart(agregados, ordem_escolaridade),
+            'admissoes_mes': create_monthly_admissions_chart(agregados),
+            'custo': create_cost_type_distribution_chart(agregados),
+        }
+    figuras['contratacoes_desligamentos'] = create_hires_vs_terminations_chart(fluxos)
+
+    return {
+        'kpis': compute_kpis(df_filtrado, data_inicial, data_final),
+        'tabelas': {rotulo: agregados.tabela(coluna, rotulo) for coluna, rotulo in TABELAS.items()
+                    if coluna in df_rh.columns},
+        'fluxos': fluxos,
+        'figuras': figuras,
+    }
+
+def render_html(nome, relatorio, data_inicial, data_final):
+    """
+    Monta a página HTML de um relatório (os gráficos carregam o plotly.js da CDN).
+    """
+    kpis = relatorio['kpis']
+    partes = [
+        f"<html><head><meta charset='utf-8'><title>{html.escape(nome)}</title></head><body>",
+        f"<h1>{html.escape(nome)}</h1>",
+        f"<p>Período: {data_inicial:%d/%m/%Y} a {data_final:%d/%m/%Y}</p>",
+        "<table border='1'>",
+        f"<tr><th>Funcionários Ativos</th><td>{kpis['funcionarios_ativos']}</td></tr>",
+        f"<tr><th>Contratações no Período</th><td>{kpis['contratacoes_no_periodo']}</td></tr>",
+        f"<tr><th>Desligamentos no Período</th><td>{kpis['desligamentos_no_periodo']}</td></tr>",
+        f"<tr><th>Tempo Médio Empresa</th><td>{kpis['tempo_medio_empresa']:.1f} anos</td></tr>",
+        "</table>",
+    ]
+    for rotulo, tabela in relatorio['tabelas'].items():
+        partes.append(f"<h2>{html.escape(rotulo)}</h2>")
+        partes.append(tabela.to_html(index=False, float_format='{:.2f}'.format))
+    for i, figura in enumerate(relatorio['figuras'].values()):
+        partes.append(figura.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False))
+    partes.append("</body></html>")
+    return '\n'.join(partes)
+
+def render_json(nome, relatorio, data_inicial, data_final):
+    """
+    Serializa os números de um relatório (sem as figuras) em JSON.
+    """
+    fluxos = relatorio['fluxos']
+    return json.dumps({
+        'nome': nome,
+        'periodo': [data_inicial.isoformat(), data_final.isoformat()],
+        'kpis': relatorio['kpis'],
+        'tabelas': {rotulo: tabela.astype({tabela.columns[0]: str}).to_dict(orient='records')
+                    for rotulo, tabela in relatorio['tabelas'].items()},
+        'fluxos_mensais': fluxos.reset_index().assign(mes=fluxos.index.strftime('%Y-%m')).to_dict(orient='records'),
+    }, ensure_ascii=False, indent=2)
+
+def _gerar(tarefa):
+    """
+    Gera e grava um relatório num processo do pool.
+
+    Returns:
+        list: Os caminhos dos ficheiros gravados.
+    """
+    nome, ficheiro, filtros, data_inicial, data_final, saida, formatos = tarefa
+    relatorio = build_report(_df_rh, _filter_index, filtros, data_inicial, data_final)
+    caminhos = []
+    for formato in formatos:
+        caminho = os.path.join(saida, f"{ficheiro}.{formato}")
+        conteudo = (render_html if formato == 'html' else render_json)(nome, relatorio, data_inicial, data_final)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+        caminhos.append(caminho)
+    return caminhos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios de RH estáticos por empresa, setor ou filtros.")
+    parser.add_argument('excel', help="O ficheiro Excel com as abas 'TODOS', 'Férias' e 'DESLIGADOS'.")
+    # Só as colunas indexadas pelo FilterIndex podem ser usadas como filtro nos processos
+    parser.add_argument('--por', nargs='+', default=['empresa', 'setor'], choices=MULTISELECT_COLUMNS,
+                        metavar='COLUNA',
+                        help="Colunas para gerar um relatório por valor (padrão: empresa setor; "
+                             f"uma de: {', '.join(MULTISELECT_COLUMNS)}).")
+    parser.add_argument('--filtros', help="Ficheiro JSON com uma lista de {\"nome\", \"filtros\"}; substitui --por.")
+    parser.add_argument('--data-inicial', type=datetime.date.fromisoformat,
+                        help="Início do período (AAAA-MM-DD); também filtra as admissões, como no dashboard.")
+    parser.add_argument('--data-final', type=datetime.date.fromisoformat, help="Fim do período (AAAA-MM-DD).")
+    parser.add_argument('--formato', choices=['html', 'json', 'ambos'], default='ambos')
+    parser.add_argument('--saida', default='relatorios', help="Diretório de saída (padrão: relatorios).")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    args = parser.parse_args(argv)
+
+    # O ficheiro de filtros é validado antes de carregar o Excel
+    combinacoes = None
+    if args.filtros:
+        try:
+            combinacoes = read_filter_file(args.filtros)
+        except (OSError, ValueError) as e:
+            parser.error(f"--filtros: {e}")
+
+    df_rh = load_with_disk_cache(args.excel)
+    if df_rh.empty:
+        parser.error("O ficheiro não tem dados ou não pôde ser processado.")
+
+    if combinacoes is None:
+        em_falta = [coluna for coluna in args.por if coluna not in df_rh.columns]
+        if em_falta:
+            parser.error(f"--por: colunas inexistentes no ficheiro: {', '.join(em_falta)}")
+        combinacoes = report_combinations(df_rh, args.por)
+
+    # Sem datas, o período abrange todas as admissões e não há filtro de data de admissão;
+    # sem nenhuma data de admissão válida usa-se a data de hoje, como no dashboard
+    admissoes = df_rh['admissao'].dropna()
+    hoje = datetime.date.today()
+    data_inicial = args.data_inicial or (admissoes.min().date() if not admissoes.empty else hoje)
+    data_final = args.data_final or (admissoes.max().date() if not admissoes.empty else hoje)
+    if args.data_inicial or args.data_final:
+        for _, filtros in combinacoes:
+            filtros.setdefault('data_inicial_admissao', data_inicial)
+            filtros.setdefault('data_final_admissao', data_final)
+
+    formatos = ['html', 'json'] if args.formato == 'ambos' else [args.formato]
+    os.makedirs(args.saida, exist_ok=True)
+    ficheiros = _nomes_ficheiros([nome for nome, _ in combinacoes])
+    tarefas = [(nome, ficheiro, filtros, data_inicial, data_final, args.saida, formatos)
+               for (nome, filtros), ficheiro in zip(combinacoes, ficheiros)]
+
+    with ProcessPoolExecutor(max_workers=args.processos, initializer=_iniciar_processo, initargs=(df_rh,)) as pool:
+        for caminhos in pool.map(_gerar, tarefas):
+            print('\n'.join(caminhos))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/conftest.py
+#
+# Benchmarks do pipeline completo (leitura do Excel, pré-processamento, filtros, KPIs e
+# gráficos) sobre ficheiros sintéticos (ver synthetic_data.py). Requer pytest-benchmark:
+#
+#   pip install pytest pytest-benchmark
+#   python -m pytest benchmarks --benchmark-autosave              # guarda os resultados
+#   python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+#
+# Os tamanhos são definidos em RH_BENCH_SIZES (e.g., "1000,100000,1000000") e os ficheiros
+# gerados são reutilizados entre execuções em RH_BENCH_DIR. O pico de memória de cada etapa
+# (tracemalloc) fica em extra_info['pico_memoria_mb'] no relatório do pytest-benchmark.
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import write_workbook
+
+TAMANHOS = [int(t) for t in os.environ.get("RH_BENCH_SIZES", "1000,10000").split(",")]
+BENCH_DIR = os.environ.get("RH_BENCH_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dashboard_rh_bench"))
+
+@pytest.fixture(scope="session", params=TAMANHOS, ids=lambda n: f"{n}_funcionarios")
+def workbook(request):
+    """
+    Caminho de um ficheiro sintético com o número de funcionários do parâmetro.
+    """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    caminho = os.path.join(BENCH_DIR, f"sintetico_{request.param}.xlsx")
+    if not os.path.exists(caminho):
+        write_workbook(caminho + ".tmp.xlsx", request.param, seed=0)
+        os.replace(caminho + ".tmp.xlsx", caminho)
+    return caminho
+
+def pico_memoria(funcao, *args, **kwargs):
+    """
+    Executa a função uma vez com o tracemalloc ativo e devolve o pico de memória em MB.
+    """
+    tracemalloc.start()
+    try:
+        funcao(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+@pytest.fixture
+def medir(benchmark):
+    """
+    Mede uma etapa: tempo com o pytest-benchmark e pico de memória numa execução à parte.
+    """
+    def _medir(funcao, *args, rounds=3, **kwargs):
+        benchmark.extra_info['pico_memoria_mb'] = round(pico_memoria(funcao, *args, **kwargs), 2)
+        return benchmark.pedantic(funcao, args=args, kwargs=kwargs, rounds=rounds, iterations=1)
+    return _medir
@@ -0,0 +1,68 @@
+# benchmarks/test_duckdb_parity.py
+#
+# Verifica que o motor DuckDB (RH_QUERY_BACKEND=duckdb) devolve as mesmas máscaras e
+# contagens que o caminho pandas (FilterIndex + Agregados por linhas) e mede ambos.
+import datetime
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from aggregations import DIMENSOES, compute_aggregates
+from data_loader import load_and_preprocess_data
+from duckdb_backend import DuckDBBackend
+from filter_engine import FilterIndex
+
+# Combinações de filtros com seleções, intervalos, datas a meio do mês e valores inexistentes
+CASOS = {
+    'sem_filtros': {},
+    'status': {'status': ['ATIVO', 'EXPERIENCIA']},
+    'empresa_setor': {'empresa': ['NATURAYO', 'CACTO LTDA'], 'setor': ['PRODUÇÃO', 'ADMINISTRATIVO']},
+    'hierarquia': {'setor': ['PRODUÇÃO'], 'sub_setor': ['LINHA 1'], 'funcao': ['OPERADOR', 'TÉCNICO']},
+    'idade': {'idade_min_selecionada': 30, 'idade_max_selecionada': 45},
+    'filhos': {'filho(s)': ['SIM'], 'quantos_min_selecionados': 2, 'quantos_max_selecionados': 3},
+    'datas': {'data_inicial_admissao': datetime.date(2012, 3, 15), 'data_final_admissao': datetime.date(2020, 7, 9)},
+    'valor_inexistente': {'raca': ['NÃO EXISTE']},
+    'combinado': {
+        'status': ['ATIVO'], 'custo': ['DIRETO'], 'sexo': ['FEMININO'], 'nivel_escolaridade': ['Médio'],
+        'idade_min_selecionada': 25, 'data_inicial_admissao': datetime.date(2015, 1, 1),
+    },
+}
+
+@pytest.fixture(scope="module")
+def df_rh(workbook):
+    return load_and_preprocess_data(workbook)
+
+@pytest.fixture(scope="module")
+def motores(df_rh):
+    return FilterIndex(df_rh, cache_size=0), DuckDBBackend(df_rh, cache_size=0)
+
+@pytest.mark.parametrize("caso", list(CASOS))
+def test_mascaras_iguais(motores, caso):
+    indice, duck = motores
+    filtros = CASOS[caso]
+    assert duck.normalize_filters(filtros) == indice.normalize_filters(filtros)
+    assert (duck.mask(filtros) == indice.mask(filtros)).all()
+
+@pytest.mark.parametrize("caso", list(CASOS))
+def test_contagens_iguais(df_rh, motores, caso):
+    indice, duck = motores
+    filtros = CASOS[caso]
+    por_linhas = compute_aggregates(df_rh, indice.mask(filtros))
+    em_sql = compute_aggregates(df_rh, None, duck.slice(duck.normalize_filters(filtros)))
+    assert em_sql.total == por_linhas.total
+    for coluna in DIMENSOES + ['admissoes_por_mes']:
+        assert em_sql.fingerprint(coluna) == por_linhas.fingerprint(coluna), coluna
+
+@pytest.mark.parametrize("motor", ['pandas', 'duckdb'])
+def test_filtros_e_contagens(medir, df_rh, motores, motor):
+    indice, duck = motores
+    filtros = CASOS['combinado']
+
+    def consultar():
+        if motor == 'duckdb':
+            agregados = compute_aggregates(df_rh, None, duck.slice(duck.normalize_filters(filtros)))
+        else:
+            agregados = compute_aggregates(df_rh, indice.mask(filtros))
+        return [agregados.serie(coluna) for coluna in DIMENSOES if coluna in df_rh.columns]
+    medir(consultar, rounds=10)
@@ -0,0 +1,106 @@
+# benchmarks/test_incremental.py
+#
+# Verifica que o recarregamento incremental de uma nova versão de um ficheiro (ver
+# data_loader.load_incremental) dá o mesmo DataFrame que o processamento completo,
+# depois de editar, remover e reordenar linhas de 'TODOS' e de alterar 'Férias' e
+# 'DESLIGADOS'.
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_store
+import data_loader
+from data_loader import load_and_preprocess_data, load_with_disk_cache
+from synthetic_data import generate_workbook_frames
+
+N_FUNCIONARIOS = 1000
+
+def _editar_todos(abas):
+    todos = abas['TODOS']
+    todos.loc[todos.index[10:20], 'Status'] = 'AFASTADO'
+    todos.loc[todos.index[30], 'Admissão'] = pd.Timestamp('2019-05-17')
+
+def _remover_todos(abas):
+    abas['TODOS'] = abas['TODOS'].drop(abas['TODOS'].index[::50])
+
+def _reordenar_todos(abas):
+    abas['TODOS'] = abas['TODOS'].iloc[np.random.default_rng(1).permutation(len(abas['TODOS']))]
+
+def _acrescentar_todos(abas):
+    todos = abas['TODOS']
+    novas = todos.iloc[:5].assign(**{'Matrícula': [f'NOVA{i}' for i in range(5)], 'Nome': [f'Nova {i}' for i in range(5)]})
+    abas['TODOS'] = pd.concat([todos, novas], ignore_index=True)
+
+def _editar_ferias(abas):
+    ferias = abas['Férias']
+    ferias.loc[ferias.index[:15], 'Previsão Férias 2025'] = 'Dezembro'
+    abas['Férias'] = ferias.drop(ferias.index[20:25])
+
+def _repetir_nome_ferias(abas):
+    # Duas linhas do mesmo nome com meses diferentes: o JoinIndex usa a primeira
+    ferias = abas['Férias']
+    ferias.loc[ferias.index[:2], 'Nome'] = ferias['Nome'].iloc[0]
+    ferias.loc[ferias.index[:2], 'Previsão Férias 2025'] = ['Outubro', 'Maio']
+
+def _reordenar_ferias(abas):
+    ferias = abas['Férias']
+    abas['Férias'] = ferias.iloc[[1, 0] + list(range(2, len(ferias)))]
+
+def _editar_desligados(abas):
+    desligados = abas['DESLIGADOS']
+    desligados.loc[desligados.index[:5], 'Demissão'] = pd.Timestamp('2024-02-29')
+    abas['DESLIGADOS'] = pd.concat([desligados, desligados.iloc[[6]].assign(**{'Demissão': pd.Timestamp('2025-01-31')})])
+
+# Caso -> (preparação da primeira versão, alterações que dão a segunda versão)
+ALTERACOES = {
+    'edicoes': ([], [_editar_todos]),
+    'remocoes': ([], [_remover_todos]),
+    'reordenacao': ([], [_reordenar_todos]),
+    'novas_linhas': ([], [_acrescentar_todos]),
+    'ferias': ([], [_editar_ferias]),
+    'ordem_ferias': ([_repetir_nome_ferias], [_reordenar_ferias]),
+    'desligados': ([], [_editar_desligados]),
+    'todas': ([_repetir_nome_ferias], [_editar_todos, _remover_todos, _reordenar_todos, _acrescentar_todos,
+                                       _reordenar_ferias, _editar_ferias, _editar_desligados]),
+}
+
+def _gravar(caminho, abas):
+    with pd.ExcelWriter(caminho) as writer:
+        for nome, df in abas.items():
+            df.to_excel(writer, sheet_name=nome, index=False)
+
+@pytest.fixture
+def linhas_processadas(tmp_path, monkeypatch):
+    """
+    Cache em disco num diretório temporário; regista o número de linhas de 'TODOS' que
+    passam por preprocess_rows em cada carregamento.
+    """
+    monkeypatch.setattr(cache_store, 'CACHE_DIR', str(tmp_path / 'cache'))
+    contagens = []
+    original = data_loader.preprocess_rows
+
+    def contar(df_todos, *args):
+        contagens.append(len(df_todos))
+        return original(df_todos, *args)
+    monkeypatch.setattr(data_loader, 'preprocess_rows', contar)
+    return contagens
+
+@pytest.mark.parametrize("caso", list(ALTERACOES))
+def test_recarregamento_incremental_igual_ao_completo(tmp_path, linhas_processadas, caso):
+    preparacao, alteracoes = ALTERACOES[caso]
+    abas = generate_workbook_frames(N_FUNCIONARIOS, seed=3)
+    for alterar in preparacao:
+        alterar(abas)
+    caminho = str(tmp_path / 'dados.xlsx')
+    _gravar(caminho, abas)
+    load_with_disk_cache(caminho)
+
+    for alterar in alteracoes:
+        alterar(abas)
+    _gravar(caminho, abas)
+    carregamentos = len(linhas_processadas)
+    incremental = load_with_disk_cache(caminho)
+
+    # O segundo carregamento só reprocessou parte das linhas
+    assert sum(linhas_processadas[carregamentos:]) < len(incremental)
+    pd.testing.assert_frame_equal(incremental, load_and_preprocess_data(caminho))
@@ -0,0 +1,173 @@
+# benchmarks/test_pipeline.py
+import datetime
+
+import pandas as pd
+import pytest
+
+from aggregations import DIMENSOES, compute_aggregates
+from charts import create_employees_by_company_chart, create_employees_by_function_chart, \
+    create_employees_by_children_chart, create_gender_distribution_chart, \
+    create_education_level_distribution_chart, create_monthly_admissions_chart, \
+    create_cost_type_distribution_chart, create_hires_vs_terminations_chart
+from data_loader import read_workbook, preprocess_rows, load_and_preprocess_data
+from events import monthly_flows
+from filter_catalog import FilterCatalog
+from filter_engine import FilterIndex
+from kpis import compute_kpis
+from olap_cube import OlapCube
+from synthetic_data import generate_workbook_frames
+from utils import FreqUnica, codificar_categorias, ordem_escolaridade
+
+DATA_INICIAL = datetime.date(2020, 1, 1)
+DATA_FINAL = datetime.date(2024, 12, 31)
+
+# Uma combinação típica dos filtros da barra lateral
+FILTROS = {
+    'status': ['ATIVO', 'EXPERIENCIA'],
+    'custo': ['DIRETO'],
+    'idade_min_selecionada': 25,
+    'idade_max_selecionada': 50,
+    'data_inicial_admissao': DATA_INICIAL,
+    'data_final_admissao': DATA_FINAL,
+}
+
+@pytest.fixture(scope="session")
+def abas(workbook):
+    return read_workbook(workbook)
+
+@pytest.fixture(scope="session")
+def df_rh(workbook):
+    return load_and_preprocess_data(workbook)
+
+@pytest.fixture(scope="session")
+def mascara(df_rh):
+    return FilterIndex(df_rh).mask(FILTROS)
+
+@pytest.fixture(scope="session")
+def agregados(df_rh, mascara):
+    return compute_aggregates(df_rh, mascara)
+
+def test_leitura_excel(medir, workbook):
+    medir(read_workbook, workbook, rounds=1)
+
+def test_colunas_fora_do_esquema(tmp_path):
+    # As restantes colunas de 'TODOS' são mantidas (com tipos mistos passam a texto),
+    # mas 'cpf' e 'rg' nunca são lidas
+    abas = generate_workbook_frames(50, seed=1)
+    abas['TODOS'] = abas['TODOS'].assign(CPF='000.000.000-00', RG=1, **{'Observações': ['texto', 1] * 25})
+    caminho = str(tmp_path / 'extras.xlsx')
+    with pd.ExcelWriter(caminho) as writer:
+        for nome, df in abas.items():
+            df.to_excel(writer, sheet_name=nome, index=False)
+    df = load_and_preprocess_data(caminho)
+    assert 'cpf' not in df.columns and 'rg' not in df.columns
+    assert df['observacoes'].tolist() == ['texto', '1'] * 25
+
+def test_preprocessamento(medir, abas):
+    def preprocessar():
+        df = preprocess_rows(*(aba.copy() for aba in abas))
+        codificar_categorias(df)
+    medir(preprocessar)
+
+def test_indice_filtros(medir, df_rh):
+    medir(FilterIndex, df_rh)
+
+def test_aplicar_filtros(medir, df_rh):
+    # Sem cache de máscaras, para medir o cálculo completo a cada execução
+    indice = FilterIndex(df_rh, cache_size=0)
+    medir(lambda: df_rh[indice.mask(FILTROS)], rounds=10)
+
+def test_periodo_completo_exclui_datas_em_falta(df_rh):
+    # Com o período de admissão a abranger todas as datas, as linhas sem data continuam
+    # excluídas, como na comparação original sobre 'admissao'
+    filtros = {'data_inicial_admissao': df_rh['admissao'].min().date(),
+               'data_final_admissao': df_rh['admissao'].max().date()}
+    original = (df_rh['admissao'].dt.date >= filtros['data_inicial_admissao']) & \
+        (df_rh['admissao'].dt.date <= filtros['data_final_admissao'])
+    assert (FilterIndex(df_rh).mask(filtros) == original.to_numpy()).all()
+
+def test_agregados(medir, df_rh, mascara):
+    # As dimensões são contadas na primeira utilização: mede-se a contagem de todas
+    def agregar():
+        agregados = compute_aggregates(df_rh, mascara)
+        return [agregados.serie(coluna) for coluna in DIMENSOES if coluna in df_rh.columns]
+    medir(agregar, rounds=10)
+
+def test_cubo_olap(medir, df_rh):
+    medir(OlapCube, df_rh)
+
+# Períodos de admissão respondidos pelo cubo: alinhado ao mês, a meio do mês (as linhas dos
+# meses parciais são filtradas uma a uma) e dentro de um único mês
+PERIODOS = {
+    'meses': (DATA_INICIAL, DATA_FINAL),
+    'meio_do_mes': (datetime.date(2020, 3, 17), datetime.date(2024, 11, 5)),
+    'um_mes': (datetime.date(2022, 6, 10), datetime.date(2022, 6, 20)),
+}
+
+@pytest.mark.parametrize("periodo", list(PERIODOS))
+def test_agregados_cubo(medir, df_rh, periodo):
+    # As contagens pelo cubo têm de ser as do caminho por linhas
+    data_inicial, data_final = PERIODOS[periodo]
+    filtros = dict(FILTROS, idade_min_selecionada=None, idade_max_selecionada=None,
+                   data_inicial_admissao=data_inicial, data_final_admissao=data_final)
+    indice = FilterIndex(df_rh)
+    cubo = OlapCube(df_rh)
+    fatia = cubo.slice(indice.normalize_filters(filtros))
+    assert fatia is not None
+    por_linhas = compute_aggregates(df_rh, indice.mask(filtros))
+    pelo_cubo = compute_aggregates(df_rh, lambda: indice.mask(filtros), fatia)
+    for coluna in DIMENSOES + ['admissoes_por_mes']:
+        assert pelo_cubo.fingerprint(coluna) == por_linhas.fingerprint(coluna), coluna
+
+    def agregar():
+        agregados = compute_aggregates(df_rh, None, cubo.slice(indice.normalize_filters(filtros)))
+        return [agregados.serie(coluna) for coluna in DIMENSOES if coluna in cubo.dimensoes]
+    medir(agregar, rounds=10)
+
+def test_catalogo_filtros(medir, df_rh):
+    medir(FilterCatalog, df_rh)
+
+def test_opcoes_hierarquicas(medir, df_rh):
+    catalogo = FilterCatalog(df_rh)
+    selecoes = {'empresa': catalogo.options('empresa')[:2], 'setor': catalogo.options('setor')[:1]}
+    medir(catalogo.narrowed, 'funcao', selecoes, rounds=100)
+
+def test_kpis(medir, df_rh, mascara):
+    df_filtrado = df_rh[mascara]
+    medir(compute_kpis, df_filtrado, DATA_INICIAL, DATA_FINAL, rounds=10)
+
+def test_fluxos_contam_admissoes_e_demissoes_independentes(df_rh):
+    # Uma demissão conta mesmo numa linha sem data de admissão
+    fluxos = monthly_flows(df_rh)
+    assert fluxos['contratacoes'].sum() == df_rh['admissao'].notna().sum()
+    assert fluxos['desligamentos'].sum() == df_rh['demissao'].notna().sum()
+    por_mes = df_rh['demissao'].dropna().dt.to_period('M').dt.to_timestamp().value_counts()
+    # O primeiro mês também recebe as demissões anteriores a ele (ver monthly_flows)
+    assert (fluxos['desligamentos'].iloc[1:] == por_mes.reindex(fluxos.index[1:], fill_value=0)).all()
+    assert (fluxos['headcount'] >= 0).all()
+
+def test_fluxos_mensais(medir, df_rh):
+    medir(monthly_flows, df_rh, None, DATA_INICIAL, DATA_FINAL, rounds=10)
+
+# Os gráficos são medidos sem a cache de figuras (função original em __wrapped__)
+GRAFICOS = {
+    'funcao': (create_employees_by_function_chart, ()),
+    'filhos': (create_employees_by_children_chart, ()),
+    'sexo': (create_gender_distribution_chart, ()),
+    'escolaridade': (create_education_level_distribution_chart, (ordem_escolaridade,)),
+    'admissoes_mes': (create_monthly_admissions_chart, ()),
+    'custo': (create_cost_type_distribution_chart, ()),
+}
+
+@pytest.mark.parametrize("grafico", list(GRAFICOS))
+def test_graficos(medir, agregados, grafico):
+    funcao, extra = GRAFICOS[grafico]
+    medir(funcao.__wrapped__, agregados, *extra, rounds=5)
+
+def test_grafico_empresas(medir, df_rh, mascara):
+    df_filtrado = df_rh[mascara]
+    medir(lambda: create_employees_by_company_chart.__wrapped__(FreqUnica(df_filtrado, 'empresa', 'nome')), rounds=5)
+
+def test_grafico_contratacoes_desligamentos(medir, df_rh):
+    fluxos = monthly_flows(df_rh, None, DATA_INICIAL, DATA_FINAL)
+    medir(create_hires_vs_terminations_chart.__wrapped__, fluxos, rounds=5)
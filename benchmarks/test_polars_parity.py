@@ -0,0 +1,38 @@
+# benchmarks/test_polars_parity.py
+#
+# Verifica que o pré-processamento em Polars (RH_PREPROCESSING_BACKEND=polars) devolve o
+# mesmo DataFrame que o pandas (data_loader.preprocess_rows) e mede ambos.
+import pandas as pd
+import pytest
+
+pytest.importorskip("polars")
+
+from data_loader import SHEET_SCHEMAS, read_workbook, preprocess_rows
+from data_loader_polars import preprocess_rows_polars
+
+MOTORES = {'pandas': preprocess_rows, 'polars': preprocess_rows_polars}
+
+@pytest.fixture(scope="module")
+def abas(workbook):
+    return read_workbook(workbook)
+
+def test_resultado_igual(abas):
+    por_pandas = preprocess_rows(*(aba.copy() for aba in abas))
+    pd.testing.assert_frame_equal(preprocess_rows_polars(*abas), por_pandas)
+
+def test_resultado_igual_sem_enriquecimento(abas):
+    # Como em data_loader.preprocess_preview: sem 'Férias' nem 'DESLIGADOS'
+    df_ferias = pd.DataFrame(columns=list(SHEET_SCHEMAS['Férias']))
+    por_pandas = preprocess_rows(abas[0].copy(), df_ferias, pd.DataFrame())
+    pd.testing.assert_frame_equal(preprocess_rows_polars(abas[0], df_ferias, pd.DataFrame()), por_pandas)
+
+def test_resultado_igual_subconjunto(abas):
+    # Como em data_loader.load_incremental: apenas algumas linhas de 'TODOS'
+    df_todos, df_ferias, df_desligados = abas
+    linhas = df_todos.index % 3 == 0
+    por_pandas = preprocess_rows(df_todos[linhas].copy(), df_ferias, df_desligados)
+    pd.testing.assert_frame_equal(preprocess_rows_polars(df_todos[linhas], df_ferias, df_desligados), por_pandas)
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_preprocessamento_motor(medir, abas, motor):
+    medir(lambda: MOTORES[motor](*(aba.copy() for aba in abas)))
@@ -0,0 +1,104 @@
+# benchmarks/test_snapshots.py
+#
+# Verifica o armazenamento de snapshots (ver snapshot_store.py): leitura "as of",
+# deduplicação das linhas entre datas, reescrita de uma data passada e retenção.
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import snapshot_store
+from data_loader import load_and_preprocess_data
+from snapshot_store import breakdown_as_of, list_snapshots, load_snapshot, prune_snapshots, save_snapshot
+from tenure import compute_tenure, format_tenure_text
+
+NOME = 'dados.xlsx'
+D1 = datetime.date(2025, 1, 31)
+D2 = datetime.date(2025, 2, 28)
+
+@pytest.fixture(scope="module")
+def df_rh(workbook):
+    return load_and_preprocess_data(workbook)
+
+@pytest.fixture
+def df_alterado(df_rh):
+    # Segunda versão: dez funcionários ativos passam a desligados
+    df = df_rh.copy()
+    df.loc[df.index[df['status'] == 'ATIVO'][:10], 'status'] = 'DESLIGADO'
+    return df
+
+@pytest.fixture(autouse=True)
+def diretorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_RETENTION_DAYS', 0)
+    snapshot_store._carregar.cache_clear()
+    yield tmp_path
+    snapshot_store._carregar.cache_clear()
+
+def _colunas_guardadas(df):
+    return [c for c in df.columns if c not in snapshot_store._COLUNAS_RELATIVAS]
+
+def _assert_snapshot_igual(carregado, df):
+    colunas = _colunas_guardadas(df)
+    # As categorias são recalculadas a partir das linhas do snapshot (ver codificar_categorias)
+    pd.testing.assert_frame_equal(carregado[colunas], df[colunas].reset_index(drop=True), check_categorical=False)
+
+def _linhas_gravadas(data):
+    caminho = os.path.join(snapshot_store._particao(NOME, data), 'linhas.parquet')
+    return len(pd.read_parquet(caminho))
+
+def test_guardar_e_ler(df_rh, df_alterado):
+    save_snapshot(NOME, df_rh, D1)
+    save_snapshot(NOME, df_alterado, D2)
+    assert list_snapshots(NOME) == [D1, D2]
+    _assert_snapshot_igual(load_snapshot(NOME, D1), df_rh)
+    _assert_snapshot_igual(load_snapshot(NOME, D2), df_alterado)
+
+def test_linhas_iguais_gravadas_uma_vez(df_rh, df_alterado):
+    save_snapshot(NOME, df_rh, D1)
+    save_snapshot(NOME, df_alterado, D2)
+    assert _linhas_gravadas(D1) == len(df_rh.drop_duplicates(_colunas_guardadas(df_rh)))
+    assert _linhas_gravadas(D2) == 10
+
+def test_consulta_as_of(df_rh, df_alterado):
+    save_snapshot(NOME, df_rh, D1)
+    save_snapshot(NOME, df_alterado, D2)
+    # Entre as duas datas vale o snapshot mais recente anterior
+    _assert_snapshot_igual(load_snapshot(NOME, D2 - datetime.timedelta(days=1)), df_rh)
+    esperado = df_alterado['status'].value_counts()
+    pd.testing.assert_series_equal(breakdown_as_of(NOME, D2, 'status'), esperado[esperado > 0])
+    with pytest.raises(KeyError):
+        load_snapshot(NOME, D1 - datetime.timedelta(days=1))
+
+def test_tempo_de_empresa_na_data_do_snapshot(df_rh):
+    save_snapshot(NOME, df_rh, D1)
+    carregado = load_snapshot(NOME, D1, ['tempo_de_empresa'])
+    assert list(carregado.columns) == ['tempo_de_empresa']
+    esperado = format_tenure_text(compute_tenure(df_rh['admissao'], D1)).reset_index(drop=True)
+    assert carregado['tempo_de_empresa'].tolist() == esperado.tolist()
+
+def test_reescrever_data_passada(df_rh, df_alterado):
+    save_snapshot(NOME, df_rh, D1)
+    save_snapshot(NOME, df_alterado, D2)
+    # As linhas de D1 usadas por D2 continuam disponíveis depois de D1 ser substituído
+    save_snapshot(NOME, df_rh.iloc[:20], D1)
+    _assert_snapshot_igual(load_snapshot(NOME, D1), df_rh.iloc[:20])
+    _assert_snapshot_igual(load_snapshot(NOME, D2), df_alterado)
+
+def test_retencao(diretorio, monkeypatch, df_rh, df_alterado):
+    hoje = datetime.date.today()
+    antiga, recente = hoje - datetime.timedelta(days=60), hoje - datetime.timedelta(days=10)
+    save_snapshot(NOME, df_rh, antiga)
+    save_snapshot('outro.xlsx', df_rh, antiga)
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_RETENTION_DAYS', 30)
+    save_snapshot(NOME, df_alterado, recente)
+
+    # O snapshot antigo é removido, mas as linhas que o recente reutiliza são mantidas
+    assert list_snapshots(NOME) == [recente]
+    assert list_snapshots('outro.xlsx') == []
+    assert len(os.listdir(diretorio)) == 1
+    _assert_snapshot_igual(load_snapshot(NOME, recente), df_alterado)
+    assert prune_snapshots() == 0
@@ -0,0 +1,207 @@
+# cache_store.py
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+from config import CACHE_DIR, CACHE_MAX_MB
+
+# O pyarrow é opcional: sem ele o cache em disco é simplesmente desativado
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+def workbook_fingerprint(excel_file):
+    """
+    Calcula o hash SHA-256 do conteúdo de um ficheiro Excel.
+
+    Args:
+        excel_file (str ou file-like object): Caminho do ficheiro ou objeto carregado
+                                              (e.g., st.UploadedFile).
+
+    Returns:
+        str: O hash hexadecimal do conteúdo do ficheiro.
+    """
+    if isinstance(excel_file, (str, os.PathLike)):
+        with open(excel_file, 'rb') as f:
+            conteudo = f.read()
+    elif hasattr(excel_file, 'getvalue'):
+        conteudo = excel_file.getvalue() # Não altera a posição de leitura do UploadedFile
+    else:
+        posicao = excel_file.tell()
+        conteudo = excel_file.read()
+        excel_file.seek(posicao)
+    return hashlib.sha256(conteudo).hexdigest()
+
+def cache_key(fingerprint, versao):
+    """
+    Combina o hash do ficheiro com a versão do pré-processamento numa chave de cache.
+    Alterar a versão do pré-processamento invalida automaticamente as entradas antigas.
+
+    Args:
+        fingerprint (str): Hash do conteúdo do ficheiro Excel.
+        versao (str): Versão do pipeline de pré-processamento.
+
+    Returns:
+        str: A chave usada como nome do ficheiro Parquet.
+    """
+    return hashlib.sha256(f"{fingerprint}:{versao}".encode('utf-8')).hexdigest()
+
+def _cache_path(chave):
+    return os.path.join(CACHE_DIR, f"{chave}.parquet")
+
+def _state_path(nome):
+    return os.path.join(CACHE_DIR, f"estado_{hashlib.sha256(nome.encode('utf-8')).hexdigest()}.pkl")
+
+def has_cached_frame(chave):
+    """
+    Indica se existe um DataFrame guardado no cache em disco para a chave.
+
+    Args:
+        chave (str): Chave devolvida por cache_key.
+
+    Returns:
+        bool: True se a entrada existir.
+    """
+    return PARQUET_DISPONIVEL and os.path.exists(_cache_path(chave))
+
+def load_cached_frame(chave):
+    """
+    Lê um DataFrame pré-processado do cache em disco, se existir.
+    A data de modificação do ficheiro é atualizada para servir de referência à política LRU.
+
+    Args:
+        chave (str): Chave devolvida por cache_key.
+
+    Returns:
+        pd.DataFrame ou None: O DataFrame guardado, ou None se não estiver em cache.
+    """
+    if not PARQUET_DISPONIVEL:
+        return None
+
+    caminho = _cache_path(chave)
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        df = pd.read_parquet(caminho, engine='pyarrow')
+    except Exception as erro: # Ficheiro corrompido ou escrito por uma versão incompatível
+        logger.warning("Entrada de cache inválida removida (%s): %s", caminho, erro)
+        _remover(caminho)
+        return None
+
+    os.utime(caminho, None) # Marca como usado recentemente
+    return df
+
+def store_frame(chave, df):
+    """
+    Guarda um DataFrame pré-processado no cache em disco e aplica a política de remoção LRU.
+    A escrita é feita num ficheiro temporário e depois renomeada, para que leitores
+    concorrentes (outras réplicas) nunca vejam um ficheiro incompleto.
+
+    Args:
+        chave (str): Chave devolvida por cache_key.
+        df (pd.DataFrame): O DataFrame a guardar.
+
+    Returns:
+        bool: True se o DataFrame foi guardado, False caso contrário.
+    """
+    if not PARQUET_DISPONIVEL:
+        return False
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    descritor, caminho_tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(descritor)
+    try:
+        df.to_parquet(caminho_tmp, engine='pyarrow', index=False)
+        os.replace(caminho_tmp, _cache_path(chave))
+    except Exception as erro: # e.g., colunas com tipos mistos que o Arrow não consegue converter
+        logger.warning("Não foi possível guardar o DataFrame no cache em disco: %s", erro)
+        _remover(caminho_tmp)
+        return False
+
+    evict_cache(CACHE_MAX_MB * 1024 * 1024)
+    return True
+
+def load_state(nome):
+    """
+    Lê o estado de ingestão incremental guardado para um ficheiro (identificado pelo nome).
+
+    Args:
+        nome (str): O nome do ficheiro Excel (e.g., UploadedFile.name).
+
+    Returns:
+        dict ou None: O estado guardado (ver incremental.build_state), ou None se não existir.
+    """
+    caminho = _state_path(nome)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'rb') as f:
+            estado = pickle.load(f)
+    except Exception as erro:
+        logger.warning("Estado incremental inválido removido (%s): %s", caminho, erro)
+        _remover(caminho)
+        return None
+    os.utime(caminho, None)
+    return estado
+
+def store_state(nome, estado):
+    """
+    Guarda o estado de ingestão incremental de um ficheiro (escrita atómica).
+
+    Args:
+        nome (str): O nome do ficheiro Excel.
+        estado (dict): O estado a guardar (ver incremental.build_state).
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    descritor, caminho_tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho_tmp, _state_path(nome))
+    except Exception as erro:
+        logger.warning("Não foi possível guardar o estado incremental: %s", erro)
+        _remover(caminho_tmp)
+
+def evict_cache(max_bytes):
+    """
+    Remove as entradas menos usadas recentemente até o cache caber no limite indicado.
+
+    Args:
+        max_bytes (int): Tamanho máximo permitido para o diretório de cache, em bytes.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entradas = []
+    for nome in os.listdir(CACHE_DIR):
+        if not nome.endswith(('.parquet', '.pkl')):
+            continue
+        caminho = os.path.join(CACHE_DIR, nome)
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError: # Removido por outro processo entretanto
+            continue
+        entradas.append((info.st_mtime, info.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    # Ordena da entrada mais antiga para a mais recente
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= max_bytes:
+            break
+        _remover(caminho)
+        total -= tamanho
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
@@ -3,6 +3,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
+from figure_cache import cached_figure
+from perf import timed
+
+@cached_figure()
+@timed()
 def create_employees_by_company_chart(df):
     """
     Cria um gráfico de barras que mostra a frequência de funcionários por empresa.
@@ -44,20 +49,22 @@ def create_employees_by_company_chart(df):
     )
     return fig
 
-def create_employees_by_function_chart(df):
+@cached_figure('funcao')
+@timed()
+def create_employees_by_function_chart(agregados):
     """
     Cria um gráfico de barras que mostra o número de funcionários por função.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo a coluna 'funcao'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
 
     Returns:
         go.Figure: Objeto de figura do gráfico de barras Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Funcionários por Função.")
 
-    count_por_funcao = df['funcao'].value_counts().reset_index()
+    count_por_funcao = agregados.serie('funcao').reset_index()
     count_por_funcao.columns = ['Função', 'Count'] # Renomeia as colunas
     fig = px.bar(
         count_por_funcao,
@@ -72,20 +79,22 @@ def create_employees_by_function_chart(df):
     fig.update_layout(xaxis_title="Função", yaxis_title="Contagem", xaxis_tickangle=-45)
     return fig
 
-def create_employees_by_children_chart(df):
+@cached_figure('quantos')
+@timed()
+def create_employees_by_children_chart(agregados):
     """
     Cria um gráfico de barras que mostra o número de funcionários pela quantidade de filhos.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo a coluna 'quantos'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
 
     Returns:
         go.Figure: Objeto de figura do gráfico de barras Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Distribuição de Filhos.")
 
-    filhos_counts = df['quantos'].value_counts().sort_index().reset_index()
+    filhos_counts = agregados.serie('quantos').sort_index().reset_index()
     filhos_counts.columns = ['Número de Filhos', 'Count']
     fig = px.bar(
         filhos_counts,
@@ -99,20 +108,22 @@ def create_employees_by_children_chart(df):
     fig.update_layout(xaxis_title="Número de Filhos", yaxis_title="Contagem")
     return fig
 
-def create_gender_distribution_chart(df):
+@cached_figure('sexo')
+@timed()
+def create_gender_distribution_chart(agregados):
     """
     Cria um gráfico de pizza que mostra a distribuição de funcionários por género.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo a coluna 'sexo'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
 
     Returns:
         go.Figure: Objeto de figura do gráfico de pizza Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Gênero.")
 
-    sexo_counts_chart = df['sexo'].value_counts().reset_index()
+    sexo_counts_chart = agregados.serie('sexo').reset_index()
     sexo_counts_chart.columns = ['Sexo', 'Count']
     fig = px.pie(
         sexo_counts_chart,
@@ -125,26 +136,28 @@ def create_gender_distribution_chart(df):
     fig.update_traces(textinfo='percent+label', pull=[0.05] * len(sexo_counts_chart))
     return fig
 
-def create_education_level_distribution_chart(df, order_categories=None):
+@cached_figure('nivel_escolaridade')
+@timed()
+def create_education_level_distribution_chart(agregados, order_categories=None):
     """
     Cria um gráfico de pizza que mostra a distribuição por nível de escolaridade.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo a coluna 'nivel_escolaridade'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
         order_categories (list, optional): Lista que define a ordem das categorias.
                                           Útil para ordenar categorias de escolaridade.
 
     Returns:
         go.Figure: Objeto de figura do gráfico de pizza Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Escolaridade.")
 
     if order_categories:
         # Reindexa para garantir a ordem e inclui categorias com zero (se não houver dados para elas)
-        escolaridade_counts_chart = df['nivel_escolaridade'].value_counts().reindex(order_categories, fill_value=0).reset_index()
+        escolaridade_counts_chart = agregados.serie('nivel_escolaridade').reindex(order_categories, fill_value=0).reset_index()
     else:
-        escolaridade_counts_chart = df['nivel_escolaridade'].value_counts().reset_index()
+        escolaridade_counts_chart = agregados.serie('nivel_escolaridade').reset_index()
 
     escolaridade_counts_chart.columns = ['Nível Escolaridade', 'Count']
     fig = px.pie(
@@ -157,24 +170,24 @@ def create_education_level_distribution_chart(df, order_categories=None):
     fig.update_traces(textinfo='percent+label', pull=[0.05] * len(escolaridade_counts_chart))
     return fig
 
-def create_monthly_admissions_chart(df):
+@cached_figure('admissoes_por_mes')
+@timed()
+def create_monthly_admissions_chart(agregados):
     """
     Cria um gráfico de linha que mostra o número de novas admissões por mês.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo as colunas 'admissao' e 'ald'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
 
     Returns:
         go.Figure: Objeto de figura do gráfico de linha Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Admissões por Mês.")
 
-    # Agrupa por mês de admissão e conta o número de 'ald' (funcionários)
-    admissoes_por_mes = df.groupby(df['admissao'].dt.to_period('M'))['ald'].count().reset_index()
+    # Número de 'ald' (funcionários) por mês de admissão, já com o mês no formato 'AAAA-MM'
+    admissoes_por_mes = agregados.admissoes_por_mes().reset_index()
     admissoes_por_mes.columns = ['Mês', 'Novas Admissões']
-    # Converte o período do mês para string para exibição no eixo X
-    admissoes_por_mes['Mês'] = admissoes_por_mes['Mês'].astype(str)
 
     fig = px.line(
         admissoes_por_mes,
@@ -186,20 +199,22 @@ def create_monthly_admissions_chart(df):
     )
     return fig
 
-def create_cost_type_distribution_chart(df):
+@cached_figure('custo')
+@timed()
+def create_cost_type_distribution_chart(agregados):
     """
     Cria um gráfico de pizza que mostra a distribuição por tipo de custo.
 
     Args:
-        df (pd.DataFrame): DataFrame filtrado contendo a coluna 'custo'.
+        agregados (Agregados): Contagens dos dados filtrados (ver aggregations.compute_aggregates).
 
     Returns:
         go.Figure: Objeto de figura do gráfico de pizza Plotly.
     """
-    if df.empty:
+    if agregados.empty:
         return go.Figure().update_layout(title_text="Sem dados para Tipo de Custo.")
 
-    custo_tipo_counts = df['custo'].value_counts().reset_index()
+    custo_tipo_counts = agregados.serie('custo').reset_index()
     custo_tipo_counts.columns = ['Tipo de Custo', 'Count']
     fig = px.pie(
         custo_tipo_counts,
@@ -242,34 +257,34 @@ def create_cost_type_distribution_chart(df):
 #     fig.update_xaxes(dtick="M1", tickformat="%b\n%Y") # Formato de mês/ano
 #     return fig
 
-def create_hires_vs_terminations_chart(df):
-    """
-    Cria um gráfico de barras comparando contratações e desligamentos por mês.
+@cached_figure()
+@timed()
+def create_hires_vs_terminations_chart(fluxos):
     """
-    if df.empty:
-        return go.Figure().update_layout(title_text="Sem dados para Contratações vs. Desligamentos.")
+    Cria um gráfico de barras comparando contratações e desligamentos por mês, com o
+    número de funcionários no fim de cada mês (headcount) numa linha no eixo secundário.
 
-    # Agrupa contratações por mês
-    df_contratacoes = df.groupby(df['admissao'].dt.to_period('M')).size().reset_index(name='Contratações')
-    df_contratacoes['admissao'] = df_contratacoes['admissao'].dt.to_timestamp()
-
-    # Agrupa desligamentos por mês (baseado na data de admissão e status 'DESLIGADO' como proxy)
-    df_desligamentos = df[df['status'] == 'DESLIGADO'].groupby(df['admissao'].dt.to_period('M')).size().reset_index(name='Desligamentos')
-    df_desligamentos['admissao'] = df_desligamentos['admissao'].dt.to_timestamp()
+    Args:
+        fluxos (pd.DataFrame): Resultado de events.monthly_flows.
 
-    # Une os DataFrames
-    df_merged = pd.merge(df_contratacoes, df_desligamentos, on='admissao', how='outer').fillna(0)
-    df_merged = df_merged.sort_values('admissao')
+    Returns:
+        go.Figure: Objeto de figura do gráfico Plotly.
+    """
+    if fluxos.empty:
+        return go.Figure().update_layout(title_text="Sem dados para Contratações vs. Desligamentos.")
 
     fig = go.Figure(data=[
-        go.Bar(name='Contratações', x=df_merged['admissao'], y=df_merged['Contratações'], marker_color='#3b82f6'),
-        go.Bar(name='Desligamentos', x=df_merged['admissao'], y=df_merged['Desligamentos'], marker_color='#ef4444')
+        go.Bar(name='Contratações', x=fluxos.index, y=fluxos['contratacoes'], marker_color='#3b82f6'),
+        go.Bar(name='Desligamentos', x=fluxos.index, y=fluxos['desligamentos'], marker_color='#ef4444'),
+        go.Scatter(name='Headcount', x=fluxos.index, y=fluxos['headcount'], mode='lines+markers',
+                   line=dict(color='#10b981'), yaxis='y2')
     ])
     fig.update_layout(
         barmode='group',
         title='Contratações vs. Desligamentos Mensais',
         xaxis_title='Mês',
         yaxis_title='Contagem',
+        yaxis2=dict(title='Headcount', overlaying='y', side='right', showgrid=False),
         xaxis=dict(dtick="M1", tickformat="%b\n%Y")
     )
     return fig
@@ -0,0 +1,85 @@
+# config.py
+import os
+
+# ================================== Configurações do Dashboard ================================
+# Todas as opções podem ser sobrescritas por variáveis de ambiente, o que permite
+# ajustar o comportamento em produção sem alterar o código.
+
+# --- Cache persistente em disco (Parquet) ---
+# Diretório onde os DataFrames pré-processados são guardados entre reinícios do servidor
+CACHE_DIR = os.environ.get(
+    "RH_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "dashboard_rh")
+)
+# Tamanho máximo (em MB) ocupado pelo cache; os ficheiros menos usados recentemente são removidos
+CACHE_MAX_MB = int(os.environ.get("RH_CACHE_MAX_MB", "512"))
+
+# --- Leitura do Excel ---
+# Motor usado pelo pandas para ler o ficheiro: 'calamine' (rápido, requer python-calamine),
+# 'openpyxl' (leitura em streaming) ou 'auto' (usa o calamine quando estiver instalado)
+EXCEL_ENGINE = os.environ.get("RH_EXCEL_ENGINE", "auto")
+
+# Motor do pré-processamento das abas: 'pandas' ou 'polars' (plano lazy multi-thread, com o
+# mesmo resultado; requer polars e pyarrow). Sem o polars instalado é usado o pandas
+PREPROCESSING_BACKEND = os.environ.get("RH_PREPROCESSING_BACKEND", "pandas")
+
+# Quando ativo, uma nova versão de um ficheiro já carregado (mesmo nome) reprocessa apenas
+# as linhas alteradas, reutilizando o resultado da versão anterior guardado no cache
+INCREMENTAL_INGESTION = os.environ.get("RH_INCREMENTAL_INGESTION", "1") == "1"
+
+# Quando ativo, o ficheiro é carregado numa thread em segundo plano: o dashboard mostra o
+# progresso e os primeiros resultados (aba 'TODOS') antes de 'Férias' e 'DESLIGADOS'
+BACKGROUND_INGESTION = os.environ.get("RH_BACKGROUND_INGESTION", "1") == "1"
+# Intervalo (em segundos) entre as atualizações da página enquanto o carregamento decorre
+INGESTION_POLL_SECONDS = float(os.environ.get("RH_INGESTION_POLL_SECONDS", "0.5"))
+# Número máximo de carregamentos (por hash do ficheiro) mantidos em memória (LRU)
+INGESTION_JOBS = int(os.environ.get("RH_INGESTION_JOBS", "4"))
+
+# --- Conjuntos de dados partilhados ---
+# Memória máxima (em MB) ocupada pelos DataFrames pré-processados partilhados por todas as
+# sessões; acima dela os menos usados recentemente são removidos da memória (LRU)
+DATASET_MEMORY_MB = int(os.environ.get("RH_DATASET_MEMORY_MB", "1024"))
+# Quando ativo, os DataFrames removidos da memória ficam no cache em disco e são
+# recarregados quando voltam a ser pedidos, em vez de o Excel ser processado de novo
+DATASET_SPILL = os.environ.get("RH_DATASET_SPILL", "1") == "1"
+
+# --- Filtros ---
+# Número máximo de máscaras de filtros memorizadas por ficheiro carregado (LRU)
+FILTER_CACHE_SIZE = int(os.environ.get("RH_FILTER_CACHE_SIZE", "64"))
+
+# Motor dos filtros e contagens: 'pandas' (índice de bitmaps e cubo de headcount) ou
+# 'duckdb' (consultas SQL sobre uma tabela Arrow; requer duckdb e pyarrow)
+QUERY_BACKEND = os.environ.get("RH_QUERY_BACKEND", "pandas")
+
+# --- Gráficos ---
+# Número máximo de figuras Plotly mantidas em memória (LRU, partilhado por todas as sessões)
+FIGURE_CACHE_SIZE = int(os.environ.get("RH_FIGURE_CACHE_SIZE", "128"))
+
+# --- Histórico (snapshots) ---
+# Diretório dos snapshots históricos (um por data de carregamento); não é limpo pela
+# remoção do cache, pois guarda o histórico consultado na página "Tabelas de Resumo"
+SNAPSHOT_DIR = os.environ.get(
+    "RH_SNAPSHOT_DIR",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "dashboard_rh", "snapshots")
+)
+# Quando ativo, cada ficheiro carregado é guardado como snapshot da data do carregamento.
+# Desativado por omissão: os snapshots guardam os dados pessoais dos funcionários em disco
+SNAPSHOTS_ENABLED = os.environ.get("RH_SNAPSHOTS_ENABLED", "0") == "1"
+# Número de dias durante os quais os snapshots são mantidos (0 = sem limite); os mais
+# antigos são removidos sempre que um snapshot é guardado
+SNAPSHOT_RETENTION_DAYS = int(os.environ.get("RH_SNAPSHOT_RETENTION_DAYS", "365"))
+
+# --- Exportação ---
+# Número de linhas escritas de cada vez ao exportar os dados filtrados (CSV, Parquet ou XLSX)
+EXPORT_CHUNK_ROWS = int(os.environ.get("RH_EXPORT_CHUNK_ROWS", "50000"))
+
+# --- Medição de desempenho ---
+# Ficheiro JSON-lines onde cada etapa medida é registada (vazio desativa o registo)
+PERF_LOG_PATH = os.environ.get("RH_PERF_LOG", os.path.join(CACHE_DIR, "perf.jsonl"))
+# Tamanho máximo (em MB) do registo antes de ser rodado para '<ficheiro>.1'
+PERF_LOG_MAX_MB = int(os.environ.get("RH_PERF_LOG_MAX_MB", "50"))
+# Número de medições recentes mantidas em memória para os percentis p50/p95 por etapa
+PERF_HISTORY_SIZE = int(os.environ.get("RH_PERF_HISTORY_SIZE", "5000"))
+# Mostra o painel de desempenho na barra lateral. Só deve ser ativado em ambientes de
+# desenvolvimento: o painel mostra medições (e nomes de ficheiros) de todas as sessões
+PERF_PANEL = os.environ.get("RH_PERF_PANEL", "0") == "1"
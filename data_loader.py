@@ -2,79 +2,302 @@
 import pandas as pd
 import numpy as np
 import datetime
+import logging
+import os
 from dateutil.relativedelta import relativedelta
 from unidecode import unidecode # Para remover acentos
-import streamlit as st # Importado para exibir st.warning
 
 # Importar funções e variáveis do módulo utils
-from utils import LimTexA, LimTex, RemAC, generate_tempo_de_empresa_text, meses_portugues, meses_para_numeros
+from utils import LimTexA, LimTex, RemAC, codificar_categorias, meses_portugues, meses_para_numeros
+from tenure import compute_tenure, format_tenure_text
+from date_ordinals import add_date_ordinal_columns
+from cache_store import workbook_fingerprint, cache_key, load_cached_frame, store_frame, load_state, store_state
+from config import EXCEL_ENGINE, INCREMENTAL_INGESTION
+from incremental import ID_COLUMN, row_ids, sheet_signature, key_hashes, plan_reprocess, assemble_frame, build_state
+from join_index import JoinIndex, take_rows
+from perf import timed
 
-def load_and_preprocess_data(excel_file):
+# Os avisos sobre a qualidade dos dados são registados neste logger; o carregamento em
+# segundo plano (ver ingestion.py) recolhe-os para o dashboard os mostrar com st.warning
+logger = logging.getLogger(__name__)
+
+# Versão do pipeline de pré-processamento. Deve ser incrementada sempre que o
+# DataFrame devolvido por load_and_preprocess_data mudar (colunas, tipos, regras),
+# para invalidar as entradas antigas do cache em disco.
+PREPROCESSING_VERSION = "7"
+
+# --- Esquema declarado de cada aba ---
+# As colunas listadas são lidas do Excel com o dtype indicado. As chaves são os nomes já
+# normalizados (ver LimTex/RemAC) e os valores o dtype aplicado logo após a leitura (None
+# deixa o tipo inferido pelo pandas). Nas abas de enriquecimento só estas colunas são lidas;
+# na aba 'TODOS' as restantes também são lidas, sem dtype, exceto as de EXCLUDED_COLUMNS.
+SHEET_SCHEMAS = {
+    'TODOS': {
+        'ald': None,
+        'matricula': str,
+        'nome': str,
+        'status': str,
+        'empresa': str,
+        'setor': str,
+        'sub_setor': str,
+        'funcao': str,
+        'custo': str,
+        'admissao': None,
+        'demissao': None,
+        'data_de_nasc.': None,
+        'idade': str,
+        'formula_hoje': None,
+        'nivel_escolaridade': str,
+        'filho(s)': str,
+        'quantos': None,
+        'faixa_idade': str,
+        'raca': str,
+        'sexo': str,
+    },
+    'Férias': {
+        'nome': str,
+        'previsao_ferias_2025': str,
+        'limite': None,
+    },
+    'DESLIGADOS': {
+        'matricula': str,
+        'nome': str,
+        'demissao': None,
+    },
+}
+
+# Colunas da aba 'TODOS' que nunca são lidas do Excel (dados pessoais sem uso no dashboard)
+EXCLUDED_COLUMNS = {'cpf', 'rg'}
+
+def _normalizar_nome_coluna(coluna):
     """
-    Carrega os dados do ficheiro Excel especificado e realiza as etapas iniciais de pré-processamento.
+    Aplica a mesma normalização de LimTex + RemAC a um único nome de coluna.
+    """
+    return unidecode(str(coluna).strip().lower().replace(' ', '_'))
+
+def _para_texto(serie):
+    """
+    Converte uma coluna lida sem dtype em texto, com o mesmo resultado de dtype=str na
+    leitura: os nulos mantêm-se e os inteiros guardados como float (por a coluna ter nulos)
+    ficam sem '.0', como nas células do Excel.
+    """
+    if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return serie
+    texto = serie.astype(object)
+    preenchidos = serie.notna().to_numpy()
+    texto[preenchidos] = [str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+                          for v in texto[preenchidos]]
+    return texto
+
+def resolve_excel_engine(engine=None):
+    """
+    Determina o motor de leitura do Excel a usar.
 
     Args:
-        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+        engine (str, optional): 'calamine', 'openpyxl' ou 'auto'. O padrão é o valor
+                                configurado em config.EXCEL_ENGINE.
 
     Returns:
-        pd.DataFrame: O DataFrame pré-processado.
+        str: O nome do motor a passar ao pandas.
+    """
+    engine = engine or EXCEL_ENGINE
+    if engine != 'auto':
+        return engine
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+def read_sheet(excel, sheet_name, extra_columns=False):
+    """
+    Lê uma aba do Excel numa única passagem e aplica os dtypes do esquema declarado em
+    SHEET_SCHEMAS.
+
+    Args:
+        excel (pd.ExcelFile): O ficheiro Excel aberto.
+        sheet_name (str): O nome da aba a ler.
+        extra_columns (bool, optional): Se True, as colunas fora do esquema também são lidas
+                                        (com o tipo inferido pelo pandas), exceto as de
+                                        EXCLUDED_COLUMNS. Caso contrário só são lidas as
+                                        colunas do esquema.
+
+    Returns:
+        pd.DataFrame: A aba lida, com os nomes de colunas ainda no formato original.
+    """
+    esquema = SHEET_SCHEMAS[sheet_name]
+
+    # As colunas são escolhidas pelo nome normalizado de cada cabeçalho durante a leitura
+    if extra_columns:
+        def usar(col):
+            return _normalizar_nome_coluna(col) not in EXCLUDED_COLUMNS
+    else:
+        def usar(col):
+            return _normalizar_nome_coluna(col) in esquema
+
+    df = excel.parse(sheet_name=sheet_name, usecols=usar)
+
+    for col in df.columns:
+        nome = _normalizar_nome_coluna(col)
+        if nome in esquema:
+            tipo = esquema[nome]
+            if tipo is str:
+                df[col] = _para_texto(df[col])
+            elif tipo is not None:
+                df[col] = df[col].astype(tipo)
+        elif df[col].dtype == object and \
+                pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+            # Colunas fora do esquema com valores de vários tipos (e.g., texto e números)
+            # passam a texto, para que o resultado possa ser guardado em Parquet
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def read_main_sheet(excel):
+    """
+    Lê a aba 'TODOS', já com os nomes das colunas normalizados (LimTex + RemAC). Além das
+    colunas do esquema são mantidas as restantes colunas da aba, exceto 'cpf' e 'rg'.
+
+    Args:
+        excel (pd.ExcelFile): O ficheiro Excel aberto.
+
+    Returns:
+        pd.DataFrame: A aba 'TODOS'.
+    """
+    df_todos = read_sheet(excel, 'TODOS', extra_columns=True)
+    LimTex(df_todos)
+    RemAC(df_todos)
+    return df_todos
+
+def read_enrichment_sheets(excel):
     """
-    excel = pd.ExcelFile(excel_file)
+    Lê as abas de enriquecimento 'Férias' e 'DESLIGADOS', já com os nomes das colunas
+    normalizados (LimTex + RemAC).
+
+    Args:
+        excel (pd.ExcelFile): O ficheiro Excel aberto.
+
+    Returns:
+        tuple: (df_ferias, df_desligados); df_desligados fica vazio se a aba não existir.
+    """
+    df_ferias = read_sheet(excel, 'Férias')
 
-    # Carregar as folhas específicas para DataFrames
-    df_todos = pd.read_excel(excel, sheet_name='TODOS')
-    df_ferias = pd.read_excel(excel, sheet_name='Férias')
-    
     # NOVO: Carregar a aba 'DESLIGADOS'
     try:
-        df_desligados = pd.read_excel(excel, sheet_name='DESLIGADOS')
+        df_desligados = read_sheet(excel, 'DESLIGADOS')
         # Aplicar a limpeza de texto nos nomes das colunas de df_desligados
         LimTex(df_desligados)
         RemAC(df_desligados)
     except ValueError:
-        st.warning("Aviso: A aba 'DESLIGADOS' não foi encontrada no ficheiro Excel. Os dados de demissão não serão carregados.")
+        logger.warning("Aviso: A aba 'DESLIGADOS' não foi encontrada no ficheiro Excel. Os dados de demissão não serão carregados.")
         df_desligados = pd.DataFrame() # Cria um DataFrame vazio se a aba não for encontrada
 
-    # Aplicar a limpeza de texto nos nomes das colunas de df_todos e df_ferias
-    LimTex(df_todos)
-    RemAC(df_todos)
-
+    # Aplicar a limpeza de texto nos nomes das colunas de df_ferias
     LimTex(df_ferias)
     RemAC(df_ferias)
 
+    return df_ferias, df_desligados
+
+@timed()
+def read_workbook(excel_file, engine=None):
+    """
+    Lê as abas 'TODOS', 'Férias' e 'DESLIGADOS' do ficheiro Excel, já com os nomes
+    das colunas normalizados (LimTex + RemAC).
+
+    Args:
+        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+        engine (str, optional): Motor de leitura do Excel ('calamine', 'openpyxl' ou 'auto').
+                                O padrão é o valor configurado em config.EXCEL_ENGINE.
+
+    Returns:
+        tuple: (df_todos, df_ferias, df_desligados); df_desligados fica vazio se a aba não existir.
+    """
+    # O ficheiro é aberto uma única vez e as três abas são lidas a partir dele
+    excel = pd.ExcelFile(excel_file, engine=resolve_excel_engine(engine))
+    df_todos = read_main_sheet(excel)
+    df_ferias, df_desligados = read_enrichment_sheets(excel)
+    return df_todos, df_ferias, df_desligados
+
+def desligados_merge_columns(df_todos, df_desligados):
+    """
+    Identifica as colunas usadas para juntar a data de demissão da aba 'DESLIGADOS'.
+
+    Args:
+        df_todos (pd.DataFrame): A aba 'TODOS' (nomes de colunas normalizados).
+        df_desligados (pd.DataFrame): A aba 'DESLIGADOS' (nomes de colunas normalizados).
+
+    Returns:
+        tuple: (coluna de demissão em df_desligados, chave de junção); cada elemento é
+               None quando não é encontrado.
+    """
+    # Tenta encontrar a coluna 'demissao' em df_desligados (após limpeza de nomes)
+    demissao_col_name_in_desligados = None
+    for col in df_desligados.columns:
+        if unidecode(col.strip().lower()) == 'demissao': # Considera 'Demissão', 'demissao', etc.
+            demissao_col_name_in_desligados = col
+            break
+
+    # Identificar coluna chave para a junção (preferir 'matricula', senão 'nome')
+    merge_key = None
+    if 'matricula' in df_todos.columns and 'matricula' in df_desligados.columns:
+        merge_key = 'matricula'
+    elif 'nome' in df_todos.columns and 'nome' in df_desligados.columns:
+        merge_key = 'nome'
+
+    return demissao_col_name_in_desligados, merge_key
+
+def avisar_desligados_incompletos(demissao_col_name_in_desligados):
+    """
+    Avisa que a data de demissão da aba 'DESLIGADOS' não pôde ser juntada: falta a coluna
+    de demissão ou uma chave de junção comum (ver desligados_merge_columns).
+    """
+    if demissao_col_name_in_desligados:
+        logger.warning("Aviso: Não foi possível encontrar uma coluna comum ('matricula' ou 'nome') para mesclar os dados da aba 'DESLIGADOS'. A coluna 'demissao' pode não ser precisa.")
+    else:
+        logger.warning("Aviso: A coluna 'demissao' (ou variação similar) não foi encontrada na aba 'DESLIGADOS - 2025'. Os cálculos de desligamento podem não ser precisos.")
+
+@timed()
+def preprocess_rows(df_todos, df_ferias, df_desligados):
+    """
+    Junta as abas e aplica o pré-processamento linha a linha (limpeza, datas, tempo de
+    empresa, ordinais). Cada linha do resultado depende apenas da sua linha em 'TODOS' e
+    das linhas correspondentes em 'Férias'/'DESLIGADOS', o que permite reprocessar só um
+    subconjunto de linhas (ver incremental.py). A codificação categórica, que depende do
+    DataFrame completo, fica de fora.
+
+    Args:
+        df_todos (pd.DataFrame): A aba 'TODOS' (ou um subconjunto das suas linhas).
+        df_ferias (pd.DataFrame): A aba 'Férias'.
+        df_desligados (pd.DataFrame): A aba 'DESLIGADOS' (pode estar vazia).
+
+    Returns:
+        pd.DataFrame: As linhas pré-processadas.
+    """
     df_ferias_periodo = df_ferias[['nome', 'previsao_ferias_2025', 'limite']].copy()
     df_ferias_periodo['previsao_ferias_2025'] = df_ferias_periodo['previsao_ferias_2025'].astype(str).str.strip().str.lower().map(meses_para_numeros)
 
-    df_todos = pd.merge(df_todos, df_ferias_periodo, on='nome', how='left')
+    # Junções com um índice de chaves normalizadas (ver join_index.py): no máximo uma linha
+    # de 'Férias'/'DESLIGADOS' por funcionário, pelo que o número de linhas de 'TODOS' se mantém
+    df_todos = df_todos.reset_index(drop=True)
+    indice_ferias = JoinIndex(df_ferias_periodo['nome'], 'Férias')
+    ferias = take_rows(df_ferias_periodo, indice_ferias.lookup(df_todos['nome']), ['previsao_ferias_2025', 'limite'])
+    df_todos['previsao_ferias_2025'] = ferias['previsao_ferias_2025']
+    df_todos['limite'] = ferias['limite']
 
     # NOVO: Lógica para mesclar a coluna 'demissao' de df_desligados para df_todos
     if not df_desligados.empty:
-        # Tenta encontrar a coluna 'demissao' em df_desligados (após limpeza de nomes)
-        demissao_col_name_in_desligados = None
-        for col in df_desligados.columns:
-            if unidecode(col.strip().lower()) == 'demissao': # Considera 'Demissão', 'demissao', etc.
-                demissao_col_name_in_desligados = col
-                break
+        demissao_col_name_in_desligados, merge_key = desligados_merge_columns(df_todos, df_desligados)
 
         if demissao_col_name_in_desligados:
-            # Identificar coluna chave para a junção (preferir 'matricula', senão 'nome')
-            merge_key = None
-            if 'matricula' in df_todos.columns and 'matricula' in df_desligados.columns:
-                merge_key = 'matricula'
-            elif 'nome' in df_todos.columns and 'nome' in df_desligados.columns:
-                merge_key = 'nome'
-            
             if merge_key:
-                # Criar um DataFrame temporário com a chave e a coluna de demissão
-                df_temp_demissao = df_desligados[[merge_key, demissao_col_name_in_desligados]].copy()
-                df_temp_demissao.rename(columns={demissao_col_name_in_desligados: 'demissao_data_merged'}, inplace=True)
-                
-                # Converter a coluna de demissão do df temporário para datetime antes de mesclar
-                df_temp_demissao['demissao_data_merged'] = pd.to_datetime(df_temp_demissao['demissao_data_merged'], errors='coerce')
-                
-                # Realizar a junção para trazer a coluna de demissão para df_todos
-                # Usamos um 'left' merge para manter todos os funcionários do df_todos
-                df_todos = pd.merge(df_todos, df_temp_demissao, on=merge_key, how='left')
+                # Converter a coluna de demissão para datetime antes de juntar
+                datas_demissao = pd.to_datetime(df_desligados[demissao_col_name_in_desligados], errors='coerce')
+                datas_demissao = datas_demissao.reset_index(drop=True).rename('demissao_data_merged')
+
+                # Junção 'left' para manter todos os funcionários do df_todos; um funcionário
+                # com várias linhas em 'DESLIGADOS' fica com a demissão mais recente
+                indice_desligados = JoinIndex(df_desligados[merge_key], 'DESLIGADOS', prioridade=datas_demissao)
+                posicoes = indice_desligados.lookup(df_todos[merge_key])
+                df_todos['demissao_data_merged'] = take_rows(datas_demissao.to_frame(), posicoes, ['demissao_data_merged'])['demissao_data_merged']
                 
                 # Se 'demissao' já existe em df_todos, a nova coluna virá como 'demissao_data_merged'.
                 # Vamos consolidar: se 'demissao' original é NaT, preencher com a mesclada.
@@ -86,10 +309,10 @@ def load_and_preprocess_data(excel_file):
                     df_todos.drop(columns=['demissao_data_merged'], errors='ignore', inplace=True)
 
             else:
-                st.warning("Aviso: Não foi possível encontrar uma coluna comum ('matricula' ou 'nome') para mesclar os dados da aba 'DESLIGADOS'. A coluna 'demissao' pode não ser precisa.")
+                avisar_desligados_incompletos(demissao_col_name_in_desligados)
                 df_todos['demissao'] = pd.NaT # Garante que a coluna 'demissao' existe, mesmo que vazia
         else:
-            st.warning("Aviso: A coluna 'demissao' (ou variação similar) não foi encontrada na aba 'DESLIGADOS - 2025'. Os cálculos de desligamento podem não ser precisos.")
+            avisar_desligados_incompletos(demissao_col_name_in_desligados)
             df_todos['demissao'] = pd.NaT # Garante que a coluna 'demissao' existe, mesmo que vazia
     else:
         # Se a aba 'DESLIGADOS - 2025' não foi carregada com sucesso, cria a coluna demissao como NaT
@@ -106,11 +329,176 @@ def load_and_preprocess_data(excel_file):
     df_todos['admissao'] = pd.to_datetime(df_todos['admissao'], errors='coerce')
     df_todos['limite'] = pd.to_datetime(df_todos['limite'], errors='coerce')
 
-    df_todos = df_todos.drop(['cpf', 'rg'], axis=1, errors='ignore')
+    atualizar_tempo_de_empresa(df_todos)
+
+    df_todos['setor'] = df_todos['setor'].replace({'MAMUTENÇÃO': 'MANUTENÇÃO'})
+
+    # Datas também guardadas como ordinais de dia (int32) para filtros e KPIs
+    add_date_ordinal_columns(df_todos)
+
+    return df_todos
+
+def _preprocessar_linhas(df_todos, df_ferias, df_desligados):
+    """
+    Aplica preprocess_rows ou, com RH_PREPROCESSING_BACKEND=polars, a versão equivalente
+    em Polars (ver data_loader_polars.py).
+    """
+    # Importação local: data_loader_polars reutiliza funções deste módulo
+    from data_loader_polars import preprocess_rows_polars, resolve_preprocessing_backend
+    if resolve_preprocessing_backend() == 'polars':
+        return preprocess_rows_polars(df_todos, df_ferias, df_desligados)
+    return preprocess_rows(df_todos, df_ferias, df_desligados)
+
+@timed()
+def preprocess_preview(df_todos):
+    """
+    Pré-processa a aba 'TODOS' sem as junções com 'Férias' e 'DESLIGADOS', para mostrar
+    os primeiros resultados enquanto as abas de enriquecimento ainda estão a ser lidas
+    (ver ingestion.py). As colunas vindas dessas abas ficam vazias.
+
+    Args:
+        df_todos (pd.DataFrame): A aba 'TODOS' (não é alterada).
+
+    Returns:
+        pd.DataFrame: As linhas pré-processadas, com as colunas categóricas codificadas.
+    """
+    df_ferias = pd.DataFrame(columns=list(SHEET_SCHEMAS['Férias']))
+    df_preview = _preprocessar_linhas(df_todos, df_ferias, pd.DataFrame())
+    codificar_categorias(df_preview)
+    return df_preview
+
+def load_and_preprocess_data(excel_file, engine=None):
+    """
+    Carrega os dados do ficheiro Excel especificado e realiza as etapas iniciais de pré-processamento.
+
+    Args:
+        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+        engine (str, optional): Motor de leitura do Excel ('calamine', 'openpyxl' ou 'auto').
+                                O padrão é o valor configurado em config.EXCEL_ENGINE.
+
+    Returns:
+        pd.DataFrame: O DataFrame pré-processado.
+    """
+    df_todos, df_ferias, df_desligados = read_workbook(excel_file, engine)
+
+    df_todos = _preprocessar_linhas(df_todos, df_ferias, df_desligados)
+
+    # As colunas de dimensão são guardadas como categóricas (códigos inteiros)
+    codificar_categorias(df_todos)
 
-    today_date = datetime.date.today()
-    df_todos['tempo_de_empresa'] = df_todos['admissao'].apply(lambda x: generate_tempo_de_empresa_text(x, today_date))
+    return df_todos
+
+def atualizar_tempo_de_empresa(df, today_date=None):
+    """
+    (Re)calcula as colunas de tempo de empresa em relação à data atual: o texto
+    'tempo_de_empresa' e as colunas numéricas 'tempo_empresa_anos', 'tempo_empresa_meses',
+    'tempo_empresa_dias' e 'tempo_empresa_anos_frac' (ver tenure.compute_tenure).
+    Usada também após ler um DataFrame do cache em disco, pois o tempo de empresa
+    guardado refere-se ao dia em que o ficheiro foi processado.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado, com a coluna 'admissao'.
+        today_date (datetime.date, optional): A data de referência. O padrão é hoje.
+    """
+    tenure = compute_tenure(df['admissao'], today_date)
+    df['tempo_de_empresa'] = format_tenure_text(tenure)
+    df[tenure.columns] = tenure
+
+def _nome_do_ficheiro(excel_file):
+    """
+    Nome que identifica as sucessivas versões de um mesmo ficheiro Excel.
+    """
+    nome = getattr(excel_file, 'name', None) or str(excel_file)
+    return os.path.basename(nome)
+
+@timed()
+def load_incremental(excel_file, chave, progresso=None):
+    """
+    Pré-processa um ficheiro Excel reutilizando, quando possível, o resultado da versão
+    anterior do mesmo ficheiro (mesmo nome): apenas as linhas de 'TODOS' novas ou alteradas,
+    e as que dependem de linhas alteradas em 'Férias'/'DESLIGADOS', passam pelas junções e
+    pelo pré-processamento. Se a estrutura das abas mudar, o ficheiro é reprocessado por inteiro.
+
+    Args:
+        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+        chave (str): A chave de cache do novo ficheiro (ver cache_store.cache_key).
+        progresso (callable, optional): Função progresso(etapa, fracao, df_parcial=None)
+                                        chamada após cada etapa; depois de ler 'TODOS'
+                                        recebe também o resultado de preprocess_preview.
+
+    Returns:
+        tuple: (DataFrame pré-processado, estado para a próxima versão).
+    """
+    if progresso is None:
+        df_todos, df_ferias, df_desligados = read_workbook(excel_file)
+    else:
+        # Leitura aba a aba, para que 'TODOS' possa ser mostrada antes das restantes
+        excel = pd.ExcelFile(excel_file, engine=resolve_excel_engine())
+        df_todos = read_main_sheet(excel)
+        progresso("A ler 'Férias' e 'DESLIGADOS'", 0.4, preprocess_preview(df_todos))
+        df_ferias, df_desligados = read_enrichment_sheets(excel)
+        progresso("A juntar e pré-processar as abas", 0.7)
+
+    ids = row_ids(df_todos)
+    assinaturas = {
+        'TODOS': sheet_signature(df_todos),
+        'Férias': sheet_signature(df_ferias),
+        'DESLIGADOS': sheet_signature(df_desligados),
+    }
+    merge_key = desligados_merge_columns(df_todos, df_desligados)[1] if not df_desligados.empty else None
+    hashes_ferias = key_hashes(df_ferias, 'nome')
+    hashes_desligados = key_hashes(df_desligados, merge_key)
+
+    # Procura o resultado da versão anterior do mesmo ficheiro
+    estado = load_state(_nome_do_ficheiro(excel_file)) if INCREMENTAL_INGESTION else None
+    df_anterior, reprocessar = None, None
+    if estado is not None and estado['versao'] == PREPROCESSING_VERSION:
+        df_anterior = load_cached_frame(estado['chave_frame'])
+        if df_anterior is not None:
+            reprocessar = plan_reprocess(estado, df_todos, ids, assinaturas,
+                                         hashes_ferias, hashes_desligados, merge_key)
+
+    df_todos[ID_COLUMN] = ids
+    if reprocessar is None:
+        df_resultado = _preprocessar_linhas(df_todos, df_ferias, df_desligados)
+    else:
+        df_novas = _preprocessar_linhas(df_todos[reprocessar], df_ferias, df_desligados) if reprocessar.any() else None
+        df_resultado = assemble_frame(df_anterior, estado['ids_saida'], df_novas, ids, reprocessar)
+        # As linhas reutilizadas trazem o tempo de empresa do dia em que foram processadas
+        atualizar_tempo_de_empresa(df_resultado)
+
+    ids_saida = df_resultado.pop(ID_COLUMN).to_numpy()
+
+    # As categorias dependem do DataFrame completo, por isso são sempre recalculadas
+    codificar_categorias(df_resultado)
+
+    novo_estado = build_state(chave, PREPROCESSING_VERSION, ids_saida, assinaturas,
+                              hashes_ferias, hashes_desligados, merge_key)
+    return df_resultado, novo_estado
+
+@timed()
+def load_with_disk_cache(excel_file, progresso=None):
+    """
+    Devolve o DataFrame pré-processado de um ficheiro Excel, usando o cache persistente
+    em disco (Parquet) indexado pelo hash do conteúdo do ficheiro e pela versão do pipeline.
+    Um ficheiro já visto é lido do cache sem voltar a passar pelo openpyxl; uma nova versão
+    de um ficheiro já visto é processada incrementalmente (ver load_incremental).
+
+    Args:
+        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+        progresso (callable, optional): Função de progresso passada a load_incremental.
+
+    Returns:
+        pd.DataFrame: O DataFrame pré-processado.
+    """
+    chave = cache_key(workbook_fingerprint(excel_file), PREPROCESSING_VERSION)
 
-    df_todos['setor'].replace({'MAMUTENÇÃO': 'MANUTENÇÃO'}, inplace=True)
+    df_todos = load_cached_frame(chave)
+    if df_todos is not None:
+        atualizar_tempo_de_empresa(df_todos)
+        return df_todos
 
+    df_todos, estado = load_incremental(excel_file, chave, progresso)
+    if store_frame(chave, df_todos):
+        store_state(_nome_do_ficheiro(excel_file), estado)
     return df_todos
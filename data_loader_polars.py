@@ -0,0 +1,196 @@
+# data_loader_polars.py
+import logging
+
+import pandas as pd
+
+from config import PREPROCESSING_BACKEND
+from data_loader import desligados_merge_columns, avisar_desligados_incompletos, atualizar_tempo_de_empresa
+from date_ordinals import DATE_ORDINAL_COLUMNS, NAT_ORDINAL
+from join_index import normalize_keys
+from perf import timed
+from utils import meses_para_numeros
+
+try:
+    import polars as pl
+    import pyarrow  # noqa: F401 (usado pelo polars na conversão de/para pandas)
+    POLARS_DISPONIVEL = True
+except ImportError: # polars e pyarrow são opcionais: sem eles é usado o pré-processamento pandas
+    POLARS_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+# Colunas temporárias com as chaves de junção normalizadas (ver join_index.normalize_keys)
+_CHAVE_FERIAS = '_chave_ferias'
+_CHAVE_DESLIGADOS = '_chave_desligados'
+_CHAVE = '_chave'
+
+# Número máximo de chaves repetidas listadas no aviso de colisões (como em join_index)
+_MAX_EXEMPLOS = 10
+
+# Colunas acrescentadas no fim por date_ordinals.add_date_ordinal_columns
+_COLUNAS_ORDINAIS = list(DATE_ORDINAL_COLUMNS.values()) + ['nascimento_mes', 'nascimento_dia']
+
+def resolve_preprocessing_backend(backend=None):
+    """
+    Determina o motor de pré-processamento a usar.
+
+    Args:
+        backend (str, optional): 'pandas' ou 'polars'. O padrão é o valor configurado em
+                                 config.PREPROCESSING_BACKEND.
+
+    Returns:
+        str: 'polars' se foi pedido e está instalado, senão 'pandas'.
+    """
+    backend = backend or PREPROCESSING_BACKEND
+    if backend == 'polars' and not POLARS_DISPONIVEL:
+        logger.warning("RH_PREPROCESSING_BACKEND=polars, mas o polars/pyarrow não está instalado: a usar o pandas")
+        return 'pandas'
+    return backend
+
+def _para_polars(df, colunas_data=()):
+    """
+    Converte uma aba lida pelo pandas num LazyFrame. As colunas de texto (object) passam a
+    String, com os valores de outros tipos convertidos em texto, e as colunas de data
+    indicadas passam a datetime (valores inválidos ficam nulos, como em pd.to_datetime).
+    """
+    colunas, esquema = {}, {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in colunas_data and not pd.api.types.is_datetime64_any_dtype(serie):
+            serie = pd.to_datetime(serie, errors='coerce')
+        elif serie.dtype == object:
+            if pd.api.types.infer_dtype(serie, skipna=True) not in ('string', 'empty'):
+                serie = serie.where(serie.isna(), serie.astype(str))
+            esquema[coluna] = pl.String
+        colunas[coluna] = serie
+    return pl.from_pandas(pd.DataFrame(colunas), schema_overrides=esquema).lazy()
+
+def _chaves(serie, nome):
+    """
+    Chaves de junção normalizadas da mesma forma que em join_index.JoinIndex.
+    """
+    return pl.Series(nome, normalize_keys(serie).to_numpy(), dtype=pl.String)
+
+def _uma_linha_por_chave(aba, prioridade=None):
+    """
+    Mantém uma linha por chave, tal como join_index.JoinIndex: a de maior prioridade
+    (nulos por último) e, em empate, a primeira na aba. Linhas sem chave são descartadas.
+    """
+    aba = aba.filter(pl.col(_CHAVE).is_not_null())
+    if prioridade is not None:
+        aba = aba.sort(prioridade, descending=True, nulls_last=True, maintain_order=True)
+    return aba.unique(subset=_CHAVE, keep='first', maintain_order=True)
+
+def _colisoes(aba):
+    """
+    Plano que lista as chaves repetidas de uma aba e o número de linhas de cada uma.
+    """
+    return aba.filter(pl.col(_CHAVE).is_not_null()).group_by(_CHAVE).len().filter(pl.col('len') > 1).sort(_CHAVE)
+
+def _avisar_colisoes(repetidas, nome_aba):
+    """
+    Regista as chaves repetidas com a mesma mensagem de join_index.JoinIndex.
+    """
+    if repetidas.height:
+        logger.warning(
+            "Aba '%s': %d chaves aparecem em mais de uma linha (%d linhas ignoradas), e.g. %s",
+            nome_aba, repetidas.height, int(repetidas['len'].sum() - repetidas.height),
+            ', '.join(repetidas[_CHAVE].head(_MAX_EXEMPLOS).to_list())
+        )
+
+def _ordinais(colunas):
+    """
+    Expressões das colunas de ordinais de dia e do mês/dia de nascimento, com os mesmos
+    valores de date_ordinals.add_date_ordinal_columns.
+    """
+    expressoes = []
+    for coluna, coluna_ordinal in DATE_ORDINAL_COLUMNS.items():
+        if coluna in colunas:
+            expressoes.append(pl.col(coluna).dt.date().cast(pl.Int32).fill_null(NAT_ORDINAL).alias(coluna_ordinal))
+        else:
+            expressoes.append(pl.lit(NAT_ORDINAL, dtype=pl.Int32).alias(coluna_ordinal))
+    for parte in ('month', 'day'):
+        if 'data_de_nasc.' in colunas:
+            valor = getattr(pl.col('data_de_nasc.').dt, parte)().fill_null(0).cast(pl.Int8)
+        else:
+            valor = pl.lit(0, dtype=pl.Int8)
+        expressoes.append(valor.alias('nascimento_mes' if parte == 'month' else 'nascimento_dia'))
+    return expressoes
+
+@timed()
+def preprocess_rows_polars(df_todos, df_ferias, df_desligados):
+    """
+    Mesmo pré-processamento de data_loader.preprocess_rows, como um único plano lazy do
+    Polars: as junções com 'Férias' e 'DESLIGADOS', o preenchimento das colunas de texto,
+    a extração da idade e os ordinais de datas são otimizados em conjunto e executados em
+    várias threads, sem cópias intermédias. O resultado é convertido para pandas uma só
+    vez no fim, onde é calculado o tempo de empresa (ver tenure.compute_tenure).
+
+    As colunas de texto com valores de outros tipos (e.g., números) ficam como texto e as
+    colunas de data da aba 'TODOS' passam sempre a datetime; nas abas bem formadas o
+    resultado é igual ao do pandas (ver benchmarks/test_polars_parity.py).
+
+    Args:
+        df_todos (pd.DataFrame): A aba 'TODOS' (ou um subconjunto das suas linhas).
+        df_ferias (pd.DataFrame): A aba 'Férias'.
+        df_desligados (pd.DataFrame): A aba 'DESLIGADOS' (pode estar vazia).
+
+    Returns:
+        pd.DataFrame: As linhas pré-processadas.
+    """
+    df_todos = df_todos.reset_index(drop=True)
+    colunas_data = [coluna for coluna in DATE_ORDINAL_COLUMNS if coluna in df_todos.columns]
+    todos = _para_polars(df_todos, colunas_data).with_columns(_chaves(df_todos['nome'], _CHAVE_FERIAS))
+
+    # Uma linha de 'Férias' por nome (a primeira), com o mês de férias convertido em número
+    ferias = _para_polars(df_ferias[['previsao_ferias_2025', 'limite']], ['limite']).with_columns(
+        _chaves(df_ferias['nome'], _CHAVE),
+        pl.col('previsao_ferias_2025').str.strip_chars().str.to_lowercase()
+        .replace_strict(meses_para_numeros, default=None, return_dtype=pl.Float64),
+    )
+    todos = todos.join(_uma_linha_por_chave(ferias), left_on=_CHAVE_FERIAS, right_on=_CHAVE,
+                       how='left', maintain_order='left').drop(_CHAVE_FERIAS)
+    colisoes = {'Férias': _colisoes(ferias)}
+
+    demissao_col_name_in_desligados, merge_key = (
+        desligados_merge_columns(df_todos, df_desligados) if not df_desligados.empty else (None, None)
+    )
+    if demissao_col_name_in_desligados and merge_key:
+        # Um funcionário com várias linhas em 'DESLIGADOS' fica com a demissão mais recente
+        desligados = _para_polars(df_desligados[[demissao_col_name_in_desligados]], [demissao_col_name_in_desligados]).select(
+            _chaves(df_desligados[merge_key], _CHAVE),
+            pl.col(demissao_col_name_in_desligados).alias('demissao_data_merged'),
+        )
+        todos = todos.with_columns(_chaves(df_todos[merge_key], _CHAVE_DESLIGADOS)).join(
+            _uma_linha_por_chave(desligados, 'demissao_data_merged'),
+            left_on=_CHAVE_DESLIGADOS, right_on=_CHAVE, how='left', maintain_order='left',
+        ).drop(_CHAVE_DESLIGADOS)
+        colisoes['DESLIGADOS'] = _colisoes(desligados)
+        # Se 'demissao' original é nula, é preenchida com a data mesclada
+        demissao = pl.coalesce('demissao', 'demissao_data_merged') if 'demissao' in df_todos.columns \
+            else pl.col('demissao_data_merged')
+        todos = todos.with_columns(demissao.alias('demissao')).drop('demissao_data_merged')
+    else:
+        if not df_desligados.empty:
+            avisar_desligados_incompletos(demissao_col_name_in_desligados)
+        todos = todos.with_columns(pl.lit(None, dtype=pl.Datetime('ns')).alias('demissao'))
+
+    todos = todos.with_columns(pl.col(pl.String).fill_null('NÃO INFORMADO')).with_columns(
+        pl.col('quantos').fill_null(0).cast(pl.Int64),
+        pl.col('filho(s)').str.to_uppercase(),
+        pl.col('idade').str.extract(r'(\d+)', 1).cast(pl.Int64),
+        pl.col('setor').replace({'MAMUTENÇÃO': 'MANUTENÇÃO'}),
+    )
+    todos = todos.with_columns(_ordinais(todos.collect_schema().names()))
+
+    # O plano principal e os das colisões partilham as leituras e correm em paralelo
+    resultado, *repetidas = pl.collect_all([todos, *colisoes.values()])
+    for nome_aba, chaves_repetidas in zip(colisoes, repetidas):
+        _avisar_colisoes(chaves_repetidas, nome_aba)
+
+    df_resultado = resultado.to_pandas()
+    # O pandas não tem inteiros com nulos por omissão: a idade volta a ser Int64
+    df_resultado['idade'] = df_resultado['idade'].astype('Int64')
+    atualizar_tempo_de_empresa(df_resultado)
+    # Mesma ordem de colunas do pandas: o tempo de empresa antes dos ordinais
+    return df_resultado[[c for c in df_resultado.columns if c not in _COLUNAS_ORDINAIS] + _COLUNAS_ORDINAIS]
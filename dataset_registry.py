@@ -0,0 +1,139 @@
+# dataset_registry.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from cache_store import has_cached_frame, load_cached_frame, store_frame
+from config import DATASET_MEMORY_MB, DATASET_SPILL
+from data_loader import atualizar_tempo_de_empresa
+
+logger = logging.getLogger(__name__)
+
+# DataFrames pré-processados residentes em memória, por chave de cache (LRU), partilhados
+# por todas as sessões; as entradas removidas por falta de memória ficam em _em_disco
+_datasets = OrderedDict()
+_em_disco = {}
+_lock = threading.Lock()
+_estatisticas = {'hits': 0, 'misses': 0, 'recarregados': 0, 'removidos': 0}
+
+def _tamanho(df):
+    """
+    Memória ocupada por um DataFrame, em bytes (inclui o conteúdo das colunas de texto).
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def _libertar_memoria(orcamento):
+    """
+    Remove da memória os conjuntos de dados menos usados recentemente até o total caber
+    no orçamento; o mais recente nunca é removido. Com DATASET_SPILL, cada entrada
+    removida é mantida no cache em disco (ver cache_store) para ser recarregada depois.
+    Deve ser chamada com o lock adquirido.
+    """
+    total = sum(entrada['bytes'] for entrada in _datasets.values())
+    while total > orcamento and len(_datasets) > 1:
+        chave, entrada = _datasets.popitem(last=False)
+        total -= entrada['bytes']
+        _estatisticas['removidos'] += 1
+        if DATASET_SPILL and (has_cached_frame(chave) or store_frame(chave, entrada['df'])):
+            _em_disco[chave] = {k: v for k, v in entrada.items() if k != 'df'}
+        else:
+            logger.info("Conjunto de dados '%s' removido da memória sem cópia em disco", entrada['nome'])
+
+def store_dataset(chave, df, nome=None):
+    """
+    Regista um DataFrame pré-processado como o conjunto de dados partilhado da chave.
+    O DataFrame passa a ser usado por todas as sessões sem cópias e não deve ser
+    alterado por quem o recebe (as páginas só o leem e indexam).
+
+    Args:
+        chave (str): Chave devolvida por cache_store.cache_key (hash do ficheiro e versão).
+        df (pd.DataFrame): O DataFrame pré-processado.
+        nome (str, optional): O nome do ficheiro, mostrado em resident_datasets.
+
+    Returns:
+        pd.DataFrame: O DataFrame registado (o já existente, se outra sessão o registou antes).
+    """
+    with _lock:
+        if chave in _datasets:
+            _datasets.move_to_end(chave)
+            return _datasets[chave]['df']
+        _em_disco.pop(chave, None)
+        _datasets[chave] = {
+            'df': df, 'nome': nome or chave[:12], 'linhas': len(df), 'bytes': _tamanho(df),
+            'acessos': 0, 'ultimo_acesso': time.time(),
+        }
+        _libertar_memoria(DATASET_MEMORY_MB * 2 ** 20)
+    return df
+
+def get_dataset(chave):
+    """
+    Devolve o conjunto de dados partilhado de uma chave. Um conjunto removido da memória
+    é recarregado do cache em disco (com o tempo de empresa recalculado para hoje).
+
+    Args:
+        chave (str): Chave devolvida por cache_store.cache_key.
+
+    Returns:
+        pd.DataFrame ou None: O DataFrame, ou None se não estiver registado nem em disco.
+    """
+    with _lock:
+        entrada = _datasets.get(chave)
+        if entrada is not None:
+            _datasets.move_to_end(chave)
+            entrada['acessos'] += 1
+            entrada['ultimo_acesso'] = time.time()
+            _estatisticas['hits'] += 1
+            return entrada['df']
+        _estatisticas['misses'] += 1
+        removido = _em_disco.get(chave)
+    if removido is None:
+        return None
+
+    df = load_cached_frame(chave)
+    if df is None: # A cópia em disco foi removida entretanto (ver cache_store.evict_cache)
+        with _lock:
+            _em_disco.pop(chave, None)
+        return None
+    atualizar_tempo_de_empresa(df)
+    with _lock:
+        _estatisticas['recarregados'] += 1
+    return store_dataset(chave, df, removido['nome'])
+
+def dataset_info():
+    """
+    Devolve as estatísticas do registo de conjuntos de dados.
+
+    Returns:
+        dict: Acertos, falhas, recarregamentos do disco, remoções, número de conjuntos em
+              memória e em disco, memória ocupada e orçamento (em MB).
+    """
+    with _lock:
+        return dict(
+            _estatisticas,
+            em_memoria=len(_datasets),
+            em_disco=len(_em_disco),
+            mb=round(sum(e['bytes'] for e in _datasets.values()) / 2 ** 20, 1),
+            orcamento_mb=DATASET_MEMORY_MB,
+        )
+
+def resident_datasets():
+    """
+    Lista os conjuntos de dados registados, em memória e removidos para disco.
+
+    Returns:
+        pd.DataFrame: Por conjunto, 'nome', 'linhas', 'mb', 'estado' ('memória' ou 'disco'),
+                      'acessos' e 'ultimo_acesso', do mais para o menos recente.
+    """
+    with _lock:
+        linhas = [dict(entrada, estado='memória') for entrada in reversed(_datasets.values())]
+        linhas += [dict(entrada, estado='disco') for entrada in _em_disco.values()]
+    colunas = ['nome', 'linhas', 'mb', 'estado', 'acessos', 'ultimo_acesso']
+    if not linhas:
+        return pd.DataFrame(columns=colunas)
+    df = pd.DataFrame(linhas)
+    df['mb'] = (df['bytes'] / 2 ** 20).round(1)
+    df['ultimo_acesso'] = pd.to_datetime(df['ultimo_acesso'], unit='s').dt.strftime('%H:%M:%S')
+    return df[colunas]
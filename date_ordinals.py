@@ -0,0 +1,85 @@
+# date_ordinals.py
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# Valor usado no lugar de datas nulas/inválidas (menor que qualquer data real)
+NAT_ORDINAL = np.iinfo(np.int32).min
+
+# Colunas de data convertidas em ordinais no carregamento: coluna original -> coluna ordinal
+DATE_ORDINAL_COLUMNS = {
+    'admissao': 'admissao_ord',
+    'demissao': 'demissao_ord',
+    'data_de_nasc.': 'nascimento_ord',
+    'limite': 'limite_ord',
+}
+
+_EPOCA = datetime.date(1970, 1, 1)
+
+def to_day_ordinals(serie):
+    """
+    Converte uma coluna de datas em ordinais de dia (dias desde 01/01/1970) do tipo int32.
+
+    Args:
+        serie (pd.Series): A coluna de datas (valores não convertíveis são tratados como nulos).
+
+    Returns:
+        np.ndarray: Array int32, com NAT_ORDINAL nas posições sem data válida.
+    """
+    datas = pd.to_datetime(serie, errors='coerce')
+    validos = datas.notna().to_numpy()
+    dias = datas.to_numpy(dtype='datetime64[D]').view(np.int64)
+    return np.where(validos, dias, NAT_ORDINAL).astype(np.int32)
+
+def date_to_ordinal(data):
+    """
+    Converte uma data (datetime.date ou pd.Timestamp) no respetivo ordinal de dia.
+
+    Args:
+        data (datetime.date): A data a converter.
+
+    Returns:
+        int: O número de dias desde 01/01/1970.
+    """
+    if isinstance(data, datetime.datetime):
+        data = data.date()
+    return (data - _EPOCA).days
+
+def ordinal_range_mask(ordinais, data_inicial, data_final):
+    """
+    Máscara das linhas cuja data (em ordinais) está entre data_inicial e data_final,
+    inclusive. Linhas sem data válida nunca estão no intervalo.
+
+    Args:
+        ordinais (pd.Series ou np.ndarray): Coluna de ordinais de dia (ver to_day_ordinals).
+        data_inicial (datetime.date): Início do intervalo.
+        data_final (datetime.date): Fim do intervalo.
+
+    Returns:
+        np.ndarray: Array booleano com uma posição por linha.
+    """
+    ordinais = np.asarray(ordinais)
+    return (ordinais >= date_to_ordinal(data_inicial)) & (ordinais <= date_to_ordinal(data_final))
+
+def add_date_ordinal_columns(df):
+    """
+    Acrescenta ao DataFrame as colunas de ordinais de dia (ver DATE_ORDINAL_COLUMNS) e
+    o mês/dia de nascimento ('nascimento_mes', 'nascimento_dia', 0 quando a data é nula),
+    para que filtros e KPIs comparem inteiros em vez de criar objetos date por linha.
+    Modifica o DataFrame no local (inplace).
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado.
+    """
+    for coluna, coluna_ordinal in DATE_ORDINAL_COLUMNS.items():
+        if coluna in df.columns:
+            df[coluna_ordinal] = to_day_ordinals(df[coluna])
+        else:
+            df[coluna_ordinal] = np.full(len(df), NAT_ORDINAL, dtype=np.int32)
+
+    nascimento = pd.to_datetime(df['data_de_nasc.'], errors='coerce') if 'data_de_nasc.' in df.columns \
+        else pd.Series(pd.NaT, index=df.index)
+    df['nascimento_mes'] = nascimento.dt.month.fillna(0).astype(np.int8)
+    df['nascimento_dia'] = nascimento.dt.day.fillna(0).astype(np.int8)
+    return
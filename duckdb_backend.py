@@ -0,0 +1,291 @@
+# duckdb_backend.py
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from aggregations import DIMENSOES
+from config import QUERY_BACKEND, FILTER_CACHE_SIZE
+from date_ordinals import NAT_ORDINAL
+from filter_engine import MULTISELECT_COLUMNS, RANGE_FILTERS, convert_range_limit, normalize_filters
+from perf import timed
+
+try:
+    import duckdb
+    import pyarrow as pa
+    DUCKDB_DISPONIVEL = True
+except ImportError: # duckdb e pyarrow são opcionais: sem eles é usado o caminho pandas
+    DUCKDB_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+# Coluna com a posição de cada linha no DataFrame, usada para devolver máscaras
+_LINHA = '_linha'
+
+def resolve_query_backend(backend=None):
+    """
+    Determina o motor de consultas a usar.
+
+    Args:
+        backend (str, optional): 'pandas' ou 'duckdb'. O padrão é o valor configurado em
+                                 config.QUERY_BACKEND.
+
+    Returns:
+        str: 'duckdb' se foi pedido e está instalado, senão 'pandas'.
+    """
+    backend = backend or QUERY_BACKEND
+    if backend == 'duckdb' and not DUCKDB_DISPONIVEL:
+        logger.warning("RH_QUERY_BACKEND=duckdb, mas o duckdb/pyarrow não está instalado: a usar o pandas")
+        return 'pandas'
+    return backend
+
+def _identificador(coluna):
+    """
+    Nome de coluna entre aspas para o SQL (e.g., 'filho(s)').
+    """
+    return '"' + coluna.replace('"', '""') + '"'
+
+class DuckDBBackend:
+    """
+    Motor de consultas alternativo ao FilterIndex + OlapCube: as colunas usadas pelos
+    filtros e contagens são registadas numa ligação DuckDB em memória como uma tabela
+    Arrow (sem cópia para o formato do DuckDB), e os filtros da barra lateral e as
+    agregações dos gráficos são traduzidos em SQL.
+
+    Tem a mesma interface do FilterIndex (normalize_filters, mask, cache_info) e devolve
+    com slice um objeto com a interface de olap_cube.CubeSlice, para ser usado por
+    aggregations.Agregados; os resultados são os mesmos do caminho pandas.
+    """
+
+    def __init__(self, df, cache_size=FILTER_CACHE_SIZE):
+        """
+        Args:
+            df (pd.DataFrame): O DataFrame pré-processado completo.
+            cache_size (int, optional): Número máximo de máscaras memorizadas.
+        """
+        self.n_linhas = len(df)
+        self._categorias = {}
+        self._limites = {}
+        colunas = {_LINHA: pa.array(np.arange(self.n_linhas, dtype=np.int64))}
+
+        for coluna in dict.fromkeys(MULTISELECT_COLUMNS + DIMENSOES):
+            if coluna not in df.columns:
+                continue
+            serie = df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                self._categorias[coluna] = serie.cat.categories
+                colunas[coluna] = pa.array(serie.astype(object).where(serie.notna(), None), type=pa.string())
+            else:
+                colunas[coluna] = pa.array(serie.to_numpy(dtype='float64', na_value=np.nan), from_pandas=True)
+
+        for coluna in {coluna for coluna, _ in RANGE_FILTERS.values()}:
+            if coluna not in df.columns or coluna in colunas:
+                continue
+            if coluna.endswith('_ord'): # Ordinais de dia: NAT_ORDINAL passa a NULL
+                valores = df[coluna].to_numpy()
+                colunas[coluna] = pa.array(valores, mask=valores == NAT_ORDINAL)
+            else:
+                colunas[coluna] = pa.array(df[coluna].to_numpy(dtype='float64', na_value=np.nan), from_pandas=True)
+        if 'ald' in df.columns:
+            colunas['ald_preenchido'] = pa.array(df['ald'].notna().to_numpy())
+
+        self._tabela = pa.table(colunas)
+        self._con = duckdb.connect()
+        self._con.register('rh', self._tabela)
+        # Uma ligação DuckDB não deve ser usada por várias threads ao mesmo tempo
+        self._lock_con = threading.Lock()
+
+        for coluna in {coluna for coluna, _ in RANGE_FILTERS.values()}:
+            if coluna in colunas:
+                minimo, maximo = self._consultar(
+                    f"SELECT min({_identificador(coluna)}), max({_identificador(coluna)}) FROM rh")[0]
+                self._limites[coluna] = (minimo, maximo)
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _consultar(self, sql, parametros=()):
+        """
+        Executa uma consulta e devolve todas as linhas do resultado.
+        """
+        with self._lock_con:
+            return self._con.execute(sql, list(parametros)).fetchall()
+
+    def normalize_filters(self, selected_filters):
+        """
+        Converte os filtros selecionados na mesma forma canónica do FilterIndex (ver
+        filter_engine.normalize_filters), com os limites calculados pelo DuckDB.
+
+        Args:
+            selected_filters (dict): Os filtros selecionados na barra lateral.
+
+        Returns:
+            tuple: Pares (chave, valor) ordenados pela chave.
+        """
+        return normalize_filters(selected_filters, self._limites)
+
+    def _where(self, filtros_canonicos):
+        """
+        Traduz os filtros canónicos numa cláusula WHERE com parâmetros.
+        """
+        condicoes, parametros = [], []
+        for key, value in filtros_canonicos:
+            if key in RANGE_FILTERS:
+                coluna, limite = RANGE_FILTERS[key]
+                if coluna not in self._limites:
+                    raise KeyError(coluna)
+                condicoes.append(f"{_identificador(coluna)} {'>=' if limite == 'min' else '<='} ?")
+                parametros.append(convert_range_limit(coluna, value))
+            else:
+                if key not in self._categorias:
+                    raise KeyError(key)
+                condicoes.append(f"{_identificador(key)} IN ({', '.join('?' * len(value))})")
+                parametros.extend(str(v) for v in value)
+        return ('WHERE ' + ' AND '.join(condicoes)) if condicoes else '', parametros
+
+    @timed('duckdb_backend.DuckDBBackend.mask')
+    def mask(self, selected_filters):
+        """
+        Devolve a máscara booleana das linhas que satisfazem todos os filtros (ver
+        FilterIndex.mask), com a mesma cache LRU pela forma canónica dos filtros.
+
+        Args:
+            selected_filters (dict): Os filtros selecionados na barra lateral.
+
+        Returns:
+            np.ndarray: Array booleano (só de leitura) com uma posição por linha do DataFrame.
+        """
+        chave = self.normalize_filters(selected_filters)
+        with self._lock:
+            mascara = self._cache.get(chave)
+            if mascara is not None:
+                self._cache.move_to_end(chave)
+                self.hits += 1
+                return mascara
+            self.misses += 1
+
+        where, parametros = self._where(chave)
+        with self._lock_con:
+            linhas = self._con.execute(f"SELECT {_LINHA} FROM rh {where}", parametros).fetchnumpy()[_LINHA]
+        mascara = np.zeros(self.n_linhas, dtype=bool)
+        mascara[np.asarray(linhas, dtype=np.int64)] = True
+        mascara.flags.writeable = False
+
+        with self._lock:
+            self._cache[chave] = mascara
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return mascara
+
+    def cache_info(self):
+        """
+        Devolve as estatísticas da cache de máscaras (ver FilterIndex.cache_info).
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'tamanho': len(self._cache), 'max': self._cache_size}
+
+    def slice(self, filtros_canonicos):
+        """
+        Devolve as agregações dos filtros, calculadas em SQL quando são pedidas.
+
+        Args:
+            filtros_canonicos (tuple): Os filtros na forma canónica (ver normalize_filters).
+
+        Returns:
+            DuckDBSlice: Objeto com a interface de olap_cube.CubeSlice.
+        """
+        return DuckDBSlice(self, *self._where(filtros_canonicos))
+
+class DuckDBSlice:
+    """
+    Agregações de um conjunto de filtros em SQL, com a interface de olap_cube.CubeSlice
+    (total, dimensoes, rollup e admissoes_por_mes).
+    """
+
+    def __init__(self, backend, where, parametros):
+        self._backend = backend
+        self._where = where
+        self._parametros = parametros
+        self._contagens = None
+        self.total = backend._consultar(f"SELECT count(*) FROM rh {where}", parametros)[0][0]
+
+    @property
+    def dimensoes(self):
+        return [coluna for coluna in DIMENSOES if coluna in self._backend._tabela.column_names]
+
+    def _contar_dimensoes(self):
+        """
+        Conta todas as dimensões numa única consulta (um GROUP BY por dimensão, unidos com
+        UNION ALL), pois cada consulta ao DuckDB tem um custo fixo.
+        """
+        if self._contagens is None:
+            partes, parametros = [], []
+            for dimensao in self.dimensoes:
+                coluna = _identificador(dimensao)
+                partes.append(
+                    f"SELECT '{dimensao}' AS dimensao, CAST({coluna} AS VARCHAR) AS valor, count(*) AS n "
+                    f"FROM rh {self._where} {'AND' if self._where else 'WHERE'} {coluna} IS NOT NULL "
+                    f"GROUP BY {coluna}")
+                parametros.extend(self._parametros)
+            self._contagens = {dimensao: {} for dimensao in self.dimensoes}
+            for dimensao, valor, n in self._backend._consultar(' UNION ALL '.join(partes), parametros):
+                self._contagens[dimensao][valor] = n
+        return self._contagens
+
+    def rollup(self, dimensao):
+        """
+        Conta os funcionários por valor de uma dimensão (GROUP BY), no mesmo formato das
+        contagens por linhas de aggregations.
+
+        Args:
+            dimensao (str): Uma dimensão de aggregations.DIMENSOES.
+
+        Returns:
+            pd.Series: Todas as categorias, ou o intervalo de valores inteiros existentes.
+        """
+        contagens = pd.Series(self._contar_dimensoes()[dimensao], dtype=np.int64)
+        if dimensao in self._backend._categorias:
+            categorias = self._backend._categorias[dimensao]
+            contagens = contagens.reindex(categorias, fill_value=0)
+            return pd.Series(contagens.to_numpy(dtype=np.int64),
+                             index=pd.CategoricalIndex(categorias, categories=categorias), name='count')
+        if contagens.empty:
+            return pd.Series([], dtype=np.int64, name='count')
+        valores = contagens.index.astype(float).to_numpy(dtype=np.int64)
+        indice = np.arange(valores.min(), valores.max() + 1)
+        contagens.index = valores
+        return pd.Series(contagens.reindex(indice, fill_value=0).to_numpy(dtype=np.int64), index=indice, name='count')
+
+    def admissoes_por_mes(self):
+        """
+        Número de admissões por mês (funcionários com 'ald' preenchido), como em
+        Agregados.admissoes_por_mes.
+
+        Returns:
+            pd.Series: Contagem por mês, indexada por strings 'AAAA-MM' por ordem cronológica.
+        """
+        linhas = self._backend._consultar(
+            f"SELECT strftime(DATE '1970-01-01' + admissao_ord, '%Y-%m') AS mes, "
+            f"count(*) FILTER (WHERE ald_preenchido) FROM rh {self._where} "
+            f"{'AND' if self._where else 'WHERE'} admissao_ord IS NOT NULL GROUP BY mes ORDER BY mes",
+            self._parametros)
+        return pd.Series([n for _, n in linhas], index=[mes for mes, _ in linhas], dtype=np.int64, name='count')
+
+@timed()
+def build_duckdb_backend(df):
+    """
+    Regista o DataFrame pré-processado numa ligação DuckDB em memória.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+
+    Returns:
+        DuckDBBackend: O motor de consultas, reutilizado em todos os reruns do mesmo ficheiro.
+    """
+    return DuckDBBackend(df)
@@ -0,0 +1,153 @@
+# export.py
+import itertools
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from config import EXPORT_CHUNK_ROWS
+from date_ordinals import DATE_ORDINAL_COLUMNS
+from perf import timed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIVEL = True
+except ImportError: # pyarrow é opcional: sem ele a exportação em Parquet fica indisponível
+    PARQUET_DISPONIVEL = False
+
+try:
+    import xlsxwriter
+    XLSX_DISPONIVEL = True
+except ImportError: # xlsxwriter é opcional: sem ele a exportação em Excel fica indisponível
+    XLSX_DISPONIVEL = False
+
+# Colunas auxiliares criadas no pré-processamento que não fazem parte dos dados exportados
+_COLUNAS_INTERNAS = set(DATE_ORDINAL_COLUMNS.values()) | {'nascimento_mes', 'nascimento_dia'}
+
+def export_columns(df):
+    """
+    Devolve as colunas do DataFrame pré-processado que são exportadas (sem as auxiliares).
+    """
+    return [c for c in df.columns if c not in _COLUNAS_INTERNAS]
+
+def iter_chunks(df, mask, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Percorre as linhas selecionadas pela máscara em blocos de até chunk_rows linhas, sem
+    criar o DataFrame filtrado completo.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+        mask (np.ndarray): Máscara booleana das linhas a exportar.
+        chunk_rows (int, optional): Número máximo de linhas por bloco.
+
+    Yields:
+        pd.DataFrame: Blocos consecutivos das linhas selecionadas (apenas as colunas exportadas).
+    """
+    colunas = export_columns(df)
+    linhas = np.flatnonzero(mask)
+    for inicio in range(0, len(linhas), chunk_rows):
+        yield df.iloc[linhas[inicio:inicio + chunk_rows]][colunas]
+
+def iter_csv(df, mask, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Gera o CSV (UTF-8) das linhas selecionadas bloco a bloco: o cabeçalho e depois um
+    pedaço de bytes por bloco de linhas.
+
+    Yields:
+        bytes: Pedaços consecutivos do ficheiro CSV.
+    """
+    colunas = export_columns(df)
+    yield df.iloc[:0][colunas].to_csv(index=False).encode('utf-8')
+    for bloco in iter_chunks(df, mask, chunk_rows):
+        yield bloco.to_csv(index=False, header=False).encode('utf-8')
+
+def write_csv(df, mask, destino, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Escreve o CSV das linhas selecionadas num ficheiro binário aberto.
+    """
+    for pedaco in iter_csv(df, mask, chunk_rows):
+        destino.write(pedaco)
+
+def write_parquet(df, mask, destino, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Escreve as linhas selecionadas em Parquet, um row group por bloco (requer pyarrow).
+    O esquema é inferido do primeiro bloco, sem converter as colunas completas.
+    """
+    blocos = iter_chunks(df, mask, chunk_rows)
+    primeiro = next(blocos, df.iloc[:0][export_columns(df)])
+    schema = pa.Schema.from_pandas(primeiro, preserve_index=False)
+    # Colunas object só com nulos no primeiro bloco (ou sem linhas) não têm tipo: ficam como texto
+    for i, campo in enumerate(schema):
+        if pa.types.is_null(campo.type):
+            schema = schema.set(i, pa.field(campo.name, pa.string()))
+    with pq.ParquetWriter(destino, schema) as writer:
+        for bloco in itertools.chain([primeiro], blocos):
+            writer.write_table(pa.Table.from_pandas(bloco, schema=schema, preserve_index=False))
+
+def xlsx_cell_value(valor):
+    """
+    Converte um valor do DataFrame num tipo suportado pelo xlsxwriter (nulos ficam em branco).
+    """
+    if valor is None or valor is pd.NaT or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NA:
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+def write_xlsx(df, mask, destino, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Escreve as linhas selecionadas numa folha Excel com o modo de memória constante do
+    xlsxwriter (cada linha é gravada em disco assim que é escrita; requer xlsxwriter).
+    """
+    colunas = export_columns(df)
+    workbook = xlsxwriter.Workbook(destino, {'constant_memory': True, 'in_memory': False})
+    folha = workbook.add_worksheet('Dados')
+    formato_data = workbook.add_format({'num_format': 'dd/mm/yyyy'})
+    colunas_data = [i for i, c in enumerate(colunas) if pd.api.types.is_datetime64_any_dtype(df[c])]
+
+    folha.write_row(0, 0, colunas)
+    for i in colunas_data:
+        folha.set_column(i, i, 12, formato_data)
+    linha = 1
+    for bloco in iter_chunks(df, mask, chunk_rows):
+        for registo in bloco.itertuples(index=False, name=None):
+            folha.write_row(linha, 0, [xlsx_cell_value(v) for v in registo])
+            linha += 1
+    workbook.close()
+
+# Formatos de exportação disponíveis: nome -> (função de escrita, extensão, tipo MIME)
+EXPORT_FORMATS = {'CSV': (write_csv, 'csv', 'text/csv')}
+if PARQUET_DISPONIVEL:
+    EXPORT_FORMATS['Parquet'] = (write_parquet, 'parquet', 'application/vnd.apache.parquet')
+if XLSX_DISPONIVEL:
+    EXPORT_FORMATS['Excel (XLSX)'] = (
+        write_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+@timed()
+def export_filtered(df, mask, formato):
+    """
+    Exporta as linhas selecionadas no formato pedido (ver EXPORT_FORMATS), escrevendo-as
+    bloco a bloco num ficheiro temporário em disco, sem criar o DataFrame filtrado nem o
+    ficheiro completo em memória.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+        mask (np.ndarray): Máscara booleana das linhas filtradas (ver FilterIndex.mask).
+        formato (str): Uma das chaves de EXPORT_FORMATS.
+
+    Returns:
+        file: O ficheiro temporário (binário, posicionado no início), apagado quando é fechado.
+    """
+    escrever, _, _ = EXPORT_FORMATS[formato]
+    destino = tempfile.TemporaryFile()
+    try:
+        escrever(df, mask, destino)
+    except BaseException:
+        destino.close()
+        raise
+    destino.seek(0)
+    return destino
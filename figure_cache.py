@@ -0,0 +1,93 @@
+# figure_cache.py
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from aggregations import Agregados
+from config import FIGURE_CACHE_SIZE
+
+# Cache LRU de figuras Plotly: (função, impressão digital dos dados) -> especificação da
+# figura (cópia em dict de fig.to_plotly_json()), da qual cada acerto constrói uma go.Figure
+_figuras = OrderedDict()
+_lock = threading.Lock()
+_estatisticas = {'hits': 0, 'misses': 0}
+
+def _fingerprint(valor, dimensoes):
+    """
+    Calcula a impressão digital de um argumento de uma função de gráfico.
+    Para Agregados só contam as dimensões usadas pelo gráfico; DataFrames pequenos
+    (já agregados, e.g., o resultado de FreqUnica) são hasheados por conteúdo.
+    """
+    if isinstance(valor, Agregados):
+        return '|'.join(valor.fingerprint(d) for d in dimensoes) if not valor.empty else 'vazio'
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        h = hashlib.sha1(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+        if isinstance(valor, pd.DataFrame):
+            h.update(repr(list(valor.columns)).encode('utf-8'))
+        return h.hexdigest()
+    return repr(valor)
+
+def cached_figure(*dimensoes):
+    """
+    Decorador que memoriza as figuras devolvidas por uma função de charts.py.
+    A chave é o nome da função mais a impressão digital dos dados agregados de entrada,
+    pelo que um gráfico cujas contagens não mudaram não volta a passar pelo plotly.express.
+
+    Guarda-se a especificação serializável da figura e não o objeto: cada acerto devolve
+    uma go.Figure nova, que quem a recebe pode alterar sem afetar as outras sessões. As
+    figuras sem traços (os avisos "Sem dados") não são memorizadas, por serem mais baratas
+    de construir do que de reconstruir. O st.plotly_chart continua a validar e a serializar
+    a figura para JSON em cada rerun.
+
+    Args:
+        *dimensoes (str): As dimensões de Agregados usadas pelo gráfico (e.g., 'sexo').
+
+    Returns:
+        callable: O decorador.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            chave = (
+                funcao.__qualname__,
+                tuple(_fingerprint(a, dimensoes) for a in args),
+                tuple(sorted((k, _fingerprint(v, dimensoes)) for k, v in kwargs.items())),
+            )
+            with _lock:
+                especificacao = _figuras.get(chave)
+                if especificacao is not None:
+                    _figuras.move_to_end(chave)
+                    _estatisticas['hits'] += 1
+                else:
+                    _estatisticas['misses'] += 1
+            if especificacao is not None:
+                return go.Figure(especificacao)
+
+            figura = funcao(*args, **kwargs)
+            if not figura.data:
+                return figura
+
+            # to_dict copia a especificação: a figura devolvida não partilha estado com a cache
+            especificacao = figura.to_dict()
+            with _lock:
+                _figuras[chave] = especificacao
+                while len(_figuras) > FIGURE_CACHE_SIZE:
+                    _figuras.popitem(last=False)
+            return figura
+        return wrapper
+    return decorador
+
+def figure_cache_info():
+    """
+    Devolve as estatísticas da cache de figuras.
+
+    Returns:
+        dict: Número de acertos ('hits'), falhas ('misses'), figuras em cache ('tamanho')
+              e capacidade máxima ('max').
+    """
+    with _lock:
+        return dict(_estatisticas, tamanho=len(_figuras), max=FIGURE_CACHE_SIZE)
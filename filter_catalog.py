@@ -0,0 +1,149 @@
+# filter_catalog.py
+import numpy as np
+import pandas as pd
+
+from filter_engine import MULTISELECT_COLUMNS
+from perf import timed
+
+# Colunas hierárquicas: a seleção de cada nível restringe as opções dos níveis seguintes
+HIERARQUIA = ['empresa', 'setor', 'sub_setor', 'funcao']
+
+# Colunas dos filtros de intervalo da barra lateral (sliders)
+COLUNAS_INTERVALO = ['idade', 'quantos']
+
+class FilterCatalog:
+    """
+    Catálogo das opções dos filtros da barra lateral, construído uma única vez por ficheiro
+    carregado: para cada coluna de seleção múltipla guarda as opções (pela ordem das
+    categorias, ver utils.codificar_categorias) e o número de funcionários de cada uma, e
+    para as colunas de intervalo o mínimo e o máximo.
+
+    Guarda também as combinações distintas de HIERARQUIA com o respetivo número de linhas
+    (uma tabela muito menor do que o DataFrame), a partir da qual as opções de um nível são
+    restringidas às que coexistem com a seleção dos níveis anteriores (e.g., só os setores
+    das empresas escolhidas), com as contagens correspondentes.
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df (pd.DataFrame): O DataFrame pré-processado completo.
+        """
+        self._categorias = {}
+        self._contagens = {}
+        for coluna in MULTISELECT_COLUMNS:
+            if coluna not in df.columns:
+                continue
+            categorias = df[coluna].astype('category')
+            codigos = categorias.cat.codes.to_numpy()
+            n_categorias = len(categorias.cat.categories)
+            # O código -1 (nulo) é deslocado para a posição 0 e descartado
+            contagens = np.bincount(codigos + 1, minlength=n_categorias + 1)[1:]
+            self._categorias[coluna] = categorias.cat.categories
+            self._contagens[coluna] = pd.Series(contagens, index=categorias.cat.categories, name='count')
+
+        self._intervalos = {}
+        for coluna in COLUNAS_INTERVALO:
+            if coluna not in df.columns:
+                continue
+            minimo, maximo = df[coluna].min(), df[coluna].max()
+            if pd.notna(minimo) and pd.notna(maximo):
+                self._intervalos[coluna] = (int(minimo), int(maximo))
+
+        # Combinações distintas dos níveis da hierarquia e número de linhas de cada uma
+        self._niveis = [coluna for coluna in HIERARQUIA if coluna in self._categorias]
+        if self._niveis:
+            codigos = np.column_stack([df[coluna].astype('category').cat.codes.to_numpy()
+                                       for coluna in self._niveis])
+            self._combinacoes, self._linhas_combinacao = np.unique(codigos, axis=0, return_counts=True)
+        else:
+            self._combinacoes = np.empty((0, 0), dtype=np.int8)
+            self._linhas_combinacao = np.empty(0, dtype=np.int64)
+
+    def options(self, coluna):
+        """
+        Devolve as opções de uma coluna que existem no ficheiro (sem nulos).
+
+        Args:
+            coluna (str): O nome da coluna (ver filter_engine.MULTISELECT_COLUMNS).
+
+        Returns:
+            list: Os valores, pela ordem das categorias.
+        """
+        contagens = self._contagens[coluna]
+        return list(contagens.index[contagens.to_numpy() > 0])
+
+    def counts(self, coluna):
+        """
+        Devolve o número de funcionários de cada opção de uma coluna no ficheiro completo.
+
+        Args:
+            coluna (str): O nome da coluna.
+
+        Returns:
+            pd.Series: Contagem por valor (só valores existentes), pela ordem das categorias.
+        """
+        contagens = self._contagens[coluna]
+        return contagens[contagens > 0]
+
+    def value_range(self, coluna):
+        """
+        Devolve o mínimo e o máximo de uma coluna de intervalo (e.g., 'idade').
+
+        Args:
+            coluna (str): O nome da coluna.
+
+        Returns:
+            tuple: (mínimo, máximo) como inteiros, ou None se a coluna não tiver valores.
+        """
+        return self._intervalos.get(coluna)
+
+    def narrowed(self, coluna, selecoes):
+        """
+        Devolve as opções de uma coluna que coexistem com a seleção dos níveis anteriores
+        da hierarquia, com o número de funcionários de cada uma nessa seleção. Colunas fora
+        da hierarquia, ou sem seleções nos níveis anteriores, devolvem as contagens do
+        ficheiro completo.
+
+        Args:
+            coluna (str): O nome da coluna.
+            selecoes (dict): Os valores escolhidos por coluna (e.g., {'empresa': ['NATURAYO']});
+                             listas vazias não restringem.
+
+        Returns:
+            pd.Series: Contagem por valor (só valores com funcionários), pela ordem das categorias.
+        """
+        if coluna not in self._niveis:
+            return self.counts(coluna)
+        nivel = self._niveis.index(coluna)
+        escolhidas = np.ones(len(self._combinacoes), dtype=bool)
+        restringe = False
+        for j, anterior in enumerate(self._niveis[:nivel]):
+            valores = selecoes.get(anterior) or []
+            if not valores:
+                continue
+            codigos = self._categorias[anterior].get_indexer(valores)
+            escolhidas &= np.isin(self._combinacoes[:, j], codigos[codigos >= 0])
+            restringe = True
+        if not restringe:
+            return self.counts(coluna)
+
+        categorias = self._categorias[coluna]
+        contagens = np.bincount(self._combinacoes[escolhidas, nivel] + 1,
+                                weights=self._linhas_combinacao[escolhidas],
+                                minlength=len(categorias) + 1)[1:].astype(np.int64)
+        contagens = pd.Series(contagens, index=categorias, name='count')
+        return contagens[contagens > 0]
+
+@timed()
+def build_filter_catalog(df):
+    """
+    Constrói o catálogo de opções dos filtros para um DataFrame.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+
+    Returns:
+        FilterCatalog: O catálogo, reutilizado em todos os reruns do mesmo ficheiro.
+    """
+    return FilterCatalog(df)
@@ -0,0 +1,267 @@
+# filter_engine.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import FILTER_CACHE_SIZE
+from date_ordinals import NAT_ORDINAL, date_to_ordinal
+from perf import timed
+
+# Colunas dos filtros de seleção múltipla da barra lateral (ver render_sidebar_filters)
+MULTISELECT_COLUMNS = [
+    'status', 'empresa', 'setor', 'sub_setor', 'funcao', 'custo',
+    'nivel_escolaridade', 'raca', 'sexo', 'filho(s)'
+]
+
+# Filtros de intervalo: chave em selected_filters -> (coluna, limite)
+RANGE_FILTERS = {
+    'idade_min_selecionada': ('idade', 'min'),
+    'idade_max_selecionada': ('idade', 'max'),
+    'quantos_min_selecionados': ('quantos', 'min'),
+    'quantos_max_selecionados': ('quantos', 'max'),
+    'data_inicial_admissao': ('admissao_ord', 'min'),
+    'data_final_admissao': ('admissao_ord', 'max'),
+}
+
+def _valores_ordenaveis(serie):
+    """
+    Converte uma coluna numérica ou de ordinais de dia num array NumPy e na respetiva
+    máscara de valores válidos.
+    """
+    if serie.name.endswith('_ord'):
+        valores = serie.to_numpy()
+        return valores, valores != NAT_ORDINAL
+    return serie.to_numpy(dtype='float64', na_value=np.nan), serie.notna().to_numpy()
+
+def convert_range_limit(coluna, valor):
+    """
+    Converte o valor de um filtro de intervalo para a mesma representação usada no índice
+    (ordinais de dia para as colunas '_ord', float para as restantes).
+    """
+    if coluna.endswith('_ord'):
+        return date_to_ordinal(valor)
+    return float(valor)
+
+def _limite_abrange_tudo(limites, coluna, limite, valor):
+    """
+    Indica se um limite de intervalo não exclui nenhum valor não nulo da coluna. Os limites
+    de datas nunca são descartados: mesmo a abranger todas as datas, o filtro de admissão
+    exclui as linhas sem data, como na comparação original (admissao.dt.date >= valor).
+    """
+    minimo, maximo = limites.get(coluna, (None, None))
+    if minimo is None or coluna.endswith('_ord'):
+        return False
+    valor = convert_range_limit(coluna, valor)
+    return valor <= minimo if limite == 'min' else valor >= maximo
+
+def normalize_filters(selected_filters, limites):
+    """
+    Converte os filtros selecionados numa forma canónica e hashable: filtros vazios são
+    descartados, os valores de seleção múltipla são ordenados sem repetições e os limites
+    de intervalo que abrangem todos os valores existentes (e.g., o slider na posição
+    padrão) são tratados como "sem filtro", exceto os de datas (ver _limite_abrange_tudo).
+    Usada pelo FilterIndex e pelo DuckDBBackend.
+
+    Args:
+        selected_filters (dict): Os filtros selecionados na barra lateral.
+        limites (dict): (mínimo, máximo) dos valores não nulos de cada coluna de intervalo,
+                        na representação de convert_range_limit. Os limites de colunas sem
+                        entrada (ou sem valores) são sempre mantidos.
+
+    Returns:
+        tuple: Pares (chave, valor) ordenados pela chave.
+    """
+    canonicos = []
+    for key, value in selected_filters.items():
+        if not value:
+            continue
+        if key in RANGE_FILTERS:
+            coluna, limite = RANGE_FILTERS[key]
+            if _limite_abrange_tudo(limites, coluna, limite, value):
+                continue
+            canonicos.append((key, value))
+        else:
+            canonicos.append((key, tuple(sorted(set(value), key=str))))
+    return tuple(sorted(canonicos))
+
+class FilterIndex:
+    """
+    Índice de filtros construído uma única vez por ficheiro carregado.
+
+    Para cada coluna de seleção múltipla guarda um bitmap (bits empacotados com
+    np.packbits) por valor da coluna; para as colunas de intervalo ('idade', 'quantos',
+    'admissao_ord') guarda os valores ordenados e a permutação correspondente. Um conjunto
+    de filtros é resolvido combinando os bitmaps com AND bit a bit numa única máscara,
+    sem criar DataFrames intermédios.
+
+    As máscaras calculadas são memorizadas numa cache LRU indexada pela forma canónica
+    dos filtros (ver normalize_filters), pelo que reruns com os mesmos filtros efetivos
+    (e.g., mudar de página) reutilizam a máscara anterior.
+    """
+
+    def __init__(self, df, cache_size=FILTER_CACHE_SIZE):
+        """
+        Args:
+            df (pd.DataFrame): O DataFrame pré-processado completo.
+            cache_size (int, optional): Número máximo de máscaras memorizadas.
+        """
+        self.n_linhas = len(df)
+        self._bitmaps = {}
+        self._posicao_valor = {}
+        self._ordenados = {}
+        self._limites = {}
+
+        # Cache LRU de máscaras, partilhada entre as sessões que usam o mesmo ficheiro
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        for coluna in MULTISELECT_COLUMNS:
+            if coluna not in df.columns:
+                continue
+            categorias = df[coluna].astype('category')
+            codigos = categorias.cat.codes.to_numpy()
+            n_categorias = len(categorias.cat.categories)
+
+            # Uma linha de bits por valor; os nulos (código -1) não pertencem a nenhum valor.
+            # As linhas de cada valor são obtidas de uma única ordenação dos códigos.
+            ordem = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem], np.arange(n_categorias + 1))
+            bitmaps = np.empty((n_categorias, (self.n_linhas + 7) // 8), dtype=np.uint8)
+            mascara = np.zeros(self.n_linhas, dtype=bool)
+            for i in range(n_categorias):
+                linhas = ordem[limites[i]:limites[i + 1]]
+                mascara[linhas] = True
+                bitmaps[i] = np.packbits(mascara)
+                mascara[linhas] = False
+            self._bitmaps[coluna] = bitmaps
+            self._posicao_valor[coluna] = {valor: i for i, valor in enumerate(categorias.cat.categories)}
+
+        for coluna in {coluna for coluna, _ in RANGE_FILTERS.values()}:
+            if coluna not in df.columns:
+                continue
+            valores, validos = _valores_ordenaveis(df[coluna])
+            posicoes = np.flatnonzero(validos)
+            ordem = posicoes[np.argsort(valores[posicoes], kind='stable')]
+            self._ordenados[coluna] = (valores[ordem], ordem)
+            if len(ordem):
+                self._limites[coluna] = (valores[ordem[0]], valores[ordem[-1]])
+
+    def _bitmap_selecao(self, coluna, valores):
+        """
+        Bitmap das linhas cuja 'coluna' pertence a 'valores' (OR dos bitmaps de cada valor).
+        """
+        if coluna not in self._bitmaps:
+            raise KeyError(coluna)
+        linhas = [self._posicao_valor[coluna][v] for v in valores if v in self._posicao_valor[coluna]]
+        if not linhas:
+            return np.zeros(self._bitmaps[coluna].shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self._bitmaps[coluna][linhas], axis=0)
+
+    def _bitmap_intervalo(self, coluna, limite, valor):
+        """
+        Bitmap das linhas com 'coluna' >= valor (limite 'min') ou <= valor (limite 'max').
+        Linhas com valores nulos nunca satisfazem o filtro.
+        """
+        if coluna not in self._ordenados:
+            raise KeyError(coluna)
+        ordenados, ordem = self._ordenados[coluna]
+        valor = convert_range_limit(coluna, valor)
+        if limite == 'min':
+            linhas = ordem[np.searchsorted(ordenados, valor, side='left'):]
+        else:
+            linhas = ordem[:np.searchsorted(ordenados, valor, side='right')]
+        mascara = np.zeros(self.n_linhas, dtype=bool)
+        mascara[linhas] = True
+        return np.packbits(mascara)
+
+    def normalize_filters(self, selected_filters):
+        """
+        Converte os filtros selecionados na forma canónica (ver normalize_filters), usada
+        como chave da cache de máscaras.
+
+        Args:
+            selected_filters (dict): Os filtros selecionados na barra lateral.
+
+        Returns:
+            tuple: Pares (chave, valor) ordenados pela chave.
+        """
+        return normalize_filters(selected_filters, self._limites)
+
+    @timed('filter_engine.FilterIndex.mask')
+    def mask(self, selected_filters):
+        """
+        Devolve a máscara booleana das linhas que satisfazem todos os filtros, reutilizando
+        a máscara memorizada quando os filtros efetivos já foram calculados antes.
+
+        Args:
+            selected_filters (dict): Os filtros selecionados na barra lateral
+                                     (ver render_sidebar_filters e main.py).
+
+        Returns:
+            np.ndarray: Array booleano (só de leitura) com uma posição por linha do DataFrame.
+        """
+        chave = self.normalize_filters(selected_filters)
+        with self._lock:
+            mascara = self._cache.get(chave)
+            if mascara is not None:
+                self._cache.move_to_end(chave)
+                self.hits += 1
+                return mascara
+            self.misses += 1
+
+        mascara = self._calcular_mascara(chave)
+        mascara.flags.writeable = False # A mesma máscara é partilhada entre reruns e sessões
+
+        with self._lock:
+            self._cache[chave] = mascara
+            self._cache.move_to_end(chave)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return mascara
+
+    def cache_info(self):
+        """
+        Devolve as estatísticas da cache de máscaras.
+
+        Returns:
+            dict: Número de acertos ('hits'), falhas ('misses'), entradas em cache
+                  ('tamanho') e capacidade máxima ('max').
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'tamanho': len(self._cache), 'max': self._cache_size}
+
+    def _calcular_mascara(self, filtros_canonicos):
+        """
+        Combina os bitmaps de todos os filtros (já na forma canónica) numa única máscara.
+        """
+        resultado = None
+        for key, value in filtros_canonicos:
+            if key in RANGE_FILTERS:
+                coluna, limite = RANGE_FILTERS[key]
+                bitmap = self._bitmap_intervalo(coluna, limite, value)
+            else:
+                bitmap = self._bitmap_selecao(key, value)
+            resultado = bitmap if resultado is None else np.bitwise_and(resultado, bitmap)
+
+        if resultado is None:
+            return np.ones(self.n_linhas, dtype=bool)
+        return np.unpackbits(resultado, count=self.n_linhas).astype(bool)
+
+@timed()
+def build_filter_index(df):
+    """
+    Constrói o índice de filtros para o DataFrame pré-processado.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+
+    Returns:
+        FilterIndex: O índice pronto a aplicar os filtros da barra lateral.
+    """
+    return FilterIndex(df)
@@ -0,0 +1,153 @@
+# incremental.py
+import numpy as np
+import pandas as pd
+
+from join_index import normalize_keys
+
+# Coluna temporária que acompanha cada linha de 'TODOS' durante o pré-processamento
+ID_COLUMN = '_id_linha'
+
+def row_ids(df):
+    """
+    Calcula um identificador (uint64) para cada linha, a partir do hash do seu conteúdo
+    e do número de ocorrência entre linhas idênticas, para que linhas repetidas também
+    tenham identificadores distintos.
+
+    Args:
+        df (pd.DataFrame): A aba lida do Excel.
+
+    Returns:
+        np.ndarray: Array uint64 com um identificador por linha.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    ocorrencia = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'hash': hashes, 'ocorrencia': ocorrencia}), index=False
+    ).to_numpy()
+
+def sheet_signature(df):
+    """
+    Assinatura da estrutura de uma aba (colunas e dtypes). Se mudar entre versões do
+    ficheiro, as linhas já processadas deixam de ser comparáveis.
+    """
+    return tuple((str(coluna), str(dtype)) for coluna, dtype in df.dtypes.items())
+
+def key_hashes(df, chave):
+    """
+    Devolve as chaves de junção (normalizadas, ver join_index.normalize_keys) e o hash de
+    cada linha de uma aba de enriquecimento ('Férias' ou 'DESLIGADOS'). O hash inclui a
+    posição da linha entre as linhas da mesma chave, pois o JoinIndex escolhe entre linhas
+    repetidas pela ordem da aba: trocar duas linhas da mesma chave também a altera.
+
+    Args:
+        df (pd.DataFrame): A aba de enriquecimento.
+        chave (str): A coluna de junção (e.g., 'nome' ou 'matricula').
+
+    Returns:
+        tuple: (array de chaves, array uint64 de hashes das linhas).
+    """
+    if df.empty or chave not in df.columns:
+        return np.array([], dtype=object), np.array([], dtype=np.uint64)
+    chaves = normalize_keys(df[chave]).reset_index(drop=True)
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    ocorrencia = chaves.groupby(chaves, dropna=False, sort=False).cumcount().to_numpy()
+    return chaves.to_numpy(), pd.util.hash_pandas_object(
+        pd.DataFrame({'hash': hashes, 'ocorrencia': ocorrencia}), index=False
+    ).to_numpy()
+
+def changed_keys(anterior, atual):
+    """
+    Devolve as chaves cujas linhas foram adicionadas, removidas ou alteradas entre duas
+    versões de uma aba de enriquecimento.
+
+    Args:
+        anterior (tuple): (chaves, hashes) da versão anterior (ver key_hashes).
+        atual (tuple): (chaves, hashes) da versão atual.
+
+    Returns:
+        np.ndarray: As chaves afetadas.
+    """
+    chaves_ant, hashes_ant = anterior
+    chaves_atu, hashes_atu = atual
+    if np.array_equal(hashes_ant, hashes_atu): # Aba inalterada
+        return chaves_atu[:0]
+    removidas = chaves_ant[~np.isin(hashes_ant, hashes_atu)]
+    novas = chaves_atu[~np.isin(hashes_atu, hashes_ant)]
+    return np.concatenate([removidas, novas])
+
+def plan_reprocess(estado, df_todos, ids, assinaturas, hashes_ferias, hashes_desligados, merge_key):
+    """
+    Decide que linhas de 'TODOS' têm de ser reprocessadas face à versão anterior do ficheiro:
+    linhas novas ou alteradas e linhas cujas entradas em 'Férias'/'DESLIGADOS' mudaram.
+
+    Args:
+        estado (dict): O estado guardado da versão anterior (ver build_state).
+        df_todos (pd.DataFrame): A aba 'TODOS' da nova versão.
+        ids (np.ndarray): Identificadores das linhas de df_todos (ver row_ids).
+        assinaturas (dict): Assinatura de cada aba da nova versão (ver sheet_signature).
+        hashes_ferias (tuple): Chaves e hashes da aba 'Férias' (ver key_hashes).
+        hashes_desligados (tuple): Chaves e hashes da aba 'DESLIGADOS'.
+        merge_key (str): Chave de junção da aba 'DESLIGADOS' (ou None).
+
+    Returns:
+        np.ndarray ou None: Máscara das linhas de 'TODOS' a reprocessar, ou None se for
+                            necessário reprocessar o ficheiro inteiro.
+    """
+    if estado['assinaturas'] != assinaturas or estado['merge_key'] != merge_key:
+        return None
+
+    reprocessar = ~np.isin(ids, estado['ids_saida'])
+
+    chaves_ferias = changed_keys(estado['ferias'], hashes_ferias)
+    if len(chaves_ferias):
+        reprocessar |= normalize_keys(df_todos['nome']).isin(chaves_ferias).to_numpy()
+
+    if merge_key:
+        chaves_desligados = changed_keys(estado['desligados'], hashes_desligados)
+        if len(chaves_desligados):
+            reprocessar |= normalize_keys(df_todos[merge_key]).isin(chaves_desligados).to_numpy()
+
+    return reprocessar
+
+def assemble_frame(df_anterior, ids_anterior, df_novas, ids, reprocessar):
+    """
+    Monta o DataFrame pré-processado da nova versão: reutiliza as linhas já processadas
+    da versão anterior, acrescenta as linhas reprocessadas e repõe a ordem da aba 'TODOS'.
+
+    Args:
+        df_anterior (pd.DataFrame): O DataFrame pré-processado da versão anterior.
+        ids_anterior (np.ndarray): O identificador de origem de cada linha de df_anterior.
+        df_novas (pd.DataFrame ou None): As linhas reprocessadas, com a coluna ID_COLUMN.
+        ids (np.ndarray): Identificadores das linhas de 'TODOS' da nova versão.
+        reprocessar (np.ndarray): Máscara das linhas de 'TODOS' que foram reprocessadas.
+
+    Returns:
+        pd.DataFrame: O DataFrame completo, com a coluna ID_COLUMN.
+    """
+    manter = np.isin(ids_anterior, ids[~reprocessar])
+    partes = [df_anterior[manter].assign(**{ID_COLUMN: ids_anterior[manter]})]
+    if df_novas is not None and not df_novas.empty:
+        partes.append(df_novas)
+    df = pd.concat(partes, ignore_index=True)
+
+    # Ordena pela posição da linha de origem em 'TODOS'; a ordenação estável mantém
+    # a ordem das linhas geradas por uma mesma linha de origem nas junções
+    posicao = pd.Index(ids).get_indexer(df[ID_COLUMN].to_numpy())
+    return df.iloc[np.argsort(posicao, kind='stable')].reset_index(drop=True)
+
+def build_state(chave_frame, versao, ids_saida, assinaturas, hashes_ferias, hashes_desligados, merge_key):
+    """
+    Reúne a informação necessária para processar incrementalmente a próxima versão do ficheiro.
+
+    Returns:
+        dict: O estado a guardar (ver cache_store.store_state).
+    """
+    return {
+        'chave_frame': chave_frame,
+        'versao': versao,
+        'ids_saida': ids_saida,
+        'assinaturas': assinaturas,
+        'ferias': hashes_ferias,
+        'desligados': hashes_desligados,
+        'merge_key': merge_key,
+    }
@@ -0,0 +1,198 @@
+# ingestion.py
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from cache_store import workbook_fingerprint, cache_key
+from config import BACKGROUND_INGESTION, INGESTION_JOBS
+from data_loader import load_with_disk_cache, PREPROCESSING_VERSION
+from dataset_registry import get_dataset, store_dataset
+
+logger = logging.getLogger(__name__)
+
+# Trabalhos de carregamento por hash do ficheiro (LRU), partilhados por todas as sessões
+_trabalhos = OrderedDict()
+_lock = threading.Lock()
+
+# Loggers com avisos sobre a qualidade dos dados (e.g., aba em falta, chaves repetidas nas
+# junções) emitidos durante o carregamento
+_LOGGERS_DE_AVISOS = ('data_loader', 'join_index', 'data_loader_polars')
+
+class _ColetorDeAvisos(logging.Handler):
+    """
+    Recolhe os avisos dos _LOGGERS_DE_AVISOS emitidos pela thread de um carregamento. As
+    mensagens de st.warning fora da thread do script não chegam ao dashboard, por isso os
+    avisos ficam no estado do trabalho e são mostrados pelo script (ver IngestionJob.status).
+    """
+
+    def __init__(self, avisos):
+        super().__init__(logging.WARNING)
+        self._avisos = avisos
+        self._thread = threading.get_ident()
+
+    def emit(self, record):
+        # O logger é partilhado: só interessam os avisos do carregamento desta thread
+        if record.thread == self._thread:
+            self._avisos.append(record.getMessage())
+
+class _FicheiroEmMemoria(io.BytesIO):
+    """
+    Cópia em memória do ficheiro carregado, com o mesmo nome, para que a thread de
+    carregamento não partilhe a posição de leitura do st.UploadedFile com o script.
+    """
+
+    def __init__(self, conteudo, name):
+        super().__init__(conteudo)
+        self.name = name
+
+class IngestionJob:
+    """
+    Carregamento de um ficheiro Excel numa thread em segundo plano (ver
+    data_loader.load_with_disk_cache). O estado é consultado a cada rerun com status():
+    assim que a aba 'TODOS' está pré-processada fica disponível um DataFrame parcial, sem
+    as colunas vindas de 'Férias' e 'DESLIGADOS', e no fim o DataFrame completo.
+
+    O DataFrame completo não fica no trabalho: é registado no registo de conjuntos de
+    dados partilhados (ver dataset_registry) com a mesma chave do cache em disco, e
+    status() vai buscá-lo lá. Se entretanto tiver sido removido sem cópia em disco, o
+    carregamento é repetido.
+    """
+
+    def __init__(self, excel_file, chave, em_segundo_plano=True):
+        """
+        Args:
+            excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+            chave (str): A chave do conjunto de dados (ver cache_store.cache_key).
+            em_segundo_plano (bool, optional): Se False, o carregamento corre na thread atual
+                                               e o trabalho já está concluído no retorno.
+        """
+        self.chave = chave
+        self._ficheiro = _FicheiroEmMemoria(excel_file.getvalue(), getattr(excel_file, 'name', 'ficheiro.xlsx'))
+        self._em_segundo_plano = em_segundo_plano
+        self._condicao = threading.Condition()
+        self._iniciar()
+
+    def _iniciar(self):
+        """
+        (Re)inicia o carregamento.
+        """
+        self.etapa = "A ler a aba 'TODOS'"
+        self.fracao = 0.0
+        self.df_parcial = None
+        self.erro = None
+        self.avisos = []
+        self.concluido = False
+        if self._em_segundo_plano:
+            threading.Thread(target=self._executar, name='carregamento-rh', daemon=True).start()
+        else:
+            self._executar()
+
+    def _progresso(self, etapa, fracao, df_parcial=None):
+        """
+        Regista o avanço do carregamento (chamada por data_loader.load_incremental).
+        """
+        with self._condicao:
+            self.etapa = etapa
+            self.fracao = fracao
+            if df_parcial is not None:
+                self.df_parcial = df_parcial
+            self._condicao.notify_all()
+
+    def _executar(self):
+        """
+        Corpo da thread: carrega o ficheiro e guarda o resultado ou o erro.
+        """
+        avisos = []
+        coletor = _ColetorDeAvisos(avisos)
+        for nome in _LOGGERS_DE_AVISOS:
+            logging.getLogger(nome).addHandler(coletor)
+        try:
+            self._ficheiro.seek(0)
+            df = load_with_disk_cache(self._ficheiro, progresso=self._progresso)
+            store_dataset(self.chave, df, self._ficheiro.name)
+        except Exception as erro: # O erro é mostrado pelo script no rerun seguinte
+            logger.exception("Erro ao carregar o ficheiro %s", self._ficheiro.name)
+            erro_final = erro
+        else:
+            erro_final = None
+        finally:
+            for nome in _LOGGERS_DE_AVISOS:
+                logging.getLogger(nome).removeHandler(coletor)
+        with self._condicao:
+            self.erro = erro_final
+            self.avisos = list(dict.fromkeys(avisos)) # Sem repetições, pela ordem de emissão
+            self.etapa, self.fracao = "Concluído", 1.0
+            self.concluido = True
+            self.df_parcial = None
+            self._condicao.notify_all()
+
+    def wait(self, timeout):
+        """
+        Espera até 'timeout' segundos por um avanço do carregamento (ou pelo fim).
+
+        Args:
+            timeout (float): O tempo máximo de espera, em segundos.
+        """
+        with self._condicao:
+            if not self.concluido:
+                self._condicao.wait(timeout)
+
+    def status(self):
+        """
+        Devolve o estado atual do carregamento de uma só vez, para que o rerun use valores
+        coerentes entre si.
+
+        Returns:
+            dict: 'etapa', 'fracao', 'concluido', 'erro', 'avisos' (os avisos de data_loader,
+                  preenchidos no fim do carregamento) e 'df' (o DataFrame completo quando
+                  concluído, senão o parcial ou None).
+        """
+        with self._condicao:
+            estado = {
+                'etapa': self.etapa,
+                'fracao': self.fracao,
+                'concluido': self.concluido,
+                'erro': self.erro,
+                'avisos': self.avisos,
+                'df': self.df_parcial,
+            }
+        if estado['concluido'] and estado['erro'] is None:
+            estado['df'] = get_dataset(self.chave)
+            if estado['df'] is None: # Removido da memória sem cópia em disco: carrega de novo
+                with self._condicao:
+                    if self.concluido:
+                        self._iniciar()
+                return self.status()
+        return estado
+
+def start_ingestion(excel_file):
+    """
+    Devolve o trabalho de carregamento de um ficheiro, iniciando-o se ainda não existir.
+    Os trabalhos são identificados pelo hash do conteúdo (e pela versão do pré-processamento),
+    pelo que o mesmo ficheiro carregado de novo ou por outra sessão reutiliza o trabalho em
+    curso ou o conjunto de dados partilhado já carregado.
+
+    Args:
+        excel_file (file-like object): O ficheiro Excel carregado (e.g., st.UploadedFile).
+
+    Returns:
+        IngestionJob: O trabalho de carregamento.
+    """
+    chave = cache_key(workbook_fingerprint(excel_file), PREPROCESSING_VERSION)
+    with _lock:
+        trabalho = _trabalhos.get(chave)
+        if trabalho is not None and trabalho.erro is None:
+            _trabalhos.move_to_end(chave)
+            return trabalho
+    # Fora do lock: sem thread em segundo plano o carregamento corre aqui mesmo
+    trabalho = IngestionJob(excel_file, chave, em_segundo_plano=BACKGROUND_INGESTION)
+    with _lock:
+        existente = _trabalhos.get(chave)
+        if existente is not None and existente.erro is None:
+            trabalho = existente # Outra sessão iniciou o mesmo ficheiro entretanto
+        _trabalhos[chave] = trabalho
+        _trabalhos.move_to_end(chave)
+        while len(_trabalhos) > INGESTION_JOBS:
+            _trabalhos.popitem(last=False)
+    return trabalho
@@ -0,0 +1,111 @@
+# join_index.py
+import logging
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+logger = logging.getLogger(__name__)
+
+# Número máximo de chaves repetidas listadas no aviso de colisões
+_MAX_EXEMPLOS = 10
+
+def normalize_keys(serie):
+    """
+    Normaliza as chaves de junção (e.g., nomes): remove acentos, ignora maiúsculas e
+    minúsculas e reduz espaços repetidos a um só, para que 'João  Silva ' e 'JOAO SILVA'
+    sejam a mesma chave. A normalização é feita uma vez por valor distinto.
+
+    Args:
+        serie (pd.Series): As chaves originais.
+
+    Returns:
+        pd.Series: As chaves normalizadas (object), com o mesmo índice; nulos continuam nulos.
+    """
+    codigos, unicos = pd.factorize(serie)
+    normalizados = np.array(
+        [' '.join(unidecode(str(valor)).casefold().split()) for valor in unicos], dtype=object
+    )
+    resultado = np.full(len(serie), None, dtype=object)
+    validos = codigos >= 0
+    resultado[validos] = normalizados[codigos[validos]]
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+class JoinIndex:
+    """
+    Índice de hash sobre as chaves normalizadas de uma aba de enriquecimento ('Férias' ou
+    'DESLIGADOS'), com no máximo uma linha por chave. Quando uma chave aparece em várias
+    linhas é escolhida sempre a mesma (a de maior prioridade e, em empate, a primeira na
+    aba) e a colisão fica registada em 'collisions', pelo que uma junção nunca multiplica
+    as linhas de 'TODOS'.
+    """
+
+    def __init__(self, chaves, nome_aba, prioridade=None):
+        """
+        Args:
+            chaves (pd.Series): A coluna de junção da aba (e.g., 'nome' ou 'matricula').
+            nome_aba (str): O nome da aba, usado no aviso de colisões.
+            prioridade (pd.Series, optional): Valores que decidem a linha escolhida entre
+                                              repetidas (o maior vence, nulos por último).
+        """
+        self.nome_aba = nome_aba
+        normalizadas = normalize_keys(chaves).reset_index(drop=True)
+        validas = normalizadas.notna().to_numpy()
+
+        # Ordem de preferência das linhas: prioridade decrescente, depois a ordem da aba
+        if prioridade is None:
+            ordem = np.arange(len(normalizadas))
+        else:
+            ordem = pd.Series(prioridade).reset_index(drop=True).sort_values(
+                ascending=False, kind='stable', na_position='last').index.to_numpy()
+        ordem = ordem[validas[ordem]]
+
+        chaves_ordenadas = normalizadas.to_numpy()[ordem]
+        primeira = ~pd.Series(chaves_ordenadas).duplicated().to_numpy()
+        self._index = pd.Index(chaves_ordenadas[primeira])
+        self._linhas = ordem[primeira]
+
+        repetidas = normalizadas[validas & normalizadas.duplicated(keep=False).to_numpy()]
+        originais = pd.Series(chaves).reset_index(drop=True)[repetidas.index]
+        self.collisions = (
+            pd.DataFrame({'chave': repetidas, 'valor_original': originais.astype(str)})
+            .groupby('chave', sort=True)
+            .agg(linhas=('valor_original', 'size'), variantes=('valor_original', lambda v: sorted(set(v))))
+            .reset_index()
+        )
+        if not self.collisions.empty:
+            logger.warning(
+                "Aba '%s': %d chaves aparecem em mais de uma linha (%d linhas ignoradas), e.g. %s",
+                nome_aba, len(self.collisions), int(self.collisions['linhas'].sum() - len(self.collisions)),
+                ', '.join(self.collisions['chave'].head(_MAX_EXEMPLOS))
+            )
+
+    def lookup(self, chaves):
+        """
+        Procura as chaves (normalizadas da mesma forma) no índice numa única operação.
+
+        Args:
+            chaves (pd.Series): As chaves de 'TODOS'.
+
+        Returns:
+            np.ndarray: Para cada chave, a posição da linha correspondente na aba, ou -1.
+        """
+        posicoes = self._index.get_indexer(normalize_keys(chaves).to_numpy())
+        if len(self._linhas) == 0:
+            return posicoes
+        return np.where(posicoes >= 0, self._linhas[posicoes], -1)
+
+def take_rows(df, posicoes, colunas):
+    """
+    Devolve as colunas das linhas indicadas de uma aba, alinhadas com as linhas de 'TODOS'
+    (posições -1 dão valores nulos).
+
+    Args:
+        df (pd.DataFrame): A aba de enriquecimento.
+        posicoes (np.ndarray): As posições devolvidas por JoinIndex.lookup.
+        colunas (list): As colunas a trazer.
+
+    Returns:
+        pd.DataFrame: Uma linha por posição, com índice 0..n-1.
+    """
+    return df[colunas].reset_index(drop=True).reindex(posicoes).reset_index(drop=True)
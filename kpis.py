@@ -0,0 +1,52 @@
+# kpis.py
+import pandas as pd
+
+from date_ordinals import ordinal_range_mask
+from perf import timed
+
+# Status considerados como funcionários em atividade
+STATUS_ATIVOS = ['ATIVO', 'EXPERIENCIA']
+
+@timed()
+def compute_kpis(df_filtrado, data_inicial_periodo, data_final_periodo):
+    """
+    Calcula os Indicadores Chave de Desempenho (KPIs) mostrados na página "Visão Geral".
+
+    Args:
+        df_filtrado (pd.DataFrame): O DataFrame filtrado.
+        data_inicial_periodo (datetime.date): Data inicial do período de análise dos filtros.
+        data_final_periodo (datetime.date): Data final do período de análise dos filtros.
+
+    Returns:
+        dict: 'funcionarios_ativos', 'contratacoes_no_periodo', 'desligamentos_no_periodo'
+              e 'tempo_medio_empresa' (em anos).
+    """
+    ativos = df_filtrado['status'].isin(STATUS_ATIVOS)
+    total_funcionarios_filtrados = int(ativos.sum())
+
+    # Contratações no período selecionado (comparação sobre os ordinais de dia, ver date_ordinals)
+    contratacoes_no_periodo = int(ordinal_range_mask(
+        df_filtrado['admissao_ord'], data_inicial_periodo, data_final_periodo
+    ).sum())
+
+    # Desligamentos no período, filtrando por 'demissao' e status 'DESLIGADO'
+    # Só conta se houver data de demissão (ordinais nulos nunca estão no intervalo)
+    # e se a data de demissão estiver dentro do período selecionado.
+    desligamentos_no_periodo = int((
+        (df_filtrado['status'] == 'DESLIGADO').to_numpy() &
+        ordinal_range_mask(df_filtrado['demissao_ord'], data_inicial_periodo, data_final_periodo)
+    ).sum())
+
+    # --- Cálculo do Tempo Médio de Empresa ---
+    # 'tempo_empresa_anos_frac' é calculado no carregamento (ver tenure.compute_tenure);
+    # a média ignora os funcionários sem data de admissão válida
+    tempo_medio_empresa = df_filtrado.loc[ativos, 'tempo_empresa_anos_frac'].mean()
+    if pd.isna(tempo_medio_empresa):
+        tempo_medio_empresa = 0.0
+
+    return {
+        'funcionarios_ativos': total_funcionarios_filtrados,
+        'contratacoes_no_periodo': contratacoes_no_periodo,
+        'desligamentos_no_periodo': desligamentos_no_periodo,
+        'tempo_medio_empresa': float(tempo_medio_empresa),
+    }
@@ -2,17 +2,31 @@
 import streamlit as st
 import pandas as pd
 import datetime
+import time
 import altair as alt
 
 # Importar componentes modularizados
-from data_loader import load_and_preprocess_data
-from ui_components import render_sidebar_filters, render_kpis, render_aniversaries_and_vacations_section
+from ingestion import start_ingestion
+from filter_engine import build_filter_index
+from filter_catalog import build_filter_catalog
+from sort_index import build_sort_index
+from aggregations import compute_aggregates
+from olap_cube import build_olap_cube
+from duckdb_backend import build_duckdb_backend, resolve_query_backend
+from events import monthly_flows
+from export import EXPORT_FORMATS, export_filtered
+from ui_components import render_sidebar_filters, render_kpis, render_aniversaries_and_vacations_section, \
+    render_dimension_tables, render_snapshot_history, render_paginated_table, render_export_section, \
+    render_perf_panel
 from charts import create_employees_by_company_chart, create_employees_by_function_chart, \
     create_employees_by_children_chart, create_gender_distribution_chart, \
     create_education_level_distribution_chart, create_monthly_admissions_chart, \
     create_cost_type_distribution_chart, create_hires_vs_terminations_chart # Removido create_monthly_turnover_trend_chart
 
-from utils import FreqUnica, meses_portugues
+from snapshot_store import save_snapshot
+from perf import new_rerun, span, start_span
+from config import SNAPSHOTS_ENABLED, PERF_PANEL, INGESTION_POLL_SECONDS
+from utils import FreqUnica, meses_portugues, ordem_escolaridade
 
 # ================================== Configuração da Página ================================
 st.set_page_config(
@@ -23,16 +37,68 @@ st.set_page_config(
 )
 alt.theme.enable("default") # Ativar o tema padrão do Altair
 
+# Identificador deste rerun, registado com cada medição de desempenho (ver perf.py)
+new_rerun()
+
 # ================================== Carregamento e Pré-processamento de Dados ================================
-@st.cache_data
-def get_processed_data(uploaded_file):
+@st.cache_resource(max_entries=4)
+def get_ingestion_job(_uploaded_file, file_id):
+    """
+    Devolve o carregamento em segundo plano do ficheiro (ver ingestion.py), iniciado uma
+    única vez por ficheiro carregado. Entre reinícios do servidor os dados vêm do cache
+    persistente em disco. Um carregamento que falhou é removido deste cache (ver abaixo),
+    para que o próximo rerun chame start_ingestion, que o repete.
+    """
+    return start_ingestion(_uploaded_file)
+
+@st.cache_resource(max_entries=4)
+def get_filter_index(_df_rh, file_id):
+    """
+    Constrói o índice de filtros (bitmaps por valor e colunas ordenadas) uma única vez
+    por ficheiro carregado. O DataFrame não é usado na chave do cache (prefixo '_'),
+    apenas o identificador do ficheiro.
+    """
+    return build_filter_index(_df_rh)
+
+@st.cache_resource(max_entries=4)
+def get_filter_catalog(_df_rh, file_id):
+    """
+    Constrói o catálogo de opções dos filtros da barra lateral (opções, contagens, limites
+    e combinações empresa -> setor -> sub-setor -> função) uma única vez por ficheiro carregado.
+    """
+    return build_filter_catalog(_df_rh)
+
+@st.cache_resource(max_entries=4)
+def get_olap_cube(_df_rh, file_id):
+    """
+    Constrói o cubo de headcount por dimensão e mês de admissão (ver olap_cube.py) uma
+    única vez por ficheiro carregado.
+    """
+    return build_olap_cube(_df_rh)
+
+@st.cache_resource(max_entries=4)
+def get_duckdb_backend(_df_rh, file_id):
+    """
+    Regista o DataFrame numa ligação DuckDB (ver duckdb_backend.py) uma única vez por
+    ficheiro carregado; usado em vez do índice de filtros e do cubo com RH_QUERY_BACKEND=duckdb.
+    """
+    return build_duckdb_backend(_df_rh)
+
+@st.cache_resource(max_entries=4)
+def get_sort_index(_df_rh, file_id):
     """
-    Carrega e pré-processa os dados do ficheiro Excel carregado.
-    Esta função é cacheada para evitar recarregar os dados desnecessariamente.
+    Cria o índice de ordenação da tabela paginada uma única vez por ficheiro carregado
+    (as permutações de cada coluna são calculadas na primeira ordenação por essa coluna).
     """
-    if uploaded_file is not None:
-        return load_and_preprocess_data(uploaded_file)
-    return pd.DataFrame() # Retorna um DataFrame vazio se nenhum ficheiro for carregado
+    return build_sort_index(_df_rh)
+
+@st.cache_resource(max_entries=16)
+def save_daily_snapshot(_df_rh, nome_ficheiro, file_id, data):
+    """
+    Guarda o ficheiro carregado como snapshot do dia, uma única vez por ficheiro e data
+    (a data faz parte da chave do cache para que o snapshot seja gravado de novo no dia seguinte).
+    """
+    return save_snapshot(nome_ficheiro, _df_rh, data)
 
 # ================================== Navegação Principal (Cabeçalho) ================================
 o1, o2, o3, o4 = st.columns([1.2, 0.3, 0.4, 0.4])
@@ -68,12 +134,42 @@ if uploaded_file is None:
     st.info("Por favor, carregue um ficheiro Excel para começar.")
     st.stop() # Interrompe a execução do script até que um ficheiro seja carregado
 
-df_rh = get_processed_data(uploaded_file)
+with span('carregamento') as medicao:
+    carregamento = get_ingestion_job(uploaded_file, uploaded_file.file_id)
+    # Espera um pouco antes de mostrar o progresso: ficheiros já em cache ficam logo prontos
+    carregamento.wait(INGESTION_POLL_SECONDS)
+    estado_carregamento = carregamento.status()
+    df_rh = estado_carregamento['df']
+    medicao['linhas'] = None if df_rh is None else len(df_rh)
+
+if estado_carregamento['erro'] is not None:
+    get_ingestion_job.clear(uploaded_file, uploaded_file.file_id)
+    st.error(f"Não foi possível processar o ficheiro: {estado_carregamento['erro']}")
+    st.stop()
+
+# Avisos sobre a qualidade dos dados (e.g., aba 'DESLIGADOS' em falta) emitidos durante o carregamento
+for aviso in estado_carregamento['avisos']:
+    st.warning(aviso)
+
+if not estado_carregamento['concluido']:
+    st.progress(estado_carregamento['fracao'], text=estado_carregamento['etapa'])
+    if df_rh is None:
+        # A aba 'TODOS' ainda não está pronta: nada para mostrar além do progresso
+        time.sleep(INGESTION_POLL_SECONDS)
+        st.rerun()
+    st.caption("A mostrar a aba 'TODOS'; os dados de férias e desligamentos aparecem quando as restantes abas forem carregadas.")
 
 if df_rh.empty:
     st.warning("O ficheiro carregado está vazio ou não pôde ser processado. Verifique a estrutura do ficheiro.")
     st.stop()
 
+# Os índices e caches seguintes são partilhados por todas as sessões que carregaram o mesmo
+# ficheiro (chave do conjunto de dados) e distinguem os dados parciais dos completos
+dados_id = f"{carregamento.chave}:{'completo' if estado_carregamento['concluido'] else 'parcial'}"
+
+if SNAPSHOTS_ENABLED and estado_carregamento['concluido']:
+    save_daily_snapshot(df_rh, uploaded_file.name, uploaded_file.file_id, datetime.date.today())
+
 # ================================== Filtros de Data ================================
 # Cálculo das datas mínima e máxima para o filtro de admissão
 if not df_rh.empty and 'admissao' in df_rh.columns and pd.api.types.is_datetime64_any_dtype(df_rh['admissao']):
@@ -122,7 +218,7 @@ pagina = st.sidebar.radio("Navegar para:", ["Visão Geral", "Métricas e Gráfic
 
 # ================================== Outros Filtros da Barra Lateral ================================
 st.sidebar.header("Outras Opções de Filtro")
-selected_filters = render_sidebar_filters(df_rh)
+selected_filters = render_sidebar_filters(get_filter_catalog(df_rh, dados_id))
 
 selected_filters['data_inicial_admissao'] = data_inicial_admissao
 selected_filters['data_final_admissao'] = data_final_admissao
@@ -130,28 +226,31 @@ selected_filters['data_final_admissao'] = data_final_admissao
 # =================================================================================
 # --- ⌛Aplicando os Filtros ao DataFrame ---
 # ================================================================================
-df_filtrado = df_rh.copy()
-
-for key, value in selected_filters.items():
-    if value:
-        if key == 'idade_min_selecionada':
-            df_filtrado = df_filtrado[df_filtrado['idade'] >= value]
-        elif key == 'idade_max_selecionada':
-            df_filtrado = df_filtrado[df_filtrado['idade'] <= value]
-        elif key == 'quantos_min_selecionados':
-            df_filtrado = df_filtrado[df_filtrado['quantos'] >= value]
-        elif key == 'quantos_max_selecionados':
-            df_filtrado = df_filtrado[df_filtrado['quantos'] <= value]
-        elif key == 'data_inicial_admissao':
-            df_filtrado = df_filtrado[df_filtrado['admissao'].dt.date >= value]
-        elif key == 'data_final_admissao':
-            df_filtrado = df_filtrado[df_filtrado['admissao'].dt.date <= value]
-        else:
-            df_filtrado = df_filtrado[df_filtrado[key].isin(value)]
+# As contagens vêm do cubo de headcount sempre que os filtros o permitem (ver olap_cube);
+# caso contrário, e nas páginas que precisam das linhas, todos os filtros são combinados
+# numa única máscara (ver filter_engine.FilterIndex), calculada só quando é usada
+with span('filtros') as medicao:
+    if resolve_query_backend() == 'duckdb':
+        # O DuckDB responde tanto às máscaras como às contagens (mesma interface)
+        filter_index = get_duckdb_backend(df_rh, dados_id)
+        fonte_contagens = filter_index
+    else:
+        filter_index = get_filter_index(df_rh, dados_id)
+        fonte_contagens = get_olap_cube(df_rh, dados_id)
+    fatia_cubo = fonte_contagens.slice(filter_index.normalize_filters(selected_filters))
+    # Contagens partilhadas por tabelas e gráficos, calculadas por dimensão quando são usadas
+    agregados = compute_aggregates(df_rh, lambda: filter_index.mask(selected_filters), fatia_cubo)
+    medicao['linhas'] = agregados.total
 
 # ================================== Renderização das Páginas ================================
+# Só a página selecionada é calculada; as secções com widgets próprios (tabelas por
+# dimensão, tabela paginada, histórico e download) são fragmentos (st.fragment) que se
+# reexecutam sozinhos quando esses widgets mudam, sem repetir o resto do script.
+
+terminar_pagina = start_span(f"pagina.{pagina}", linhas=agregados.total)
 
 if pagina == "Visão Geral":
+    df_filtrado = df_rh[filter_index.mask(selected_filters)]
     render_kpis(df_filtrado, data_inicial_admissao, data_final_admissao) # Passando as datas
 
     chart_rh_col1, chart_rh_col2 = st.columns([1.1, 0.9])
@@ -175,7 +274,7 @@ if pagina == "Visão Geral":
         with st.container(border=True):
             if not df_filtrado.empty:
                 # NOVO GRÁFICO: Gênero
-                fig_sexo_trend = create_gender_distribution_chart(df_filtrado)
+                fig_sexo_trend = create_gender_distribution_chart(agregados)
                 st.plotly_chart(fig_sexo_trend, use_container_width=True)
             else:
                 st.info("Sem dados para o gráfico de Distribuição de Gênero.")
@@ -184,108 +283,76 @@ if pagina == "Visão Geral":
         with st.container(border=True):
             if not df_filtrado.empty:
                 # NOVO GRÁFICO: Escolaridade
-                ordem_escolaridade = ['Fundamental', 'Médio', 'Superior Incompleto', 'Superior Completo', 'Pós-graduação']
-                fig_escolaridade_trend = create_education_level_distribution_chart(df_filtrado, ordem_escolaridade)
+                fig_escolaridade_trend = create_education_level_distribution_chart(agregados, ordem_escolaridade)
                 st.plotly_chart(fig_escolaridade_trend, use_container_width=True)
             else:
                 st.info("Sem dados para o gráfico de Nível de Escolaridade.")
 
+    with st.container(border=True):
+        # O headcount depende de todas as admissões anteriores, pelo que os eventos são
+        # calculados sem o filtro de data de admissão e só o período selecionado é mostrado
+        filtros_sem_datas = {k: v for k, v in selected_filters.items()
+                             if k not in ('data_inicial_admissao', 'data_final_admissao')}
+        fluxos = monthly_flows(df_rh, filter_index.mask(filtros_sem_datas),
+                               data_inicial_admissao, data_final_admissao)
+        fig_fluxos = create_hires_vs_terminations_chart(fluxos)
+        st.plotly_chart(fig_fluxos, use_container_width=True)
+
 
 elif pagina == "Métricas e Gráficos":
-    if df_filtrado.empty:
+    if agregados.empty:
         st.info("Nenhum dado para gerar análises detalhadas com os filtros atuais.")
     else:
         blc1, blc2, blc3 = st.columns(3)
 
         with blc1:
-            tab_rh_col1, tab_rh_col2, tab_rh_col3, tab_rh_col4, tab_rh_col5, tab_rh_col6 = st.tabs([
-                "Funcionários por Status", "Qtd. por Nível Escolaridade", "Qtd. por Raça",
-                "Qtd. por Sexo (Gênero)", "Qtd. por Empresa", "Qtd. por Tipo de Custo"
-            ])
-
-            with tab_rh_col1:
-                status_counts = df_filtrado['status'].value_counts().reset_index()
-                status_counts.columns = ['Status', 'Count']
-                status_counts['Percentual'] = (status_counts['Count'] / status_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                st.dataframe(status_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{status_counts['Count'].sum()}`**")
-
-            with tab_rh_col2:
-                ordem_escolaridade = ['Fundamental', 'Médio', 'Superior Incompleto', 'Superior Completo', 'Pós-graduação']
-                escolaridade_counts = df_filtrado['nivel_escolaridade'].value_counts().reset_index()
-                escolaridade_counts.columns = ['Nível Escolaridade', 'Count']
-                escolaridade_counts['Percentual'] = (escolaridade_counts['Count'] / escolaridade_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                escolaridade_counts['Nível Escolaridade'] = pd.Categorical(escolaridade_counts['Nível Escolaridade'], categories=ordem_escolaridade, ordered=True)
-                escolaridade_counts = escolaridade_counts.sort_values('Nível Escolaridade')
-                st.dataframe(escolaridade_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{escolaridade_counts['Count'].sum()}`**")
-
-            with tab_rh_col3:
-                raca_counts = df_filtrado['raca'].value_counts().reset_index()
-                raca_counts.columns = ['Raça', 'Count']
-                raca_counts['Percentual'] = (raca_counts['Count'] / raca_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                st.dataframe(raca_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{raca_counts['Count'].sum()}`**")
-
-            with tab_rh_col4:
-                sexo_counts = df_filtrado['sexo'].value_counts().reset_index()
-                sexo_counts.columns = ['Sexo', 'Count']
-                sexo_counts['Percentual'] = (sexo_counts['Count'] / sexo_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                st.dataframe(sexo_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{sexo_counts['Count'].sum()}`**")
-
-            with tab_rh_col5:
-                empresa_counts = df_filtrado['empresa'].value_counts().reset_index()
-                empresa_counts.columns = ['Empresa', 'Count']
-                empresa_counts['Percentual'] = (empresa_counts['Count'] / empresa_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                st.dataframe(empresa_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{empresa_counts['Count'].sum()}`**")
-
-            with tab_rh_col6:
-                custo_counts = df_filtrado['custo'].value_counts().reset_index()
-                custo_counts.columns = ['Tipo de Custo', 'Count']
-                custo_counts['Percentual'] = (custo_counts['Count'] / custo_counts['Count'].sum() * 100).map('{:.2f}%'.format)
-                st.dataframe(custo_counts, use_container_width=True, hide_index=True)
-                st.markdown(f"**Total de funcionários:** **`{custo_counts['Count'].sum()}`**")
+            render_dimension_tables(agregados, {
+                "Funcionários por Status": ('status', 'Status'),
+                "Qtd. por Nível Escolaridade": ('nivel_escolaridade', 'Nível Escolaridade'),
+                "Qtd. por Raça": ('raca', 'Raça'),
+                "Qtd. por Sexo (Gênero)": ('sexo', 'Sexo'),
+                "Qtd. por Empresa": ('empresa', 'Empresa'),
+                "Qtd. por Tipo de Custo": ('custo', 'Tipo de Custo'),
+            }, ordem_escolaridade)
 
         with blc2:
-            fig_funcao = create_employees_by_function_chart(df_filtrado)
+            fig_funcao = create_employees_by_function_chart(agregados)
             st.plotly_chart(fig_funcao, use_container_width=True)
 
         with blc3:
-            fig_filhos = create_employees_by_children_chart(df_filtrado)
+            fig_filhos = create_employees_by_children_chart(agregados)
             st.plotly_chart(fig_filhos, use_container_width=True)
 
         blc4, blc5, blc6, blc7 = st.columns(4)
         with blc4:
-            fig_sexo = create_gender_distribution_chart(df_filtrado)
+            fig_sexo = create_gender_distribution_chart(agregados)
             st.plotly_chart(fig_sexo, use_container_width=True)
 
         with blc5:
-            ordem_escolaridade = ['Fundamental', 'Médio', 'Superior Incompleto', 'Superior Completo', 'Pós-graduação']
-            fig_escolaridade = create_education_level_distribution_chart(df_filtrado, ordem_escolaridade)
+            fig_escolaridade = create_education_level_distribution_chart(agregados, ordem_escolaridade)
             st.plotly_chart(fig_escolaridade, use_container_width=True)
 
         with blc6:
-            fig_admissoes_mes = create_monthly_admissions_chart(df_filtrado)
+            fig_admissoes_mes = create_monthly_admissions_chart(agregados)
             st.plotly_chart(fig_admissoes_mes, use_container_width=True)
 
         with blc7:
-            fig_custo_tipo = create_cost_type_distribution_chart(df_filtrado)
+            fig_custo_tipo = create_cost_type_distribution_chart(agregados)
             st.plotly_chart(fig_custo_tipo, use_container_width=True)
 
 elif pagina == "Tabelas de Resumo":
     st.header("Dados de Funcionários (Bruto e Filtrado)")
+    mascara_filtros = filter_index.mask(selected_filters)
 
-    if df_filtrado.empty:
+    if agregados.empty:
         st.warning("Nenhum funcionário corresponde aos filtros selecionados. Por favor, ajuste os critérios.")
     else:
-        st.dataframe(df_filtrado[[
+        render_paginated_table(df_rh, mascara_filtros, get_sort_index(df_rh, dados_id), [
             'ald', 'nome', 'status', 'empresa', 'setor', 'funcao', 'custo',
             'admissao', 'tempo_de_empresa', 'data_de_nasc.', 'idade', 'formula_hoje',
             'nivel_escolaridade', 'filho(s)', 'quantos', 'faixa_idade', 'previsao_ferias_2025', 'limite'
-        ]], use_container_width=True)
-        st.markdown(f"**Total de funcionários encontrados:** **`{len(df_filtrado)}`**")
+        ])
+        st.markdown(f"**Total de funcionários encontrados:** **`{agregados.total}`**")
 
     st.write("---")
 
@@ -300,19 +367,29 @@ elif pagina == "Tabelas de Resumo":
                 with st.expander("Expandir"):
                     st.write("Lista de Funcionários de Férias")
     
+    # --- Histórico: composição num snapshot anterior do mesmo ficheiro ---
+    if SNAPSHOTS_ENABLED:
+        st.write("---")
+        st.subheader("Histórico")
+        render_snapshot_history(uploaded_file.name, {
+            'status': 'Status', 'empresa': 'Empresa', 'setor': 'Setor', 'funcao': 'Função',
+            'custo': 'Tipo de Custo', 'sexo': 'Sexo', 'nivel_escolaridade': 'Nível Escolaridade'
+        })
+
     # --- Botão de Download na Página de Tabelas de Resumo ---
     st.write("---")
     st.subheader("Download dos Dados")
-    @st.cache_data
-    def convert_df_to_csv(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv = convert_df_to_csv(df_filtrado)
-
-    st.download_button(
-        label="Baixar dados filtrados em CSV",
-        data=csv,
-        file_name="dados_rh_filtrados.csv",
-        mime="text/csv",
-        help="Clique para baixar os dados da tabela atual em formato CSV."
-    )
+    # O ficheiro é gerado no clique e entregue ao Streamlit a partir de um ficheiro temporário,
+    # sem guardar os bytes em cache (ver export.export_filtered)
+    render_export_section(EXPORT_FORMATS, lambda formato: export_filtered(df_rh, mascara_filtros, formato))
+
+terminar_pagina()
+
+# ================================== Painel de Desempenho ================================
+if PERF_PANEL:
+    render_perf_panel(filter_index)
+
+# Enquanto 'Férias' e 'DESLIGADOS' são carregadas a página é atualizada periodicamente
+if not estado_carregamento['concluido']:
+    time.sleep(INGESTION_POLL_SECONDS)
+    st.rerun()
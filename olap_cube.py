@@ -0,0 +1,244 @@
+# olap_cube.py
+import numpy as np
+import pandas as pd
+
+from date_ordinals import NAT_ORDINAL, date_to_ordinal
+from filter_engine import RANGE_FILTERS
+from perf import timed
+
+# Dimensões do cubo: as colunas contadas em aggregations.DIMENSOES mais 'setor', para que
+# os filtros e gráficos mais comuns sejam respondidos sem tocar nas linhas. 'funcao' fica
+# de fora: com centenas de valores multiplicaria o número de células (é contada por linhas)
+CUBE_DIMENSIONS = ['status', 'empresa', 'setor', 'custo', 'sexo', 'raca', 'nivel_escolaridade', 'quantos']
+
+# Dimensão temporal: o mês de admissão, em meses desde 1970-01 (MES_NULO para datas em falta)
+MES_ADMISSAO = 'admissao_mes'
+MES_NULO = np.iinfo(np.int32).min
+
+def _meses(ordinais):
+    """
+    Converte ordinais de dia (ver date_ordinals) em meses desde 1970-01, com MES_NULO para NaT.
+    """
+    validos = ordinais != NAT_ORDINAL
+    meses = np.full(len(ordinais), MES_NULO, dtype=np.int32)
+    meses[validos] = ordinais[validos].astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+    return meses
+
+def _mes_de(data):
+    """
+    Mês (desde 1970-01) de uma data, e se a data é o primeiro e o último dia do mês.
+    """
+    data = pd.Timestamp(data)
+    mes = (data.year - 1970) * 12 + data.month - 1
+    return mes, data.day == 1, data.is_month_end
+
+def _codigos(serie, linhas=slice(None)):
+    """
+    Códigos de uma dimensão nas linhas dadas: o código da categoria, ou o próprio valor
+    numa dimensão inteira (e.g., 'quantos').
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy()[linhas].astype(np.int64)
+    return serie.to_numpy(dtype=np.int64)[linhas]
+
+class OlapCube:
+    """
+    Cubo OLAP esparso de headcount: para cada combinação existente dos códigos das
+    dimensões (CUBE_DIMENSIONS) e do mês de admissão guarda o número de funcionários e o
+    número de funcionários com 'ald' preenchido (a contagem usada pelo gráfico de admissões
+    por mês). Só as células não vazias são guardadas, pelo que o cubo nunca tem mais
+    células do que o DataFrame tem linhas.
+
+    Um conjunto de filtros é respondido pelo cubo (ver slice) quando só usa dimensões do
+    cubo, 'quantos' incluído, e filtros de data de admissão. Os meses inteiramente dentro
+    do período vêm das células; quando o período começa ou acaba a meio de um mês, só as
+    linhas desse mês são filtradas uma a uma. Os restantes filtros (e.g., 'idade',
+    'funcao' ou 'sub_setor') ficam para o caminho por linhas (FilterIndex).
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df (pd.DataFrame): O DataFrame pré-processado completo.
+        """
+        self._df = df
+        self.dimensoes = [coluna for coluna in CUBE_DIMENSIONS if coluna in df.columns]
+        self._categorias = {coluna: df[coluna].cat.categories for coluna in self.dimensoes
+                            if isinstance(df[coluna].dtype, pd.CategoricalDtype)}
+        codigos = [_codigos(df[coluna]) for coluna in self.dimensoes]
+        meses = _meses(df['admissao_ord'].to_numpy())
+        codigos.append(meses.astype(np.int64))
+        self.dimensoes.append(MES_ADMISSAO)
+
+        # Linhas ordenadas por mês de admissão, para obter as linhas de um mês sem percorrer
+        # o DataFrame (os meses parciais nas extremidades do filtro de datas)
+        self._ordem_meses = np.argsort(meses, kind='stable')
+        self._meses_ordenados = meses[self._ordem_meses]
+
+        com_ald = df['ald'].notna().to_numpy()
+        self._celulas, posicao = np.unique(np.column_stack(codigos), axis=0, return_inverse=True)
+        posicao = posicao.reshape(-1)
+        self._funcionarios = np.bincount(posicao, minlength=len(self._celulas)).astype(np.int64)
+        self._com_ald = np.bincount(posicao, weights=com_ald, minlength=len(self._celulas)).astype(np.int64)
+        self.n_linhas = len(df)
+
+    @property
+    def n_celulas(self):
+        return len(self._celulas)
+
+    def _coluna(self, dimensao):
+        return self._celulas[:, self.dimensoes.index(dimensao)]
+
+    def _limite_mes(self, limite, valor):
+        """
+        Converte um limite de data de admissão no limite dos meses completos respondidos
+        pelas células e, se o limite cair a meio de um mês, nesse mês parcial (ou None).
+        """
+        mes, primeiro_dia, ultimo_dia = _mes_de(valor)
+        if limite == 'min':
+            return (mes, None) if primeiro_dia else (mes + 1, mes)
+        return (mes, None) if ultimo_dia else (mes - 1, mes)
+
+    def _linhas_parciais(self, meses, filtros_canonicos):
+        """
+        Posições das linhas admitidas nos meses parciais que satisfazem todos os filtros.
+        """
+        inicio = np.searchsorted(self._meses_ordenados, meses, side='left')
+        fim = np.searchsorted(self._meses_ordenados, meses, side='right')
+        linhas = np.concatenate([self._ordem_meses[i:j] for i, j in zip(inicio, fim)])
+        selecionadas = np.ones(len(linhas), dtype=bool)
+        for key, value in filtros_canonicos:
+            if key in RANGE_FILTERS:
+                coluna, limite = RANGE_FILTERS[key]
+                if coluna == 'admissao_ord':
+                    valores, value = self._df['admissao_ord'].to_numpy()[linhas], date_to_ordinal(value)
+                else:
+                    valores = _codigos(self._df[coluna], linhas)
+                selecionadas &= valores >= value if limite == 'min' else valores <= value
+            else:
+                codigos = self._categorias[key].get_indexer(list(value))
+                selecionadas &= np.isin(_codigos(self._df[key], linhas), codigos[codigos >= 0])
+        return np.sort(linhas[selecionadas])
+
+    def slice(self, filtros_canonicos):
+        """
+        Seleciona as células que satisfazem os filtros, sem tocar nas linhas do DataFrame.
+
+        Args:
+            filtros_canonicos (tuple): Os filtros na forma canónica de
+                                       FilterIndex.normalize_filters (os limites que
+                                       abrangem todos os valores, exceto os de datas,
+                                       já foram descartados).
+
+        Returns:
+            CubeSlice ou None: A fatia do cubo, ou None se algum filtro não puder ser
+                               respondido pelo cubo.
+        """
+        selecionadas = np.ones(self.n_celulas, dtype=bool)
+        meses_parciais = []
+        for key, value in filtros_canonicos:
+            if key in RANGE_FILTERS:
+                coluna, limite = RANGE_FILTERS[key]
+                if coluna == 'admissao_ord':
+                    value, mes_parcial = self._limite_mes(limite, value)
+                    coluna = MES_ADMISSAO
+                    if mes_parcial is not None:
+                        meses_parciais.append(mes_parcial)
+                    # As datas em falta (MES_NULO) nunca satisfazem um filtro de data
+                    selecionadas &= self._coluna(MES_ADMISSAO) != MES_NULO
+                elif coluna not in self.dimensoes or coluna in self._categorias:
+                    return None
+                valores = self._coluna(coluna)
+                selecionadas &= valores >= value if limite == 'min' else valores <= value
+            elif key in self._categorias:
+                codigos = self._categorias[key].get_indexer(list(value))
+                selecionadas &= np.isin(self._coluna(key), codigos[codigos >= 0])
+            else:
+                return None
+        linhas = self._linhas_parciais(np.unique(meses_parciais), filtros_canonicos) if meses_parciais else None
+        return CubeSlice(self, selecionadas, linhas)
+
+class CubeSlice:
+    """
+    Subconjunto das células de um OlapCube (resultado de OlapCube.slice), mais as linhas dos
+    meses parciais do filtro de datas, com as operações de roll-up usadas por
+    aggregations.Agregados.
+    """
+
+    def __init__(self, cubo, selecionadas, linhas=None):
+        self._cubo = cubo
+        self._selecionadas = selecionadas
+        self._linhas = np.array([], dtype=np.int64) if linhas is None else linhas
+        self.total = int(cubo._funcionarios[selecionadas].sum()) + len(self._linhas)
+
+    def _juntar(self, valores_celulas, pesos_celulas, valores_linhas, pesos_linhas):
+        """
+        Junta os valores (e pesos) das células selecionadas aos das linhas dos meses parciais.
+        """
+        return (np.concatenate([valores_celulas[self._selecionadas], valores_linhas]),
+                np.concatenate([pesos_celulas[self._selecionadas], pesos_linhas]))
+
+    @property
+    def dimensoes(self):
+        """
+        As dimensões que a fatia consegue agregar com rollup.
+        """
+        return self._cubo.dimensoes[:-1]
+
+    def rollup(self, dimensao):
+        """
+        Agrega a fatia por uma dimensão, somando as restantes.
+
+        Args:
+            dimensao (str): Uma dimensão do cubo (exceto o mês de admissão).
+
+        Returns:
+            pd.Series: Número de funcionários por valor, no mesmo formato das contagens por
+                       linhas de aggregations (todas as categorias, ou o intervalo de valores
+                       inteiros existentes na fatia).
+        """
+        cubo = self._cubo
+        valores, pesos = self._juntar(cubo._coluna(dimensao), cubo._funcionarios,
+                                      _codigos(cubo._df[dimensao], self._linhas), np.ones(len(self._linhas), dtype=np.int64))
+        if dimensao in cubo._categorias:
+            categorias = cubo._categorias[dimensao]
+            # O código -1 (valor nulo) é deslocado para a posição 0 e descartado
+            contagens = np.bincount(valores + 1, weights=pesos, minlength=len(categorias) + 1)[1:]
+            return pd.Series(contagens.astype(np.int64), index=pd.CategoricalIndex(categorias, categories=categorias),
+                             name='count')
+        if len(valores) == 0:
+            return pd.Series([], dtype=np.int64, name='count')
+        minimo = valores.min()
+        contagens = np.bincount(valores - minimo, weights=pesos).astype(np.int64)
+        return pd.Series(contagens, index=np.arange(minimo, minimo + len(contagens)), name='count')
+
+    def admissoes_por_mes(self):
+        """
+        Número de admissões por mês (funcionários com 'ald' preenchido), como em
+        Agregados.admissoes_por_mes.
+
+        Returns:
+            pd.Series: Contagem por mês, indexada por strings 'AAAA-MM' por ordem cronológica.
+        """
+        cubo = self._cubo
+        meses, com_ald = self._juntar(cubo._coluna(MES_ADMISSAO), cubo._com_ald,
+                                      _meses(cubo._df['admissao_ord'].to_numpy()[self._linhas]),
+                                      cubo._df['ald'].notna().to_numpy()[self._linhas].astype(np.int64))
+        validos = meses != MES_NULO
+        meses_unicos, posicao = np.unique(meses[validos], return_inverse=True)
+        contagens = np.bincount(posicao, weights=com_ald[validos], minlength=len(meses_unicos)).astype(np.int64)
+        indice = meses_unicos.astype('datetime64[M]').astype(str)
+        return pd.Series(contagens, index=indice, name='count')
+
+@timed()
+def build_olap_cube(df):
+    """
+    Constrói o cubo de headcount para o DataFrame pré-processado.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+
+    Returns:
+        OlapCube: O cubo, reutilizado em todos os reruns do mesmo ficheiro.
+    """
+    return OlapCube(df)
@@ -0,0 +1,216 @@
+# perf.py
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from config import PERF_LOG_PATH, PERF_LOG_MAX_MB, PERF_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Medições recentes de todas as sessões, usadas para as estatísticas p50/p95 por etapa
+_historico = deque(maxlen=PERF_HISTORY_SIZE)
+_lock = threading.Lock()
+
+# O Streamlit executa cada rerun numa thread, pelo que o rerun atual é guardado por thread
+_local = threading.local()
+
+# Linhas do registo em espera: são gravadas em lote por uma thread própria, para que as
+# etapas medidas (e.g., FilterIndex.mask) nunca esperem por escritas em disco
+_fila = queue.SimpleQueue()
+_escritor = None
+_lock_escritor = threading.Lock()
+_lock_ficheiro = threading.Lock()
+
+def new_rerun():
+    """
+    Inicia um novo rerun: gera o identificador que acompanha todas as medições seguintes
+    feitas nesta thread (ver span). Deve ser chamada no início do script (main.py).
+
+    Returns:
+        str: O identificador do rerun.
+    """
+    _local.rerun_id = uuid.uuid4().hex[:12]
+    _local.medicoes = []
+    return _local.rerun_id
+
+def current_rerun():
+    """
+    Devolve o identificador do rerun atual (None fora de um rerun).
+    """
+    return getattr(_local, 'rerun_id', None)
+
+def _gravar(medicao):
+    """
+    Põe uma medição na fila do ficheiro JSON-lines (se configurado), iniciando a thread
+    de escrita na primeira utilização.
+    """
+    global _escritor
+    if not PERF_LOG_PATH:
+        return
+    _fila.put(json.dumps(medicao, ensure_ascii=False) + '\n')
+    if _escritor is None:
+        with _lock_escritor:
+            if _escritor is None:
+                _escritor = threading.Thread(target=_escrever_continuamente, name='registo-perf', daemon=True)
+                _escritor.start()
+                atexit.register(flush_log)
+
+def _retirar_pendentes(linhas):
+    """
+    Junta às linhas dadas todas as que estão na fila, sem esperar.
+    """
+    while True:
+        try:
+            linhas.append(_fila.get_nowait())
+        except queue.Empty:
+            return linhas
+
+def _escrever(linhas):
+    """
+    Acrescenta um lote de linhas ao ficheiro de registo; quando o ficheiro passa de
+    PERF_LOG_MAX_MB é renomeado para '<ficheiro>.1' e começa um novo.
+    """
+    try:
+        with _lock_ficheiro:
+            os.makedirs(os.path.dirname(PERF_LOG_PATH) or '.', exist_ok=True)
+            if os.path.exists(PERF_LOG_PATH) and os.path.getsize(PERF_LOG_PATH) > PERF_LOG_MAX_MB * 2 ** 20:
+                os.replace(PERF_LOG_PATH, PERF_LOG_PATH + '.1')
+            with open(PERF_LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write(''.join(linhas))
+    except OSError as erro:
+        logger.warning("Não foi possível gravar %d medições em %s: %s", len(linhas), PERF_LOG_PATH, erro)
+
+def _escrever_continuamente():
+    """
+    Corpo da thread de escrita: espera por medições e grava tudo o que estiver na fila
+    numa única escrita.
+    """
+    while True:
+        _escrever(_retirar_pendentes([_fila.get()]))
+
+def flush_log():
+    """
+    Grava de imediato as medições que ainda estão na fila (chamada também à saída do processo).
+    """
+    linhas = _retirar_pendentes([])
+    if linhas:
+        _escrever(linhas)
+
+@contextlib.contextmanager
+def span(etapa, linhas=None):
+    """
+    Mede o tempo de uma etapa. O dicionário devolvido pelo 'with' pode receber o número
+    de linhas processadas quando só é conhecido no fim (e.g., medicao['linhas'] = len(df)).
+
+    Exemplo:
+        with span('filtros', linhas=len(df_rh)) as medicao:
+            ...
+
+    Args:
+        etapa (str): O nome da etapa (e.g., 'carregamento', 'charts.create_gender_distribution_chart').
+        linhas (int, optional): O número de linhas processadas pela etapa.
+
+    Yields:
+        dict: A medição, gravada no fim do bloco.
+    """
+    medicao = {'rerun': current_rerun(), 'etapa': etapa, 'linhas': linhas}
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        _registar(medicao, inicio)
+
+def start_span(etapa, linhas=None):
+    """
+    Variante de span para etapas que não cabem num bloco 'with' (e.g., a renderização de
+    uma página inteira de main.py): inicia a medição e devolve a função que a termina.
+
+    Args:
+        etapa (str): O nome da etapa.
+        linhas (int, optional): O número de linhas processadas pela etapa.
+
+    Returns:
+        callable: Função terminar(linhas=None) que regista a medição.
+    """
+    medicao = {'rerun': current_rerun(), 'etapa': etapa, 'linhas': linhas}
+    inicio = time.perf_counter()
+
+    def terminar(linhas=None):
+        if linhas is not None:
+            medicao['linhas'] = linhas
+        _registar(medicao, inicio)
+    return terminar
+
+def _registar(medicao, inicio):
+    """
+    Completa a medição com a duração e guarda-a no rerun atual, no histórico e no registo.
+    """
+    medicao['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+    medicao['ts'] = time.time()
+    if hasattr(_local, 'medicoes'):
+        _local.medicoes.append(medicao)
+    with _lock:
+        _historico.append(medicao)
+    _gravar(medicao)
+
+def timed(etapa=None):
+    """
+    Decorador que mede cada chamada da função com span (o nome da etapa é, por omissão,
+    'modulo.funcao').
+
+    Args:
+        etapa (str, optional): O nome da etapa.
+
+    Returns:
+        callable: O decorador.
+    """
+    def decorador(funcao):
+        nome = etapa or f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            with span(nome):
+                return funcao(*args, **kwargs)
+        return wrapper
+    return decorador
+
+def rerun_spans():
+    """
+    Devolve as medições do rerun atual, pela ordem em que terminaram.
+
+    Returns:
+        pd.DataFrame: Colunas 'etapa', 'ms' e 'linhas'.
+    """
+    medicoes = getattr(_local, 'medicoes', [])
+    return pd.DataFrame(medicoes, columns=['etapa', 'ms', 'linhas'])
+
+def stage_stats():
+    """
+    Calcula a latência por etapa sobre as medições recentes (de todas as sessões).
+
+    Returns:
+        pd.DataFrame: Por etapa, o número de medições ('n') e os percentis 'p50_ms' e
+                      'p95_ms', ordenado pelo p95 decrescente.
+    """
+    with _lock:
+        medicoes = list(_historico)
+    if not medicoes:
+        return pd.DataFrame(columns=['etapa', 'n', 'p50_ms', 'p95_ms'])
+    df = pd.DataFrame(medicoes, columns=['etapa', 'ms'])
+    stats = df.groupby('etapa')['ms'].agg(
+        n='size',
+        p50_ms=lambda ms: np.percentile(ms, 50),
+        p95_ms=lambda ms: np.percentile(ms, 95),
+    ).reset_index()
+    return stats.sort_values('p95_ms', ascending=False).round(3)
@@ -0,0 +1,325 @@
+# snapshot_store.py
+import datetime
+import functools
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache_store import PARQUET_DISPONIVEL
+from config import SNAPSHOT_DIR, SNAPSHOT_RETENTION_DAYS
+from tenure import compute_tenure, format_tenure_text
+from utils import codificar_categorias
+from perf import timed
+
+# Colunas que dependem da data de referência e por isso não são guardadas nos snapshots;
+# são recalculadas para a data do snapshot ao ler (ver load_snapshot)
+_COLUNAS_RELATIVAS = ['tempo_de_empresa', 'tempo_empresa_anos', 'tempo_empresa_meses',
+                      'tempo_empresa_dias', 'tempo_empresa_anos_frac']
+_HASH_COLUMN = '_hash_linha'
+_PARTICAO = re.compile(r'^data=(\d{4}-\d{2}-\d{2})$')
+
+# Armazenamento de snapshots históricos, particionado por data:
+#
+#   SNAPSHOT_DIR/<ficheiro>/data=AAAA-MM-DD/linhas.parquet  -> linhas novas nesse snapshot
+#   SNAPSHOT_DIR/<ficheiro>/data=AAAA-MM-DD/membros.parquet -> hashes de todas as linhas do snapshot
+#   SNAPSHOT_DIR/<ficheiro>/indice.parquet                  -> hash -> partição onde a linha foi gravada
+#
+# Uma linha que não mudou entre snapshots é gravada apenas uma vez. Os snapshots com mais
+# de SNAPSHOT_RETENTION_DAYS dias são removidos (ver prune_snapshots).
+#
+# Os ficheiros são escritos num ficheiro temporário e renomeados (como em cache_store), e
+# as escritas e leituras de uma mesma série de snapshots são serializadas por um lock,
+# pois as sessões partilham o armazenamento.
+
+# Um lock por diretório de snapshots (criado na primeira utilização)
+_locks = {}
+_locks_lock = threading.Lock()
+
+def _lock_serie(nome=None, diretorio=None):
+    """
+    Devolve o lock da série de snapshots de um ficheiro (pelo nome ou pelo diretório).
+    """
+    with _locks_lock:
+        return _locks.setdefault(diretorio or _diretorio(nome), threading.Lock())
+
+def _gravar_parquet(df, caminho):
+    """
+    Grava um DataFrame em Parquet de forma atómica: num ficheiro temporário no mesmo
+    diretório, depois renomeado, para que um leitor nunca veja um ficheiro incompleto.
+    """
+    descritor, caminho_tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    os.close(descritor)
+    try:
+        df.to_parquet(caminho_tmp, index=False)
+        os.replace(caminho_tmp, caminho)
+    except BaseException:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+        raise
+
+def _diretorio(nome):
+    """
+    Diretório dos snapshots de um ficheiro (o nome é reduzido a um prefixo legível + hash).
+    """
+    legivel = re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.splitext(nome)[0])[:40]
+    sufixo = hashlib.sha256(nome.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(SNAPSHOT_DIR, f"{legivel}_{sufixo}")
+
+def _particao(nome, data):
+    return os.path.join(_diretorio(nome), f"data={data.isoformat()}")
+
+def _hash_linhas(df):
+    """
+    Hash de cada linha, ignorando as colunas relativas à data de referência.
+    """
+    colunas = [c for c in df.columns if c not in _COLUNAS_RELATIVAS]
+    return pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+
+def _ler_indice(nome=None, diretorio=None):
+    caminho = os.path.join(diretorio or _diretorio(nome), 'indice.parquet')
+    if not os.path.exists(caminho):
+        return pd.DataFrame({_HASH_COLUMN: np.array([], dtype=np.uint64), 'particao': pd.Series([], dtype=str)})
+    return pd.read_parquet(caminho)
+
+def list_snapshots(nome):
+    """
+    Lista as datas dos snapshots guardados para um ficheiro.
+
+    Args:
+        nome (str): O nome do ficheiro Excel (e.g., UploadedFile.name).
+
+    Returns:
+        list: Lista de datetime.date, da mais antiga para a mais recente.
+    """
+    return _datas_da_serie(_diretorio(nome))
+
+def _datas_da_serie(diretorio):
+    """
+    Datas dos snapshots completos (com 'membros.parquet') de um diretório de snapshots.
+    """
+    if not os.path.isdir(diretorio):
+        return []
+    datas = []
+    for entrada in os.listdir(diretorio):
+        encontrado = _PARTICAO.match(entrada)
+        if encontrado and os.path.exists(os.path.join(diretorio, entrada, 'membros.parquet')):
+            datas.append(datetime.date.fromisoformat(encontrado.group(1)))
+    return sorted(datas)
+
+@timed()
+def save_snapshot(nome, df, data=None):
+    """
+    Guarda o DataFrame pré-processado como snapshot de uma data, gravando apenas as
+    linhas que ainda não existem em nenhum snapshot anterior. Um snapshot já existente
+    para a mesma data é substituído.
+
+    Args:
+        nome (str): O nome do ficheiro Excel (identifica a série de snapshots).
+        df (pd.DataFrame): O DataFrame pré-processado.
+        data (datetime.date, optional): A data do snapshot. O padrão é hoje.
+
+    Returns:
+        bool: True se o snapshot foi guardado (requer pyarrow), False caso contrário.
+    """
+    if not PARQUET_DISPONIVEL:
+        return False
+    data = data or datetime.date.today()
+    with _lock_serie(nome):
+        _gravar_snapshot(nome, df, data)
+    prune_snapshots()
+    _carregar.cache_clear()
+    return True
+
+def _gravar_snapshot(nome, df, data):
+    """
+    Corpo de save_snapshot, chamado com o lock da série adquirido.
+    """
+    particao = _particao(nome, data)
+    os.makedirs(particao, exist_ok=True)
+
+    hashes = _hash_linhas(df)
+    indice = _ler_indice(nome)
+    # Linhas gravadas anteriormente nesta mesma partição vão ser reescritas
+    reescritas = indice.loc[indice['particao'] == data.isoformat(), _HASH_COLUMN].to_numpy()
+    indice = indice[indice['particao'] != data.isoformat()]
+
+    novas = ~np.isin(hashes, indice[_HASH_COLUMN].to_numpy())
+    novas &= ~pd.Series(hashes).duplicated().to_numpy()
+    df_novas = df.loc[novas, [c for c in df.columns if c not in _COLUNAS_RELATIVAS]]
+    df_novas = df_novas.assign(**{_HASH_COLUMN: hashes[novas]})
+
+    # As linhas antigas desta partição que outros snapshots ainda usam continuam gravadas nela
+    manter = reescritas[~np.isin(reescritas, hashes[novas]) & np.isin(reescritas, _membros_de_outras(nome, data))]
+    if len(manter):
+        antigas = pd.read_parquet(os.path.join(particao, 'linhas.parquet'))
+        df_novas = pd.concat([df_novas, antigas[antigas[_HASH_COLUMN].isin(manter)]], ignore_index=True)
+
+    indice = pd.concat([indice, pd.DataFrame({_HASH_COLUMN: df_novas[_HASH_COLUMN].to_numpy(), 'particao': data.isoformat()})],
+                       ignore_index=True)
+
+    # 'membros.parquet' é gravado por último: é ele que torna o snapshot visível (ver list_snapshots)
+    _gravar_parquet(df_novas, os.path.join(particao, 'linhas.parquet'))
+    _gravar_parquet(indice, os.path.join(_diretorio(nome), 'indice.parquet'))
+    _gravar_parquet(pd.DataFrame({_HASH_COLUMN: hashes}), os.path.join(particao, 'membros.parquet'))
+
+def _membros_de_outras(nome, data):
+    """
+    Hashes das linhas de todos os snapshots da série exceto o da data indicada.
+    """
+    membros = [pd.read_parquet(os.path.join(_particao(nome, outra), 'membros.parquet'))[_HASH_COLUMN].to_numpy()
+               for outra in list_snapshots(nome) if outra != data]
+    return np.concatenate(membros) if membros else np.array([], dtype=np.uint64)
+
+def _podar_serie(diretorio, limite):
+    """
+    Remove os snapshots de uma série anteriores à data limite. As linhas gravadas nessas
+    partições que os snapshots mantidos ainda usam passam para a partição mantida mais
+    antiga antes de as partições serem apagadas. Chamada com o lock da série adquirido.
+
+    Returns:
+        int: O número de snapshots removidos.
+    """
+    datas = _datas_da_serie(diretorio)
+    antigas = [d.isoformat() for d in datas if d < limite]
+    mantidas = [d.isoformat() for d in datas if d >= limite]
+    if not antigas:
+        return 0
+    if not mantidas:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        return len(antigas)
+
+    def _caminho(particao, ficheiro):
+        return os.path.join(diretorio, f"data={particao}", ficheiro)
+
+    usadas = np.concatenate([pd.read_parquet(_caminho(p, 'membros.parquet'))[_HASH_COLUMN].to_numpy() for p in mantidas])
+    indice = _ler_indice(diretorio=diretorio)
+    mover = indice[indice['particao'].isin(antigas) & indice[_HASH_COLUMN].isin(usadas)]
+    destino = mantidas[0]
+
+    # Primeiro a partição de destino (com as linhas movidas), depois o índice e só no fim
+    # as partições antigas, para que uma interrupção nunca deixe linhas sem dados
+    if len(mover):
+        partes = [pd.read_parquet(_caminho(destino, 'linhas.parquet'))]
+        for particao, grupo in mover.groupby('particao'):
+            linhas = pd.read_parquet(_caminho(particao, 'linhas.parquet'))
+            partes.append(linhas[linhas[_HASH_COLUMN].isin(grupo[_HASH_COLUMN])])
+        _gravar_parquet(pd.concat(partes, ignore_index=True), _caminho(destino, 'linhas.parquet'))
+    indice = indice[~indice['particao'].isin(antigas)]
+    indice = pd.concat([indice, mover.assign(particao=destino)], ignore_index=True)
+    _gravar_parquet(indice, os.path.join(diretorio, 'indice.parquet'))
+    for particao in antigas:
+        shutil.rmtree(os.path.join(diretorio, f"data={particao}"), ignore_errors=True)
+    return len(antigas)
+
+def prune_snapshots(hoje=None):
+    """
+    Aplica o prazo de retenção (config.SNAPSHOT_RETENTION_DAYS) a todas as séries de
+    snapshots: os snapshots mais antigos do que o prazo são removidos, e uma série sem
+    snapshots dentro do prazo é apagada. Sem prazo (0) nada é removido.
+
+    Args:
+        hoje (datetime.date, optional): A data de referência. O padrão é hoje.
+
+    Returns:
+        int: O número de snapshots removidos.
+    """
+    if SNAPSHOT_RETENTION_DAYS <= 0 or not os.path.isdir(SNAPSHOT_DIR):
+        return 0
+    limite = (hoje or datetime.date.today()) - datetime.timedelta(days=SNAPSHOT_RETENTION_DAYS)
+    removidos = 0
+    for entrada in os.listdir(SNAPSHOT_DIR):
+        diretorio = os.path.join(SNAPSHOT_DIR, entrada)
+        if os.path.isdir(diretorio):
+            with _lock_serie(diretorio=diretorio):
+                removidos += _podar_serie(diretorio, limite)
+    if removidos:
+        _carregar.cache_clear()
+    return removidos
+
+@functools.lru_cache(maxsize=16)
+def _carregar(nome, data, colunas):
+    """
+    Reconstrói as linhas de um snapshot a partir das partições onde foram gravadas,
+    lendo apenas as colunas pedidas. Memorizado por (ficheiro, data, colunas).
+    """
+    # Com o lock, os ficheiros lidos pertencem todos à mesma versão da série
+    with _lock_serie(nome):
+        membros = pd.read_parquet(os.path.join(_particao(nome, data), 'membros.parquet'))[_HASH_COLUMN].to_numpy()
+        indice = _ler_indice(nome)
+        indice = indice[indice[_HASH_COLUMN].isin(membros)]
+
+        partes = []
+        for particao, grupo in indice.groupby('particao'):
+            caminho = os.path.join(_diretorio(nome), f"data={particao}", 'linhas.parquet')
+            leitura = None if colunas is None else list(colunas) + [_HASH_COLUMN]
+            linhas = pd.read_parquet(caminho, columns=leitura)
+            partes.append(linhas[linhas[_HASH_COLUMN].isin(grupo[_HASH_COLUMN])])
+    linhas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame({_HASH_COLUMN: np.array([], dtype=np.uint64)})
+
+    # Repõe a ordem (e as repetições) das linhas do snapshot
+    posicao = pd.Index(linhas[_HASH_COLUMN]).get_indexer(membros)
+    if (posicao < 0).any():
+        raise ValueError(f"Snapshot de '{nome}' em {data.isoformat()} incompleto: "
+                         f"{int((posicao < 0).sum())} linhas sem dados gravados.")
+    df = linhas.iloc[posicao].drop(columns=[_HASH_COLUMN]).reset_index(drop=True)
+    codificar_categorias(df)
+    return df
+
+def _resolver_data(nome, data):
+    """
+    Devolve a data do snapshot mais recente igual ou anterior à data pedida.
+    """
+    candidatas = [d for d in list_snapshots(nome) if d <= data]
+    if not candidatas:
+        raise KeyError(f"Não existe snapshot de '{nome}' em {data.isoformat()} ou antes.")
+    return candidatas[-1]
+
+def load_snapshot(nome, data, colunas=None):
+    """
+    Devolve os dados de um ficheiro tal como estavam numa data ("as of"), usando o
+    snapshot mais recente até essa data. As colunas de tempo de empresa não são guardadas:
+    quando pedidas, são recalculadas para a data do snapshot a partir de 'admissao'.
+
+    Args:
+        nome (str): O nome do ficheiro Excel.
+        data (datetime.date): A data de consulta.
+        colunas (list, optional): As colunas a carregar. O padrão é carregar todas.
+
+    Returns:
+        pd.DataFrame: As linhas do snapshot (não deve ser alterado por quem o recebe).
+    """
+    data_snapshot = _resolver_data(nome, data)
+    relativas = colunas is None or any(coluna in _COLUNAS_RELATIVAS for coluna in colunas)
+    leitura = None
+    if colunas is not None:
+        leitura = [coluna for coluna in colunas if coluna not in _COLUNAS_RELATIVAS]
+        leitura = tuple(dict.fromkeys(leitura + ['admissao'] if relativas else leitura))
+    df = _carregar(nome, data_snapshot, leitura)
+    if relativas and 'admissao' in df.columns:
+        df = df.copy()
+        tenure = compute_tenure(df['admissao'], data_snapshot)
+        df['tempo_de_empresa'] = format_tenure_text(tenure)
+        df[tenure.columns] = tenure
+    return df if colunas is None else df[list(colunas)]
+
+@timed()
+def breakdown_as_of(nome, data, dimensao):
+    """
+    Contagem de funcionários por valor de uma dimensão numa data ("as of").
+
+    Args:
+        nome (str): O nome do ficheiro Excel.
+        data (datetime.date): A data de consulta.
+        dimensao (str): A coluna a contar (e.g., 'status', 'empresa').
+
+    Returns:
+        pd.Series: Contagem por valor, da maior para a menor, sem valores a zero.
+    """
+    contagens = load_snapshot(nome, data, [dimensao])[dimensao].value_counts()
+    return contagens[contagens > 0]
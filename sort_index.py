@@ -0,0 +1,102 @@
+# sort_index.py
+import threading
+
+import numpy as np
+import pandas as pd
+from perf import timed
+
+def _chave_ordenacao(serie):
+    """
+    Converte uma coluna numa chave numérica de ordenação e na máscara de valores válidos.
+    Categorias são ordenadas pela ordem das categorias (ver utils.codificar_categorias),
+    datas pelo instante e texto por ordem alfabética.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        return codigos, codigos >= 0
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        validos = serie.notna().to_numpy()
+        return serie.to_numpy(dtype='datetime64[ns]').view(np.int64), validos
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.to_numpy(dtype='float64', na_value=np.nan), serie.notna().to_numpy()
+    try:
+        codigos, _ = pd.factorize(serie, sort=True)
+    except TypeError: # Tipos misturados (e.g., números e texto): ordena pela representação em texto
+        codigos, _ = pd.factorize(serie.where(serie.isna(), serie.astype(str)), sort=True)
+    return codigos, codigos >= 0
+
+class SortIndex:
+    """
+    Permutações de ordenação do DataFrame completo, calculadas por coluna e sentido na
+    primeira vez que são pedidas e reutilizadas depois por todos os filtros: ordenar um
+    subconjunto filtrado é apenas selecionar, pela ordem da permutação, as posições que
+    pertencem à máscara, sem voltar a ordenar.
+    """
+
+    def __init__(self, df):
+        """
+        Args:
+            df (pd.DataFrame): O DataFrame pré-processado completo.
+        """
+        self._df = df
+        self._permutacoes = {}
+        self._lock = threading.Lock()
+
+    def permutation(self, coluna, ascendente=True):
+        """
+        Devolve a permutação que ordena o DataFrame completo por uma coluna. A ordenação é
+        estável (empates mantêm a ordem original) e os valores nulos ficam sempre no fim.
+
+        Args:
+            coluna (str): A coluna de ordenação.
+            ascendente (bool, optional): O sentido da ordenação. O padrão é True.
+
+        Returns:
+            np.ndarray: As posições das linhas (só de leitura), pela ordem pedida.
+        """
+        chave = (coluna, ascendente)
+        with self._lock:
+            permutacao = self._permutacoes.get(chave)
+        if permutacao is None:
+            valores, validos = _chave_ordenacao(self._df[coluna])
+            posicoes = np.flatnonzero(validos)
+            ordenados = valores[posicoes]
+            if not ascendente:
+                # Posto denso negado: ordem decrescente que mantém os empates estáveis
+                ordenados = -np.unique(ordenados, return_inverse=True)[1]
+            permutacao = np.concatenate([posicoes[np.argsort(ordenados, kind='stable')],
+                                         np.flatnonzero(~validos)])
+            permutacao.flags.writeable = False
+            with self._lock:
+                self._permutacoes[chave] = permutacao
+        return permutacao
+
+    def ordered_rows(self, mask, coluna=None, ascendente=True):
+        """
+        Devolve as posições das linhas selecionadas pela máscara, ordenadas pela coluna.
+
+        Args:
+            mask (np.ndarray): Máscara booleana das linhas filtradas.
+            coluna (str, optional): A coluna de ordenação. Sem coluna mantém a ordem original.
+            ascendente (bool, optional): O sentido da ordenação.
+
+        Returns:
+            np.ndarray: As posições das linhas selecionadas, pela ordem pedida.
+        """
+        if coluna is None:
+            return np.flatnonzero(mask)
+        permutacao = self.permutation(coluna, ascendente)
+        return permutacao[mask[permutacao]]
+
+@timed()
+def build_sort_index(df):
+    """
+    Cria o índice de ordenação (as permutações são calculadas sob pedido).
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+
+    Returns:
+        SortIndex: O índice de ordenação.
+    """
+    return SortIndex(df)
@@ -0,0 +1,170 @@
+# synthetic_data.py
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from export import xlsx_cell_value
+
+try:
+    import xlsxwriter
+    XLSX_DISPONIVEL = True
+except ImportError: # Sem xlsxwriter o ficheiro é escrito pelo pandas (openpyxl), mais lento
+    XLSX_DISPONIVEL = False
+
+# Valores usados na geração, com a mesma grafia encontrada nos ficheiros reais
+_STATUS = (['ATIVO', 'EXPERIENCIA', 'DESLIGADO', 'AFASTADO'], [0.62, 0.08, 0.22, 0.08])
+_EMPRESAS = ['NATURAYO', 'NATURAYO AGRO', 'CACTO LTDA', 'PLANTA SA']
+_SETORES = {
+    'PRODUÇÃO': ['LINHA 1', 'LINHA 2', 'EMBALAGEM'],
+    'MAMUTENÇÃO': ['ELÉTRICA', 'MECÂNICA'], # Grafia errada corrigida no pré-processamento
+    'ADMINISTRATIVO': ['FINANCEIRO', 'RH', 'COMPRAS'],
+    'LOGÍSTICA': ['EXPEDIÇÃO', 'ARMAZÉM'],
+}
+_FUNCOES = ['OPERADOR', 'AUXILIAR', 'TÉCNICO', 'ANALISTA', 'SUPERVISOR', 'GERENTE', 'MOTORISTA']
+_ESCOLARIDADE = ['Fundamental', 'Médio', 'Superior Incompleto', 'Superior Completo', 'Pós-graduação']
+_RACAS = ['BRANCA', 'PARDA', 'PRETA', 'AMARELA', 'INDÍGENA']
+_MESES_FERIAS = ['JANEIRO', 'FEVEREIRO', 'MARÇO', 'ABRIL', 'MAIO', 'JUNHO', 'JULHO',
+                 'AGOSTO', 'SETEMBRO', 'OUTUBRO', 'NOVEMBRO', 'DEZEMBRO']
+_NOMES = ['ANA', 'BRUNO', 'CARLA', 'DANIEL', 'EDUARDA', 'FÁBIO', 'GABRIELA', 'HUGO', 'INÊS', 'JOÃO',
+          'LARISSA', 'MARCOS', 'NATÁLIA', 'OTÁVIO', 'PAULA', 'RAFAEL', 'SOFIA', 'TIAGO', 'VITÓRIA']
+_APELIDOS = ['SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'PEREIRA', 'COSTA', 'RODRIGUES', 'ALMEIDA',
+             'NASCIMENTO', 'LIMA', 'ARAÚJO', 'FERREIRA', 'CARVALHO', 'GOMES', 'MARTINS', 'ROCHA']
+
+def _datas(rng, inicio, dias, n, fracao_nula):
+    """
+    Gera n datas a partir de 'inicio' (até 'dias' dias depois), com uma fração de nulos.
+    """
+    datas = pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n), unit='D')
+    return pd.Series(datas).where(rng.random(n) >= fracao_nula)
+
+def _nomes(rng, n, fracao_duplicada):
+    """
+    Gera n nomes completos; uma fração reutiliza o nome de outro funcionário (homónimos),
+    o que exercita as junções por 'nome' com as abas 'Férias' e 'DESLIGADOS'.
+    """
+    primeiro = np.array(_NOMES, dtype=object)[rng.integers(0, len(_NOMES), n)]
+    meio = np.array(_APELIDOS, dtype=object)[rng.integers(0, len(_APELIDOS), n)]
+    ultimo = np.array(_APELIDOS, dtype=object)[rng.integers(0, len(_APELIDOS), n)]
+    nomes = primeiro + ' ' + meio + ' ' + ultimo + ' ' + pd.Series(np.arange(n)).astype(str).to_numpy()
+    duplicados = np.flatnonzero(rng.random(n) < fracao_duplicada)
+    if len(duplicados):
+        nomes[duplicados] = nomes[rng.integers(0, n, len(duplicados))]
+    return nomes
+
+def generate_workbook_frames(n_funcionarios, seed=0, fracao_duplicada=0.02, fracao_data_nula=0.02):
+    """
+    Gera as abas de um ficheiro de RH sintético com a estrutura do ficheiro real.
+
+    Args:
+        n_funcionarios (int): Número de linhas da aba 'TODOS'.
+        seed (int, optional): Semente do gerador aleatório (o resultado é reprodutível).
+        fracao_duplicada (float, optional): Fração de funcionários com nome repetido.
+        fracao_data_nula (float, optional): Fração de datas de admissão/nascimento em branco.
+
+    Returns:
+        dict: Nome da aba -> DataFrame ('TODOS', 'Férias' e 'DESLIGADOS').
+    """
+    rng = np.random.default_rng(seed)
+    n = n_funcionarios
+    nomes = _nomes(rng, n, fracao_duplicada)
+    status = rng.choice(_STATUS[0], n, p=_STATUS[1])
+    setores = np.array(list(_SETORES), dtype=object)[rng.integers(0, len(_SETORES), n)]
+    sub_setores = np.empty(n, dtype=object)
+    for setor, subs in _SETORES.items():
+        linhas = setores == setor
+        sub_setores[linhas] = np.array(subs, dtype=object)[rng.integers(0, len(subs), linhas.sum())]
+    tem_filhos = rng.random(n) < 0.55
+    quantos = np.where(tem_filhos, rng.integers(1, 5, n), 0).astype(float)
+    quantos[rng.random(n) < 0.05] = np.nan
+    nascimento = _datas(rng, '1960-01-01', 16000, n, fracao_data_nula / 2)
+    idade = ((pd.Timestamp(datetime.date.today()) - nascimento).dt.days // 365).astype('Int64')
+
+    todos = pd.DataFrame({
+        'ALD': np.arange(1, n + 1),
+        'Matrícula': np.arange(100000, 100000 + n).astype(str),
+        'Nome': nomes,
+        'Status': status,
+        'Empresa': rng.choice(_EMPRESAS, n, p=[0.55, 0.15, 0.2, 0.1]),
+        'Setor': np.where(rng.random(n) < 0.03, None, setores),
+        'Sub Setor': sub_setores,
+        'Função': rng.choice(_FUNCOES, n),
+        'Custo': rng.choice(['DIRETO', 'INDIRETO'], n, p=[0.7, 0.3]),
+        'Admissão': _datas(rng, '2005-01-01', 7300, n, fracao_data_nula),
+        'Data de Nasc.': nascimento,
+        'Idade': idade.astype(str).where(idade.notna(), None).to_numpy(),
+        'Formula Hoje': pd.Timestamp(datetime.date.today()),
+        'Nível Escolaridade': np.where(rng.random(n) < 0.04, None, rng.choice(_ESCOLARIDADE, n)),
+        'Filho(s)': np.where(tem_filhos, 'Sim', 'Não'),
+        'Quantos': quantos,
+        'Faixa Idade': pd.cut(idade.astype(float), [0, 25, 35, 45, 55, 200],
+                              labels=['ATÉ 25', '26-35', '36-45', '46-55', '56+']).astype(object),
+        'Raça': rng.choice(_RACAS, n, p=[0.42, 0.4, 0.14, 0.03, 0.01]),
+        'Sexo': rng.choice(['MASCULINO', 'FEMININO'], n),
+    })
+
+    # 'Férias': parte dos funcionários, alguns com mais de uma linha e alguns nomes inexistentes
+    n_ferias = n // 2
+    nomes_ferias = nomes[rng.integers(0, n, n_ferias)]
+    desconhecidos = rng.random(n_ferias) < 0.01
+    nomes_ferias[desconhecidos] = 'EX-FUNCIONÁRIO ' + pd.Series(np.flatnonzero(desconhecidos)).astype(str).to_numpy()
+    ferias = pd.DataFrame({
+        'Nome': nomes_ferias,
+        'Previsão Férias 2025': rng.choice(_MESES_FERIAS, n_ferias),
+        'Limite': _datas(rng, '2025-01-01', 365, n_ferias, 0.05),
+    })
+
+    # 'DESLIGADOS': os funcionários com status DESLIGADO, com data de demissão após a admissão
+    desligados = todos.loc[todos['Status'] == 'DESLIGADO', ['Matrícula', 'Nome', 'Admissão']]
+    inicio = desligados['Admissão'].fillna(pd.Timestamp('2015-01-01'))
+    desligados = pd.DataFrame({
+        'Matrícula': desligados['Matrícula'].to_numpy(),
+        'Nome': desligados['Nome'].to_numpy(),
+        'Demissão': (inicio + pd.to_timedelta(rng.integers(30, 2500, len(desligados)), unit='D')).to_numpy(),
+    })
+
+    return {'TODOS': todos, 'Férias': ferias, 'DESLIGADOS': desligados}
+
+def write_workbook(caminho, n_funcionarios, seed=0, **kwargs):
+    """
+    Escreve um ficheiro Excel sintético (ver generate_workbook_frames). Com o xlsxwriter a
+    escrita é feita linha a linha em modo de memória constante, o que permite gerar ficheiros
+    com até 1 milhão de funcionários.
+
+    Args:
+        caminho (str): O caminho do ficheiro .xlsx a criar.
+        n_funcionarios (int): Número de linhas da aba 'TODOS'.
+        seed (int, optional): Semente do gerador aleatório.
+        **kwargs: Restantes opções de generate_workbook_frames.
+
+    Returns:
+        str: O caminho do ficheiro criado.
+    """
+    abas = generate_workbook_frames(n_funcionarios, seed=seed, **kwargs)
+    if not XLSX_DISPONIVEL:
+        with pd.ExcelWriter(caminho) as writer:
+            for nome, df in abas.items():
+                df.to_excel(writer, sheet_name=nome, index=False)
+        return caminho
+
+    workbook = xlsxwriter.Workbook(caminho, {'constant_memory': True})
+    formato_data = workbook.add_format({'num_format': 'dd/mm/yyyy'})
+    for nome, df in abas.items():
+        folha = workbook.add_worksheet(nome)
+        folha.write_row(0, 0, list(df.columns))
+        for i, coluna in enumerate(df.columns):
+            if pd.api.types.is_datetime64_any_dtype(df[coluna]):
+                folha.set_column(i, i, 12, formato_data)
+        for linha, registo in enumerate(df.itertuples(index=False, name=None), start=1):
+            folha.write_row(linha, 0, [xlsx_cell_value(v) for v in registo])
+    workbook.close()
+    return caminho
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera um ficheiro Excel de RH sintético.")
+    parser.add_argument('saida', help="Caminho do ficheiro .xlsx a criar.")
+    parser.add_argument('-n', '--funcionarios', type=int, default=1000, help="Número de funcionários (linhas de 'TODOS').")
+    parser.add_argument('--seed', type=int, default=0, help="Semente do gerador aleatório.")
+    args = parser.parse_args()
+    write_workbook(args.saida, args.funcionarios, seed=args.seed)
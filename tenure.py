@@ -0,0 +1,82 @@
+# tenure.py
+import datetime
+
+import numpy as np
+import pandas as pd
+
+def _somar_meses(mes_base, dia_base, n_meses):
+    """
+    Soma n_meses a uma data (separada em mês e dia), limitando o dia ao último dia
+    do mês de destino, tal como faz o relativedelta (e.g., 31/01 + 1 mês = 28/02).
+    """
+    mes_destino = mes_base + n_meses
+    inicio_mes = mes_destino.astype('datetime64[D]')
+    dias_no_mes = ((mes_destino + 1).astype('datetime64[D]') - inicio_mes).astype(np.int64)
+    return inicio_mes + (np.minimum(dia_base, dias_no_mes) - 1)
+
+def compute_tenure(admissao, today_date=None):
+    """
+    Calcula o tempo de empresa (anos, meses, dias) de toda a coluna de uma só vez,
+    com o mesmo resultado de relativedelta(today_date, admissao) linha a linha.
+
+    Args:
+        admissao (pd.Series): A coluna de datas de admissão.
+        today_date (datetime.date, optional): A data de referência. O padrão é hoje.
+
+    Returns:
+        pd.DataFrame: DataFrame com o mesmo índice de 'admissao' e as colunas
+                      'tempo_empresa_anos', 'tempo_empresa_meses', 'tempo_empresa_dias'
+                      (inteiros, nulos quando a admissão é inválida) e
+                      'tempo_empresa_anos_frac' (anos decimais, NaN quando inválida).
+    """
+    if today_date is None:
+        today_date = datetime.date.today()
+
+    datas = pd.to_datetime(admissao, errors='coerce')
+    validos = datas.notna().to_numpy()
+    # Datas inválidas são substituídas pela data de referência apenas para o cálculo
+    hoje = np.datetime64(today_date, 'D')
+    dias_admissao = np.where(validos, datas.to_numpy(dtype='datetime64[D]'), hoje)
+
+    mes_admissao = dias_admissao.astype('datetime64[M]')
+    dia_admissao = (dias_admissao - mes_admissao.astype('datetime64[D]')).astype(np.int64) + 1
+    mes_hoje = hoje.astype('datetime64[M]')
+
+    # Diferença em meses de calendário, corrigida quando o "aniversário" do mês ainda não chegou
+    total_meses = (mes_hoje - mes_admissao).astype(np.int64)
+    sinal = np.sign(total_meses)
+    ancora = _somar_meses(mes_admissao, dia_admissao, total_meses)
+    passou = np.where(sinal > 0, hoje < ancora, hoje > ancora) & (sinal != 0)
+    total_meses = total_meses - sinal * passou
+    ancora = np.where(passou, _somar_meses(mes_admissao, dia_admissao, total_meses), ancora)
+
+    dias = (hoje - ancora).astype(np.int64)
+    # Tal como o relativedelta, os anos são truncados em direção a zero
+    anos = np.sign(total_meses) * (np.abs(total_meses) // 12)
+    meses = total_meses - anos * 12
+
+    resultado = pd.DataFrame({
+        'tempo_empresa_anos': pd.array(np.where(validos, anos, 0), dtype='Int32'),
+        'tempo_empresa_meses': pd.array(np.where(validos, meses, 0), dtype='Int32'),
+        'tempo_empresa_dias': pd.array(np.where(validos, dias, 0), dtype='Int32'),
+        'tempo_empresa_anos_frac': np.where(validos, anos + meses / 12 + dias / 365.25, np.nan),
+    }, index=admissao.index)
+    resultado.loc[~validos, ['tempo_empresa_anos', 'tempo_empresa_meses', 'tempo_empresa_dias']] = pd.NA
+    return resultado
+
+def format_tenure_text(tenure):
+    """
+    Gera o texto "X anos, Y meses e Z dias" a partir das colunas numéricas de tempo de empresa.
+
+    Args:
+        tenure (pd.DataFrame): DataFrame devolvido por compute_tenure.
+
+    Returns:
+        pd.Series: Série de textos, com None onde a data de admissão é inválida.
+    """
+    texto = (
+        tenure['tempo_empresa_anos'].astype(str) + ' anos, ' +
+        tenure['tempo_empresa_meses'].astype(str) + ' meses e ' +
+        tenure['tempo_empresa_dias'].astype(str) + ' dias'
+    )
+    return texto.astype(object).where(tenure['tempo_empresa_anos'].notna(), None)
@@ -3,16 +3,45 @@ import streamlit as st
 import datetime
 import pandas as pd
 from utils import meses_portugues, FreqUnica
-from dateutil.relativedelta import relativedelta # Importar para cálculo de tempo de empresa
+from kpis import compute_kpis
+from snapshot_store import list_snapshots, breakdown_as_of
+from perf import timed, current_rerun, rerun_spans, stage_stats
+from figure_cache import figure_cache_info
+from dataset_registry import dataset_info, resident_datasets
 
-def render_sidebar_filters(df):
+def _multiselect_filtro(catalog, coluna, rotulo, selecoes):
+    """
+    Renderiza o filtro de seleção múltipla de uma coluna com as opções do catálogo, já
+    restringidas pela seleção dos níveis anteriores da hierarquia, e o número de
+    funcionários de cada opção.
+    """
+    chave = f"filtro_{coluna}"
+    contagens = catalog.narrowed(coluna, selecoes)
+    # Valores já escolhidos que deixaram de coexistir com os níveis anteriores continuam
+    # visíveis (com 0 funcionários) para que a seleção não desapareça sem aviso
+    escolhidos = [v for v in st.session_state.get(chave, []) if v not in contagens.index]
+    return st.sidebar.multiselect(
+        rotulo,
+        options=list(contagens.index) + escolhidos,
+        format_func=lambda v: f"{v} ({contagens.get(v, 0)})",
+        default=[],
+        placeholder="Escolha uma opção",
+        key=chave
+    )
+
+@timed()
+def render_sidebar_filters(catalog):
     """
     Renderiza os filtros na barra lateral do Streamlit e retorna os valores selecionados.
     Os filtros de data (Data Inicial/Final) FORAM REMOVIDOS desta função,
     pois são agora tratados diretamente em main_dashboard.py.
 
+    As opções, contagens e limites vêm do catálogo construído no carregamento (ver
+    filter_catalog.FilterCatalog); Setor, Sub Setor e Função mostram apenas as opções que
+    existem nas empresas, setores e sub-setores escolhidos acima.
+
     Args:
-        df (pd.DataFrame): O DataFrame completo para extrair valores únicos para os filtros.
+        catalog (FilterCatalog): O catálogo de opções do ficheiro carregado.
 
     Returns:
         dict: Um dicionário contendo os valores dos filtros selecionados (excluindo os filtros de data).
@@ -20,86 +49,27 @@ def render_sidebar_filters(df):
     filters = {} # Dicionário para armazenar os valores selecionados dos filtros
 
     # Filtro por Status
-    status_unicos = list(df['status'].unique())
-    filters['status'] = st.sidebar.multiselect(
-        "Status do Funcionário:",
-        options=status_unicos,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
-
-    # Filtro por Empresa
-    empresas_unicas = list(df['empresa'].unique())
-    filters['empresa'] = st.sidebar.multiselect(
-        "Empresa:",
-        options=empresas_unicas,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
-
-    # Filtro por Setor
-    setores_unicos = list(df['setor'].unique())
-    filters['setor'] = st.sidebar.multiselect(
-        "Setor:",
-        options=setores_unicos,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    filters['status'] = _multiselect_filtro(catalog, 'status', "Status do Funcionário:", filters)
 
-    sub_setores_unicos = list(df['sub_setor'].unique())
-    filters['sub_setor'] = st.sidebar.multiselect(
-        "Sub Setor:",
-        options=sub_setores_unicos,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
-
-    funcoes_unicas = list(df['funcao'].unique())
-    filters['funcao'] = st.sidebar.multiselect(
-        "Função:",
-        options=funcoes_unicas,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    # Filtros hierárquicos: Empresa -> Setor -> Sub Setor -> Função
+    filters['empresa'] = _multiselect_filtro(catalog, 'empresa', "Empresa:", filters)
+    filters['setor'] = _multiselect_filtro(catalog, 'setor', "Setor:", filters)
+    filters['sub_setor'] = _multiselect_filtro(catalog, 'sub_setor', "Sub Setor:", filters)
+    filters['funcao'] = _multiselect_filtro(catalog, 'funcao', "Função:", filters)
 
     # Filtro por Custo (Direto/Indireto)
-    custo_opcoes = list(df['custo'].unique())
-    filters['custo'] = st.sidebar.multiselect(
-        "Tipo de Custo:",
-        options=custo_opcoes,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    filters['custo'] = _multiselect_filtro(catalog, 'custo', "Tipo de Custo:", filters)
 
     # Filtro por Nível Escolaridade
-    escolaridade_unicas = list(df['nivel_escolaridade'].unique())
-    filters['nivel_escolaridade'] = st.sidebar.multiselect(
-        "Nível de Escolaridade:",
-        options=escolaridade_unicas,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    filters['nivel_escolaridade'] = _multiselect_filtro(catalog, 'nivel_escolaridade', "Nível de Escolaridade:", filters)
 
     # Filtro por Raça
-    racas_unicas = list(df['raca'].unique())
-    filters['raca'] = st.sidebar.multiselect(
-        "Raça:",
-        options=racas_unicas,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    filters['raca'] = _multiselect_filtro(catalog, 'raca', "Raça:", filters)
 
     # Filtro por Sexo
-    sexo_unicos = list(df['sexo'].unique())
-    filters['sexo'] = st.sidebar.multiselect(
-        "Sexo:",
-        options=sexo_unicos,
-        default=[],
-        placeholder="Escolha uma opção"
-    )
+    filters['sexo'] = _multiselect_filtro(catalog, 'sexo', "Sexo:", filters)
 
-    min_idade = int(df['idade'].min()) if not df['idade'].empty and pd.notna(df['idade'].min()) else 0
-    max_idade = int(df['idade'].max()) if not df['idade'].empty and pd.notna(df['idade'].max()) else 100
+    min_idade, max_idade = catalog.value_range('idade') or (0, 100)
     valor_faixa_idade = st.sidebar.slider(
         "Faixa de Idade:",
         min_value=min_idade,
@@ -117,8 +87,7 @@ def render_sidebar_filters(df):
         placeholder="Escolha uma opção"
     )
 
-    min_quantos = int(df['quantos'].min()) if not df['quantos'].empty and pd.notna(df['quantos'].min()) else 0
-    max_quantos = int(df['quantos'].max()) if not df['quantos'].empty and pd.notna(df['quantos'].max()) else 10
+    min_quantos, max_quantos = catalog.value_range('quantos') or (0, 10)
     quantos_filhos_selecionados = st.sidebar.slider(
         "Quantidade de Filho(s):",
         min_value=min_quantos,
@@ -130,6 +99,7 @@ def render_sidebar_filters(df):
 
     return filters
 
+@timed()
 def render_kpis(df_filtrado, data_inicial_periodo, data_final_periodo):
     """
     Renderiza a secção de Indicadores Chave de Desempenho (KPIs).
@@ -142,65 +112,163 @@ def render_kpis(df_filtrado, data_inicial_periodo, data_final_periodo):
     # O layout de colunas é ajustado para 4 colunas de tamanho igual
     kpi1, kpi2, kpi3, kpi4 = st.columns([1, 1, 1, 1])
 
-    total_funcionarios_filtrados = df_filtrado[df_filtrado['status'].isin(['ATIVO', 'EXPERIENCIA'])].shape[0]
-
-    # Contratações no período selecionado
-    contratacoes_no_periodo = df_filtrado[
-        (df_filtrado['admissao'].dt.date >= data_inicial_periodo) &
-        (df_filtrado['admissao'].dt.date <= data_final_periodo)
-    ].shape[0]
-
-    # Converter as datas do período para Pandas Timestamp para comparação robusta
-    start_ts = pd.Timestamp(data_inicial_periodo)
-    end_ts = pd.Timestamp(data_final_periodo)
-
-    # Desligamentos no período, filtrando por 'demissao' e status 'DESLIGADO'
-    # Garante que 'demissao' não é NaT (ou seja, só conta se houver data de demissão)
-    # e que a data de demissão está dentro do período selecionado.
-    desligamentos_no_periodo = df_filtrado[
-        (df_filtrado['status'] == 'DESLIGADO') &
-        (df_filtrado['demissao'].notna()) & # Garante que há uma data de demissão
-        (df_filtrado['demissao'] >= start_ts) & # Comparação direta com Timestamp
-        (df_filtrado['demissao'] <= end_ts)     # Comparação direta com Timestamp
-    ].shape[0]
-
-    # --- Cálculo do Tempo Médio de Empresa ---
-    tempo_de_empresa_em_anos = []
-    today = datetime.date.today()
-    for index, row in df_filtrado[df_filtrado['status'].isin(['ATIVO', 'EXPERIENCIA'])].iterrows():
-        if pd.notna(row['admissao']):
-            diff = relativedelta(today, row['admissao'].date())
-            tempo_de_empresa_em_anos.append(diff.years + diff.months/12 + diff.days/365.25)
-    
-    tempo_medio_empresa = 0.0
-    if tempo_de_empresa_em_anos:
-        tempo_medio_empresa = sum(tempo_de_empresa_em_anos) / len(tempo_de_empresa_em_anos)
-
+    kpis = compute_kpis(df_filtrado, data_inicial_periodo, data_final_periodo)
 
     # --- Exibição dos KPIs ---
     with st.container(border=True):
         with kpi1:
             with st.container(border=True):
                 st.image("img/ativos.png", width=75)
-                st.metric("Funcionários Ativos", total_funcionarios_filtrados)
+                st.metric("Funcionários Ativos", kpis['funcionarios_ativos'])
 
         with kpi2:
             with st.container(border=True):
                 st.image("img/contratados.png", width=75)
-                st.metric("Contratações no Período", contratacoes_no_periodo)
+                st.metric("Contratações no Período", kpis['contratacoes_no_periodo'])
 
         with kpi3:
             with st.container(border=True):
                 st.image("img/desligados.png", width=75)
-                st.metric("Desligamentos no Período", desligamentos_no_periodo)
+                st.metric("Desligamentos no Período", kpis['desligamentos_no_periodo'])
 
         with kpi4: # Antigo kpi5, agora kpi4
             with st.container(border=True):
                 # Substituído por emoji para evitar erro de imagem
                 st.markdown("### ⏳") # Emoji de relógio de areia para "Tempo Médio Empresa"
-                st.metric("Tempo Médio Empresa", f"{tempo_medio_empresa:.1f} anos")
+                st.metric("Tempo Médio Empresa", f"{kpis['tempo_medio_empresa']:.1f} anos")
+
+
+def render_count_table(tabela):
+    """
+    Renderiza uma tabela de contagens (ver Agregados.tabela) com a percentagem formatada
+    e o total de funcionários por baixo.
+
+    Args:
+        tabela (pd.DataFrame): Tabela com as colunas [rótulo, 'Count', 'Percentual'].
+    """
+    tabela = tabela.assign(Percentual=tabela['Percentual'].map('{:.2f}%'.format))
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+    st.markdown(f"**Total de funcionários:** **`{tabela['Count'].sum()}`**")
+
+
+@st.fragment
+@timed()
+def render_dimension_tables(agregados, tabelas, ordem_escolaridade):
+    """
+    Renderiza as tabelas de contagens por dimensão, uma de cada vez: ao contrário de
+    st.tabs, que constrói o conteúdo de todos os separadores, só a tabela escolhida é
+    calculada (ver Agregados). É um fragmento, pelo que trocar de tabela não reexecuta
+    o script inteiro.
+
+    Args:
+        agregados (Agregados): As contagens das linhas filtradas.
+        tabelas (dict): Dicionário que mapeia o título de cada tabela para (coluna, rótulo).
+        ordem_escolaridade (list): A ordem dos níveis de escolaridade.
+    """
+    titulos = list(tabelas)
+    # Sem seleção (o controlo permite desmarcar) mostra-se a primeira tabela
+    titulo = st.segmented_control("Tabela:", titulos, default=titulos[0], key="tabela_dimensao",
+                                  label_visibility="collapsed") or titulos[0]
+    coluna, rotulo = tabelas[titulo]
+    tabela = agregados.tabela(coluna, rotulo)
+    if coluna == 'nivel_escolaridade':
+        tabela[rotulo] = pd.Categorical(tabela[rotulo], categories=ordem_escolaridade, ordered=True)
+        tabela = tabela.sort_values(rotulo)
+    render_count_table(tabela)
+
+
+@st.fragment
+@timed()
+def render_paginated_table(df, mask, sort_index, colunas, tamanhos_pagina=(25, 50, 100, 250)):
+    """
+    Renderiza uma tabela paginada das linhas filtradas. A ordenação e o corte da página são
+    feitos no servidor (ver sort_index.SortIndex) e só as linhas da página visível são
+    enviadas para o navegador. É um fragmento: mudar a ordenação ou a página só reexecuta
+    esta função, não o script inteiro.
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado completo.
+        mask (np.ndarray): Máscara booleana das linhas filtradas.
+        sort_index (SortIndex): O índice de ordenação do DataFrame completo.
+        colunas (list): As colunas a mostrar.
+        tamanhos_pagina (tuple, optional): Os tamanhos de página disponíveis.
+    """
+    ord1, ord2, ord3 = st.columns([1, 0.6, 0.5])
+    with ord1:
+        coluna = st.selectbox("Ordenar por:", [None] + list(colunas),
+                              format_func=lambda c: "(ordem original)" if c is None else c, key="tabela_ordem")
+    with ord2:
+        sentido = st.radio("Sentido:", ["Crescente", "Decrescente"], horizontal=True, key="tabela_sentido",
+                           disabled=coluna is None)
+    with ord3:
+        tamanho = st.selectbox("Linhas por página:", tamanhos_pagina, key="tabela_tamanho")
+
+    linhas = sort_index.ordered_rows(mask, coluna, sentido == "Crescente")
+    n_paginas = max(1, -(-len(linhas) // tamanho))
+    # A chave inclui o número de páginas para voltar à primeira página quando os filtros mudam
+    pagina = st.number_input("Página:", min_value=1, max_value=n_paginas, value=1, step=1,
+                             key=f"tabela_pagina_{n_paginas}")
+
+    inicio = (pagina - 1) * tamanho
+    st.dataframe(df.iloc[linhas[inicio:inicio + tamanho]][colunas], use_container_width=True)
+    st.caption(f"Linhas {inicio + 1}–{min(inicio + tamanho, len(linhas))} de {len(linhas)} (página {pagina} de {n_paginas})")
+
+
+@st.fragment
+@timed()
+def render_snapshot_history(nome_ficheiro, dimensoes):
+    """
+    Renderiza a secção de histórico: a composição dos funcionários por uma dimensão tal
+    como estava num snapshot anterior do mesmo ficheiro (ver snapshot_store). É um
+    fragmento, pelo que escolher outra data ou dimensão só reexecuta esta secção.
 
+    Args:
+        nome_ficheiro (str): O nome do ficheiro Excel carregado.
+        dimensoes (dict): Dicionário que mapeia colunas para os rótulos a mostrar.
+    """
+    datas = list_snapshots(nome_ficheiro)
+    if not datas:
+        st.info("Ainda não existem snapshots guardados para este ficheiro.")
+        return
+
+    hist1, hist2 = st.columns(2)
+    with hist1:
+        data = st.selectbox("Data do snapshot:", datas[::-1], format_func=lambda d: d.strftime('%d/%m/%Y'),
+                            key="historico_data")
+    with hist2:
+        coluna = st.selectbox("Dimensão:", list(dimensoes), format_func=dimensoes.get, key="historico_dimensao")
+
+    contagens = breakdown_as_of(nome_ficheiro, data, coluna)
+    tabela = contagens.reset_index()
+    tabela.columns = [dimensoes[coluna], 'Count']
+    soma = contagens.sum()
+    tabela['Percentual'] = tabela['Count'] / soma * 100 if soma else 0.0
+    render_count_table(tabela)
+
+
+@st.fragment
+def render_export_section(formatos, exportar):
+    """
+    Renderiza a escolha do formato e o botão de download dos dados filtrados. O ficheiro
+    só é gerado quando o botão é clicado, e mudar de formato só reexecuta este fragmento.
 
+    Args:
+        formatos (dict): Os formatos disponíveis (ver export.EXPORT_FORMATS).
+        exportar (callable): Função exportar(formato) que devolve o ficheiro (bytes ou
+                             um ficheiro binário aberto, lido pelo Streamlit no clique).
+    """
+    formato = st.radio("Formato:", list(formatos), horizontal=True, key="formato_exportacao")
+    _, extensao, mime = formatos[formato]
+    st.download_button(
+        label=f"Baixar dados filtrados em {formato}",
+        data=lambda: exportar(formato),
+        file_name=f"dados_rh_filtrados.{extensao}",
+        mime=mime,
+        help="Clique para baixar os dados da tabela atual no formato selecionado."
+    )
+
+
+@timed()
 def render_aniversaries_and_vacations_section(df_filtrado, meses_portugues_dict):
     """
     Renderiza a secção de aniversários e férias.
@@ -216,15 +284,14 @@ def render_aniversaries_and_vacations_section(df_filtrado, meses_portugues_dict)
         with ani3:
             mes_atual = datetime.datetime.now().month
             aniversariantes_do_mes = df_filtrado[
-                (df_filtrado['data_de_nasc.'].dt.month == mes_atual) &
+                (df_filtrado['nascimento_mes'] == mes_atual) &
                 (df_filtrado['status'] == 'ATIVO')
             ].copy()
 
             nome_mes_portugues = meses_portugues_dict.get(mes_atual, "Mês Desconhecido")
             with st.expander(f"Lista dos aniversariantes do mês de {nome_mes_portugues} ({len(aniversariantes_do_mes)})"):
                 if not aniversariantes_do_mes.empty:
-                    aniversariantes_do_mes['dia_nascimento'] = aniversariantes_do_mes['data_de_nasc.'].dt.day
-                    aniversariantes_do_mes = aniversariantes_do_mes.sort_values(by='dia_nascimento')
+                    aniversariantes_do_mes = aniversariantes_do_mes.sort_values(by='nascimento_dia', kind='stable')
                     aniversariantes_do_mes['Data Nasc.'] = aniversariantes_do_mes['data_de_nasc.'].dt.strftime('%d/%m')
                     st.dataframe(
                         aniversariantes_do_mes[['nome', 'Data Nasc.', 'setor', 'funcao']],
@@ -255,3 +322,34 @@ def render_aniversaries_and_vacations_section(df_filtrado, meses_portugues_dict)
                     )
         with f1:
             st.metric("Férias no Mês", len(ferias_do_mes))
+
+
+def render_perf_panel(filter_index=None):
+    """
+    Renderiza o painel de desempenho na barra lateral: o tempo de cada etapa do rerun
+    atual, a latência p50/p95 por etapa nas medições recentes, o estado das caches e os
+    conjuntos de dados partilhados residentes (ver dataset_registry).
+
+    Args:
+        filter_index (FilterIndex, optional): O índice de filtros do ficheiro carregado.
+    """
+    with st.sidebar.expander("🛠️ Desempenho", expanded=False):
+        st.caption(f"Rerun `{current_rerun()}`")
+        spans = rerun_spans()
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+        st.markdown(f"**Total medido:** `{spans['ms'].sum():.1f} ms`")
+
+        st.markdown("**Latência por etapa (medições recentes)**")
+        st.dataframe(stage_stats(), use_container_width=True, hide_index=True)
+
+        st.markdown("**Caches**")
+        caches = {'figuras': figure_cache_info()}
+        if filter_index is not None:
+            caches['máscaras de filtros'] = filter_index.cache_info()
+        st.dataframe(pd.DataFrame(caches).T, use_container_width=True)
+
+        st.markdown("**Conjuntos de dados partilhados**")
+        info = dataset_info()
+        st.caption(f"{info['mb']} de {info['orcamento_mb']} MB em memória · {info['em_disco']} em disco · "
+                   f"{info['hits']} acertos, {info['misses']} falhas, {info['recarregados']} recarregados do disco")
+        st.dataframe(resident_datasets(), use_container_width=True, hide_index=True)
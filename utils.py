@@ -15,6 +15,26 @@ meses_portugues = {
 # Isso facilita a busca do número do mês a partir do nome
 meses_para_numeros = {v.lower(): k for k, v in meses_portugues.items()}
 
+# --- Ordem oficial dos níveis de escolaridade ---
+# Usada como ordem das categorias da coluna 'nivel_escolaridade' e nos gráficos/tabelas
+ordem_escolaridade = ['Fundamental', 'Médio', 'Superior Incompleto', 'Superior Completo', 'Pós-graduação']
+
+# --- Colunas de dimensão guardadas como categóricas ---
+# Para cada coluna, a lista indica os valores que aparecem primeiro (numa ordem fixa);
+# os restantes valores encontrados nos dados seguem-se por ordem alfabética.
+colunas_categoricas = {
+    'status': [],
+    'empresa': [],
+    'setor': [],
+    'sub_setor': [],
+    'funcao': [],
+    'custo': [],
+    'nivel_escolaridade': ordem_escolaridade,
+    'raca': [],
+    'sexo': [],
+    'filho(s)': ['SIM', 'NÃO'],
+}
+
 def LimTexA(abas):
     """
     Limpa uma lista de strings (ideal para nomes de abas de ficheiro Excel),
@@ -99,8 +119,27 @@ def FreqUnica(df, coluna_grupo, coluna_valor, nome_resultado='frequencia'):
         pd.DataFrame: Um DataFrame com as frequências agrupadas.
     """
     # Agrupa o DataFrame pela 'coluna_grupo' e conta o número de valores únicos em 'coluna_valor'
-    resultado = df.groupby(coluna_grupo)[coluna_valor].nunique().reset_index(name=nome_resultado)
+    # (observed=True ignora as categorias sem funcionários quando a coluna é categórica)
+    resultado = df.groupby(coluna_grupo, observed=True)[coluna_valor].nunique().reset_index(name=nome_resultado)
     # Garante que o resultado é um DataFrame
     resultado = pd.DataFrame(resultado)
     return resultado
 
+
+def codificar_categorias(df):
+    """
+    Converte as colunas de dimensão (ver colunas_categoricas) para o tipo categórico do pandas,
+    com uma ordem de categorias estável: primeiro os valores de ordem fixa, depois os restantes
+    por ordem alfabética. Filtros (isin) e contagens passam a trabalhar sobre códigos inteiros.
+    Modifica o DataFrame no local (inplace).
+
+    Args:
+        df (pd.DataFrame): O DataFrame pré-processado.
+    """
+    for coluna, ordem_fixa in colunas_categoricas.items():
+        if coluna not in df.columns:
+            continue
+        valores = df[coluna].dropna().astype(str).unique()
+        restantes = sorted(set(valores) - set(ordem_fixa))
+        df[coluna] = pd.Categorical(df[coluna], categories=list(ordem_fixa) + restantes)
+    return